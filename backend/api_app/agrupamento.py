@@ -0,0 +1,100 @@
+import threading
+from django.conf import settings
+from django.db import transaction
+from .compras import realizar_compra
+
+
+# Agrupamento de compras (group commit). No SQLite cada compra abre a sua
+# propria transacao de escrita e espera na fila do lock do banco, com um fsync
+# por compra. Com COMPRAS_AGRUPADAS ligado, as compras que chegam quase juntas
+# no mesmo processo sao aplicadas em uma unica transacao: a primeira vira a
+# "lider", espera COMPRAS_JANELA_MS (ou ate juntar COMPRAS_MAX_LOTE pedidos) e
+# executa o lote, cada compra no seu proprio savepoint. Uma compra recusada
+# desfaz so o seu savepoint; as demais sao confirmadas juntas e cada chamador
+# recebe o seu resultado ou a sua excecao.
+
+
+class _Pedido:
+    __slots__ = ('argumentos', 'pronto', 'resultado', 'erro', 'lider')
+
+    def __init__(self, argumentos):
+        self.argumentos = argumentos
+        self.pronto = threading.Event()
+        self.resultado = None
+        self.erro = None
+        self.lider = False
+
+
+class AgrupadorCompras:
+    def __init__(self, funcao=realizar_compra):
+        self.funcao = funcao
+        self.lotes = 0
+        self._trava = threading.Lock()
+        self._cheio = threading.Condition(self._trava)
+        self._fila = []
+        self._lider_ativo = False
+
+    def executar(self, *argumentos):
+        pedido = _Pedido(argumentos)
+        with self._trava:
+            self._fila.append(pedido)
+            if not self._lider_ativo:
+                self._lider_ativo = pedido.lider = True
+            elif len(self._fila) >= settings.COMPRAS_MAX_LOTE:
+                self._cheio.notify()
+
+        while True:
+            if pedido.lider:
+                pedido.lider = False
+                self._liderar()
+            pedido.pronto.wait()
+            # acordado para assumir a lideranca do proximo lote
+            if pedido.lider:
+                pedido.pronto.clear()
+                continue
+            break
+        if pedido.erro is not None:
+            raise pedido.erro
+        return pedido.resultado
+
+    def _liderar(self):
+        max_lote = settings.COMPRAS_MAX_LOTE
+        with self._trava:
+            self._cheio.wait_for(lambda: len(self._fila) >= max_lote, timeout=settings.COMPRAS_JANELA_MS / 1000)
+            lote, self._fila = self._fila[:max_lote], self._fila[max_lote:]
+        try:
+            self.aplicar(lote)
+        finally:
+            with self._trava:
+                # passa a lideranca para o primeiro pedido que ficou na fila
+                if self._fila:
+                    self._fila[0].lider = True
+                    self._fila[0].pronto.set()
+                else:
+                    self._lider_ativo = False
+            for pedido in lote:
+                pedido.pronto.set()
+
+    def aplicar(self, lote):
+        self.lotes += 1
+        try:
+            with transaction.atomic():
+                for pedido in lote:
+                    try:
+                        # realizar_compra abre um atomic aninhado, ou seja, um savepoint
+                        pedido.resultado = self.funcao(*pedido.argumentos)
+                    except Exception as e:
+                        pedido.erro = e
+        except Exception as e:
+            # o COMMIT falhou: nenhuma compra do lote foi gravada
+            for pedido in lote:
+                pedido.resultado, pedido.erro = None, e
+
+
+agrupador = AgrupadorCompras()
+
+
+def comprar(cliente_id, produto_id, quantidade):
+    if settings.COMPRAS_AGRUPADAS:
+        return agrupador.executar(cliente_id, produto_id, quantidade)
+    return realizar_compra(cliente_id, produto_id, quantidade)
@@ -0,0 +1,147 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import empty
+from .catalogo import invalidar_catalogo
+from .models import Produto
+
+
+# Atualizacao de preco e estoque em massa. Os registros sao validados antes de
+# tocar no banco e aplicados em lotes, cada lote com um unico UPDATE com CASE.
+# Ajustes de estoque (estoque_delta) sao somados com F() no proprio UPDATE e
+# protegidos por uma guarda no WHERE, entao nunca deixam o estoque negativo
+# mesmo com compras concorrentes.
+
+LOTE_PADRAO = 500
+MAX_LOTE = 2000
+MAX_REGISTROS = 50000
+TENTATIVAS = 3
+
+CAMPOS = {
+    'preco': serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0')),
+    'estoque': serializers.IntegerField(min_value=0),
+    'estoque_delta': serializers.IntegerField(),
+}
+
+
+class _Conflito(Exception):
+    pass
+
+
+def validar_registro(registro):
+    # devolve (id, mudancas, erros)
+    if not isinstance(registro, dict):
+        return None, {}, {"non_field_errors": ["Cada registro deve ser um objeto com id."]}
+    try:
+        produto_id = serializers.IntegerField(min_value=1).run_validation(registro.get('id', empty))
+    except ValidationError as e:
+        return registro.get('id'), {}, {"id": e.detail}
+
+    mudancas, erros = {}, {}
+    for nome, campo in CAMPOS.items():
+        if nome not in registro:
+            continue
+        try:
+            mudancas[nome] = campo.run_validation(registro[nome])
+        except ValidationError as e:
+            erros[nome] = e.detail
+    if 'estoque' in mudancas and 'estoque_delta' in mudancas:
+        erros['non_field_errors'] = ["Informe estoque ou estoque_delta, não os dois."]
+    elif not mudancas and not erros:
+        erros['non_field_errors'] = ["Informe preco, estoque ou estoque_delta."]
+    return produto_id, mudancas, erros
+
+
+def atualizar_produtos(registros, lote=LOTE_PADRAO):
+    resultado = {"atualizados": 0, "nao_encontrados": [], "rejeitados": []}
+    validos = {}
+    for registro in registros:
+        produto_id, mudancas, erros = validar_registro(registro)
+        if not erros and produto_id in validos:
+            erros = {"id": ["Produto repetido na requisição."]}
+        if erros:
+            resultado["rejeitados"].append({"id": produto_id, "erros": erros})
+        else:
+            validos[produto_id] = mudancas
+
+    ids = list(validos)
+    for inicio in range(0, len(ids), lote):
+        _aplicar_lote({produto_id: validos[produto_id] for produto_id in ids[inicio:inicio + lote]}, resultado)
+
+    if resultado["atualizados"]:
+        # update() nao dispara signals
+        invalidar_catalogo()
+    return resultado
+
+
+def _aplicar_lote(mudancas, resultado):
+    for _ in range(TENTATIVAS):
+        try:
+            with transaction.atomic():
+                parcial = _executar_lote(mudancas)
+        except _Conflito:
+            # o estoque mudou entre a leitura e o UPDATE; o lote foi desfeito
+            continue
+        resultado["atualizados"] += parcial["atualizados"]
+        resultado["nao_encontrados"] += parcial["nao_encontrados"]
+        resultado["rejeitados"] += parcial["rejeitados"]
+        return
+    resultado["rejeitados"] += [
+        {"id": produto_id, "erros": {"non_field_errors": ["Conflito com outra atualização. Tente novamente."]}}
+        for produto_id in mudancas
+    ]
+
+
+def _executar_lote(mudancas):
+    parcial = {"atualizados": 0, "nao_encontrados": [], "rejeitados": []}
+    produtos = {
+        produto_id: (estoque, fatiado)
+        for produto_id, estoque, fatiado in Produto.objects.filter(id__in=list(mudancas)).values_list('id', 'estoque', 'estoque_fatiado')
+    }
+
+    precos, novos_estoques = [], []
+    guardas = Q()
+    aplicaveis = 0
+    for produto_id, campos in mudancas.items():
+        if produto_id not in produtos:
+            parcial["nao_encontrados"].append(produto_id)
+            continue
+        estoque, fatiado = produtos[produto_id]
+        muda_estoque = 'estoque' in campos or 'estoque_delta' in campos
+        if fatiado and muda_estoque:
+            parcial["rejeitados"].append({"id": produto_id, "erros": {"non_field_errors": ["Produto com estoque fatiado: junte as fatias antes de alterar o estoque."]}})
+            continue
+        delta = campos.get('estoque_delta')
+        if delta is not None and estoque + delta < 0:
+            parcial["rejeitados"].append({"id": produto_id, "erros": {"estoque_delta": ["Estoque insuficiente para o ajuste."]}})
+            continue
+
+        if 'preco' in campos:
+            precos.append(When(id=produto_id, then=Value(campos['preco'])))
+        if 'estoque' in campos:
+            novos_estoques.append(When(id=produto_id, then=Value(campos['estoque'])))
+        if delta is not None:
+            novos_estoques.append(When(id=produto_id, then=F('estoque') + delta))
+            guardas |= Q(id=produto_id, estoque__gte=-delta, estoque_fatiado=False)
+        elif muda_estoque:
+            guardas |= Q(id=produto_id, estoque_fatiado=False)
+        else:
+            guardas |= Q(id=produto_id)
+        aplicaveis += 1
+
+    if not aplicaveis:
+        return parcial
+
+    valores = {'atualizado_em': timezone.now()}
+    if precos:
+        valores['preco'] = Case(*precos, default=F('preco'), output_field=Produto._meta.get_field('preco'))
+    if novos_estoques:
+        valores['estoque'] = Case(*novos_estoques, default=F('estoque'), output_field=Produto._meta.get_field('estoque'))
+    atualizados = Produto.objects.filter(guardas).update(**valores)
+    if atualizados != aplicaveis:
+        raise _Conflito()
+    parcial["atualizados"] = atualizados
+    return parcial
@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .catalogo import cache_compartilhado
+
+
+# Autenticacao JWT que resolve o usuario e o Cliente numa unica consulta
+# (select_related) e guarda o resultado por alguns segundos no cache, entao a
+# maioria das requisicoes autenticadas nao consulta o banco para autenticar.
+# O cache e invalidado quando o usuario ou o cliente mudam (signals) e pelas
+# views de saldo e compra. Como a invalidacao so alcanca os outros processos por
+# um cache compartilhado, USUARIO_EM_CACHE = None liga o cache so nesse caso.
+# Num acerto do cache o is_active ainda e conferido no banco (consulta pela
+# chave primaria, sem o join), entao desativar o usuario por um update que nao
+# dispara signals corta o acesso na hora.
+
+TEMPO_CACHE = 30
+
+
+def usuario_em_cache():
+    if settings.USUARIO_EM_CACHE is None:
+        return cache_compartilhado()
+    return settings.USUARIO_EM_CACHE
+
+
+def chave_usuario(user_id):
+    return f'auth:usuario:{user_id}'
+
+
+def invalidar_usuario(user_id):
+    cache.delete(chave_usuario(user_id))
+
+
+class ClienteJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        chave = chave_usuario(user_id)
+        em_cache = usuario_em_cache()
+        user = cache.get(chave) if em_cache else None
+        if user is not None:
+            if not User.objects.filter(pk=user.pk, is_active=True).exists():
+                cache.delete(chave)
+                raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        else:
+            try:
+                user = User.objects.select_related('cliente').get(**{api_settings.USER_ID_FIELD: user_id})
+            except User.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            if em_cache:
+                cache.set(chave, user, TEMPO_CACHE)
+        return self._verificar_usuario(user, validated_token)
+
+    # versoes assincronas usadas pelas views async (api_app.views_async): a
+    # validacao do token e so CPU, e a busca do usuario usa o ORM e o cache
+    # assincronos
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        chave = chave_usuario(user_id)
+        em_cache = usuario_em_cache()
+        user = await cache.aget(chave) if em_cache else None
+        if user is not None:
+            if not await User.objects.filter(pk=user.pk, is_active=True).aexists():
+                await cache.adelete(chave)
+                raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        else:
+            try:
+                user = await User.objects.select_related('cliente').aget(**{api_settings.USER_ID_FIELD: user_id})
+            except User.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            if em_cache:
+                await cache.aset(chave, user, TEMPO_CACHE)
+        return self._verificar_usuario(user, validated_token)
+
+    def _user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def _verificar_usuario(self, user, validated_token):
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
@@ -0,0 +1,48 @@
+import re
+from django.db import connection
+
+
+# Busca textual de produtos com o FTS5 do SQLite. A tabela virtual usa o
+# api_app_produto como conteudo externo e e mantida em sincronia por triggers,
+# entao criacao, alteracao e remocao (inclusive via update()/bulk_create) sao
+# refletidas sem codigo na aplicacao. A tabela e os triggers sao criados pelas
+# migracoes (0003, com SQL congelado); uma migracao que recriar a tabela
+# api_app_produto no SQLite precisa recriar os triggers (ver 0004 e 0009).
+
+TABELA_FTS = 'api_app_produto_fts'
+
+_disponivel = {}
+
+
+def fts_disponivel():
+    chave = (connection.alias, str(connection.settings_dict['NAME']))
+    if chave not in _disponivel:
+        _disponivel[chave] = (
+            connection.vendor == 'sqlite' and TABELA_FTS in connection.introspection.table_names()
+        )
+    return _disponivel[chave]
+
+
+def termo_busca(texto):
+    # cada palavra vira um prefixo entre aspas ("cafe"* "exp"*), o que tambem
+    # neutraliza a sintaxe de consulta do FTS5 vinda do usuario
+    palavras = re.findall(r'\w+', texto)
+    if not palavras:
+        return None
+    return ' '.join(f'"{palavra}"*' for palavra in palavras)
+
+
+def buscar_por_nome(queryset, texto):
+    # devolve (queryset, ranqueado); sem FTS5 cai no icontains original
+    consulta = termo_busca(texto)
+    if consulta is None or not fts_disponivel():
+        return queryset.filter(nome__icontains=texto), False
+
+    # extra() gera um JOIN com a tabela virtual, o que permite filtrar pelo
+    # MATCH e ordenar pelo rank (bm25) numa unica consulta
+    return queryset.extra(
+        tables=[TABELA_FTS],
+        where=[f'{TABELA_FTS}.rowid = api_app_produto.id', f'{TABELA_FTS} MATCH %s'],
+        params=[consulta],
+        select={'relevancia': f'{TABELA_FTS}.rank'},
+    ), True
@@ -0,0 +1,228 @@
+import hashlib
+import time
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache
+from django.db import transaction
+from .roteador import alias_leitura
+
+
+# O catalogo tem um contador de versao no cache do Django. Toda escrita que muda
+# produtos (criacao, compra, alteracao de estoque) incrementa a versao, e as
+# entradas de cache derivadas do catalogo levam a versao na chave, entao nunca
+# e servido um valor anterior a ultima escrita.
+
+#
+# A versao so invalida os outros processos se o cache for compartilhado entre
+# eles. Com um cache local (locmem) cada worker teria o seu contador, e uma
+# compra atendida por um worker nao invalidaria as paginas, contagens e ETags
+# dos outros. Por isso os caches do catalogo so ficam ligados com um backend
+# compartilhado, a menos que CATALOGO_EM_CACHE force (processo unico).
+
+CHAVE_VERSAO = 'catalogo:versao'
+TEMPO_CONTAGEM = 60 * 10
+
+CACHES_LOCAIS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_compartilhado():
+    return settings.CACHES[DEFAULT_CACHE_ALIAS]['BACKEND'] not in CACHES_LOCAIS
+
+
+def catalogo_em_cache():
+    if settings.CATALOGO_EM_CACHE is None:
+        return cache_compartilhado()
+    return settings.CATALOGO_EM_CACHE
+
+
+def versao_catalogo():
+    versao = cache.get(CHAVE_VERSAO)
+    if versao is None:
+        # comeca de um valor baseado no relogio para nao reaproveitar chaves
+        # antigas caso o contador tenha sido despejado do cache
+        cache.add(CHAVE_VERSAO, int(time.time() * 1000), timeout=None)
+        versao = cache.get(CHAVE_VERSAO)
+    return versao
+
+
+async def aversao_catalogo():
+    # versoes async usam a API async do cache, para um backend de rede nao
+    # bloquear o event loop
+    versao = await cache.aget(CHAVE_VERSAO)
+    if versao is None:
+        await cache.aadd(CHAVE_VERSAO, int(time.time() * 1000), timeout=None)
+        versao = await cache.aget(CHAVE_VERSAO)
+    return versao
+
+
+def _incrementar_versao():
+    try:
+        cache.incr(CHAVE_VERSAO)
+    except ValueError:
+        versao_catalogo()
+
+
+def invalidar_catalogo():
+    # incrementa agora (para a propria requisicao) e de novo no commit, para que
+    # um leitor concorrente nao guarde em cache dados lidos antes do commit
+    _incrementar_versao()
+    transaction.on_commit(_incrementar_versao)
+
+
+def normalizar_filtros(filtros):
+    normalizados = []
+    for chave, valor in sorted(filtros.items()):
+        if valor in (None, ''):
+            continue
+        valor = str(valor).strip()
+        if chave == 'preco_max':
+            try:
+                valor = str(Decimal(valor).normalize())
+            except InvalidOperation:
+                pass
+        normalizados.append(f'{chave}={valor}')
+    return hashlib.sha1('&'.join(normalizados).encode()).hexdigest()
+
+
+def _chaves_contagem(filtros, versao):
+    chave_filtros = normalizar_filtros(filtros)
+    alias = alias_leitura()
+    return (f'produtos:total:{alias}:{versao}:{chave_filtros}', f'produtos:total:{alias}:ultimo:{chave_filtros}')
+
+
+def _escolher_contagem(contagens, chaves, exato):
+    # devolve (total, aproximado) ou None
+    if chaves[0] in contagens:
+        return contagens[chaves[0]], False
+    if not exato and chaves[1] in contagens:
+        # modo estimado: aceita a ultima contagem conhecida, mesmo de uma versao
+        # anterior do catalogo, em vez de executar o COUNT(*)
+        return contagens[chaves[1]], True
+    return None
+
+
+def _contagem_em_cache(filtros, exato):
+    # devolve ((total, aproximado) ou None, chaves onde guardar a contagem)
+    chaves = _chaves_contagem(filtros, versao_catalogo())
+    return _escolher_contagem(cache.get_many(chaves), chaves, exato), chaves
+
+
+async def _acontagem_em_cache(filtros, exato):
+    chaves = _chaves_contagem(filtros, await aversao_catalogo())
+    return _escolher_contagem(await cache.aget_many(chaves), chaves, exato), chaves
+
+
+def contar_produtos(queryset, filtros, exato=True):
+    # devolve (total, aproximado)
+    if not catalogo_em_cache():
+        return queryset.count(), False
+    em_cache, chaves = _contagem_em_cache(filtros, exato)
+    if em_cache is not None:
+        return em_cache
+    total = queryset.count()
+    cache.set_many(dict.fromkeys(chaves, total), TEMPO_CONTAGEM)
+    return total, False
+
+
+async def acontar_produtos(queryset, filtros, exato=True):
+    if not catalogo_em_cache():
+        return await queryset.acount(), False
+    em_cache, chaves = await _acontagem_em_cache(filtros, exato)
+    if em_cache is not None:
+        return em_cache
+    total = await queryset.acount()
+    await cache.aset_many(dict.fromkeys(chaves, total), TEMPO_CONTAGEM)
+    return total, False
+
+
+# cache das respostas da listagem publica de produtos
+TEMPO_RESPOSTA = 60 * 5
+CHAVE_HITS = 'catalogo:respostas:hits'
+CHAVE_MISSES = 'catalogo:respostas:misses'
+
+
+def _contar(chave):
+    try:
+        cache.incr(chave)
+    except ValueError:
+        if not cache.add(chave, 1, timeout=None):
+            cache.incr(chave)
+
+
+async def _acontar(chave):
+    try:
+        await cache.aincr(chave)
+    except ValueError:
+        if not await cache.aadd(chave, 1, timeout=None):
+            await cache.aincr(chave)
+
+
+def parametros_normalizados(request):
+    # parametros vazios e a ordem deles na URL nao mudam a resposta; o host
+    # entra porque o link "next" da paginacao por cursor e absoluto
+    params = sorted(
+        (chave, sorted(v for v in valores if v))
+        for chave, valores in request.query_params.lists()
+    )
+    params = [(chave, valores) for chave, valores in params if valores]
+    return f'{request.scheme}://{request.get_host()}{request.path}?{params}'
+
+
+def _chave_resposta(request, versao):
+    bruto = parametros_normalizados(request)
+    return f'produtos:resposta:{alias_leitura()}:{versao}:{hashlib.sha1(bruto.encode()).hexdigest()}'
+
+
+def chave_resposta(request):
+    return _chave_resposta(request, versao_catalogo())
+
+
+async def achave_resposta(request):
+    # com o cache do catalogo desligado a chave nao e usada; poupa a ida ao
+    # cache, que na versao async troca de thread
+    if not catalogo_em_cache():
+        return None
+    return _chave_resposta(request, await aversao_catalogo())
+
+
+def obter_resposta(chave):
+    if not catalogo_em_cache():
+        return None
+    dados = cache.get(chave)
+    _contar(CHAVE_HITS if dados is not None else CHAVE_MISSES)
+    return dados
+
+
+async def aobter_resposta(chave):
+    if not catalogo_em_cache():
+        return None
+    dados = await cache.aget(chave)
+    await _acontar(CHAVE_HITS if dados is not None else CHAVE_MISSES)
+    return dados
+
+
+def guardar_resposta(chave, dados):
+    if catalogo_em_cache():
+        cache.set(chave, dados, TEMPO_RESPOSTA)
+
+
+async def aguardar_resposta(chave, dados):
+    if catalogo_em_cache():
+        await cache.aset(chave, dados, TEMPO_RESPOSTA)
+
+
+def estatisticas_cache():
+    valores = cache.get_many([CHAVE_HITS, CHAVE_MISSES])
+    hits = valores.get(CHAVE_HITS, 0)
+    misses = valores.get(CHAVE_MISSES, 0)
+    total = hits + misses
+    return {
+        "ativo": catalogo_em_cache(),
+        "versao_catalogo": versao_catalogo(),
+        "hits": hits,
+        "misses": misses,
+        "taxa_acerto": round(hits / total, 4) if total else None,
+    }
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+from .catalogo import cache_compartilhado
+
+
+@register()
+def verificar_caches_locais(app_configs, **kwargs):
+    # com o cache local cada processo tem a sua versao do catalogo e nao ve as
+    # revogacoes de tokens nem as marcacoes de leitura no primario dos outros
+    avisos = []
+    if settings.CATALOGO_EM_CACHE and not cache_compartilhado():
+        avisos.append(Warning(
+            "CATALOGO_EM_CACHE está ligado com um cache local ao processo.",
+            hint="Com mais de um processo, uma compra em um worker não invalida o cache dos outros. "
+                 "Use um backend compartilhado (Redis, Memcached, FileBasedCache) ou CATALOGO_EM_CACHE = None.",
+            id='api_app.W001',
+        ))
+    if settings.LISTA_NEGRA_BLOOM and not cache_compartilhado():
+        avisos.append(Warning(
+            "LISTA_NEGRA_BLOOM está ligado com um cache local ao processo.",
+            hint="Com mais de um processo, um refresh token revogado em um worker é aceito pelos outros "
+                 "por até INTERVALO_SINCRONIZACAO segundos. Use um backend compartilhado ou LISTA_NEGRA_BLOOM = None.",
+            id='api_app.W002',
+        ))
+    if settings.USUARIO_EM_CACHE and not cache_compartilhado():
+        avisos.append(Warning(
+            "USUARIO_EM_CACHE está ligado com um cache local ao processo.",
+            hint="Com mais de um processo, uma alteração de saldo ou senha em um worker não invalida o usuário "
+                 "guardado nos outros por até TEMPO_CACHE segundos. Use um backend compartilhado ou USUARIO_EM_CACHE = None.",
+            id='api_app.W004',
+        ))
+    if settings.REPLICA_LEITURA and not cache_compartilhado():
+        avisos.append(Warning(
+            "REPLICA_LEITURA está ligado com um cache local ao processo.",
+            hint="A marcação que mantém no primário quem acabou de escrever fica no cache; com mais de um "
+                 "processo os outros workers não a veem e podem ler da réplica atrasada. Use um backend compartilhado.",
+            id='api_app.W003',
+        ))
+    return avisos
@@ -0,0 +1,179 @@
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework import status
+from .models import Produto, Cliente, Transacao
+from .catalogo import invalidar_catalogo
+from .resumos import registrar_compras
+from .vendas import registrar_vendas
+from .saldos import debitar, SaldoInsuficiente
+from .estoque import baixar_fatias, agendar_sincronizacao
+
+
+class CompraError(Exception):
+    def __init__(self, mensagem, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(mensagem)
+        self.mensagem = mensagem
+        self.status_code = status_code
+
+
+def resolver_cliente_id(username):
+    # uma unica consulta no caminho feliz; a distincao entre usuario e cliente
+    # inexistente so e feita quando a busca falha
+    cliente_id = Cliente.objects.filter(user__username=username).values_list('id', flat=True).first()
+    if cliente_id is None:
+        if not User.objects.filter(username=username).exists():
+            raise CompraError("Usuário não encontrado.", status.HTTP_404_NOT_FOUND)
+        raise CompraError("Cliente não encontrado", status.HTTP_404_NOT_FOUND)
+    return cliente_id
+
+
+def validar_quantidade(quantidade):
+    try:
+        quantidade = int(quantidade)
+    except (ValueError, TypeError):
+        raise CompraError("A quantidade deve ser um número inteiro.")
+    if quantidade <= 0:
+        raise CompraError("A quantidade deve ser maior que zero.")
+    return quantidade
+
+
+def realizar_compra(cliente_id, produto_id, quantidade):
+    quantidade = validar_quantidade(quantidade)
+
+    try:
+        produto = Produto.objects.filter(id=produto_id).values_list('preco', 'estoque_fatiado').first()
+    except (ValueError, TypeError):
+        produto = None
+    if produto is None:
+        raise CompraError("Produto não encontrado", status.HTTP_404_NOT_FOUND)
+    preco, fatiado = produto
+    total = preco * quantidade
+
+    # o debito vai para o livro-razao do saldo e a verificacao de estoque fica
+    # no WHERE do UPDATE, entao compras concorrentes nunca perdem atualizacoes
+    # nem deixam valores negativos. Se o preco mudou desde a leitura, o UPDATE
+    # de estoque nao casa e a compra falha em vez de cobrar o valor antigo.
+    with transaction.atomic():
+        try:
+            debitar(cliente_id, total, "Compra")
+        except SaldoInsuficiente:
+            raise CompraError("Saldo insuficiente")
+
+        if fatiado:
+            # estoque fatiado: a linha do Produto so e lida, a baixa vai para uma fatia
+            if not Produto.objects.filter(id=produto_id, preco=preco, estoque_fatiado=True).exists():
+                raise CompraError("O preço do produto foi alterado. Tente novamente.", status.HTTP_409_CONFLICT)
+            if not baixar_fatias(produto_id, quantidade):
+                raise CompraError("Estoque insuficiente")
+            invalidar_catalogo()
+            agendar_sincronizacao(produto_id)
+            return _registrar_transacao(cliente_id, produto_id, quantidade, total)
+
+        baixado = Produto.objects.filter(id=produto_id, preco=preco, estoque__gte=quantidade).update(
+            estoque=F('estoque') - quantidade, atualizado_em=timezone.now()
+        )
+        if not baixado:
+            if not Produto.objects.filter(id=produto_id, preco=preco).exists():
+                raise CompraError("O preço do produto foi alterado. Tente novamente.", status.HTTP_409_CONFLICT)
+            raise CompraError("Estoque insuficiente")
+        invalidar_catalogo()
+        return _registrar_transacao(cliente_id, produto_id, quantidade, total)
+
+
+def _registrar_transacao(cliente_id, produto_id, quantidade, total):
+    transacao = Transacao.objects.create(
+        cliente_id=cliente_id, produto_id=produto_id, quantidade=quantidade, total=total
+    )
+    registrar_compras(cliente_id, [transacao])
+    registrar_vendas([transacao])
+    return transacao
+
+
+MAX_ITENS_CARRINHO = 500
+
+
+def agrupar_itens(itens):
+    # valida as linhas do carrinho e soma quantidades repetidas do mesmo produto
+    if not isinstance(itens, list) or not itens:
+        raise CompraError("Informe uma lista de itens para a compra.")
+    if len(itens) > MAX_ITENS_CARRINHO:
+        raise CompraError(f"O carrinho aceita no máximo {MAX_ITENS_CARRINHO} itens.")
+
+    quantidades = {}
+    for item in itens:
+        if not isinstance(item, dict):
+            raise CompraError("Cada item deve conter produto_id e quantidade.")
+        try:
+            produto_id = int(item.get('produto_id'))
+        except (ValueError, TypeError):
+            raise CompraError("Cada item deve conter um produto_id válido.")
+        quantidade = validar_quantidade(item.get('quantidade'))
+        quantidades[produto_id] = quantidades.get(produto_id, 0) + quantidade
+    return quantidades
+
+
+def realizar_checkout(cliente_id, itens):
+    quantidades = agrupar_itens(itens)
+
+    produtos = Produto.objects.only('id', 'preco', 'estoque', 'estoque_fatiado').in_bulk(list(quantidades))
+    faltando = [produto_id for produto_id in quantidades if produto_id not in produtos]
+    if faltando:
+        raise CompraError(f"Produto não encontrado: {faltando}", status.HTTP_404_NOT_FOUND)
+
+    total = sum(produtos[produto_id].preco * quantidade for produto_id, quantidade in quantidades.items())
+    fatiados = {produto_id: quantidade for produto_id, quantidade in quantidades.items() if produtos[produto_id].estoque_fatiado}
+    linhas = {produto_id: quantidade for produto_id, quantidade in quantidades.items() if produto_id not in fatiados}
+    sem_estoque = [produto_id for produto_id, quantidade in linhas.items() if produtos[produto_id].estoque < quantidade]
+    if sem_estoque:
+        raise CompraError(f"Estoque insuficiente: {sem_estoque}")
+
+    # um unico UPDATE com CASE baixa o estoque de todos os produtos; o filtro
+    # repete as guardas de estoque e preco por produto, entao se alguma linha
+    # nao casar a transacao inteira e desfeita. Produtos com estoque fatiado
+    # ficam fora do UPDATE e baixam suas fatias.
+    guardas = Q()
+    baixas = []
+    for produto_id, quantidade in linhas.items():
+        guardas |= Q(id=produto_id, preco=produtos[produto_id].preco, estoque__gte=quantidade)
+        baixas.append(When(id=produto_id, then=F('estoque') - quantidade))
+    guardas_fatiados = Q()
+    for produto_id in fatiados:
+        guardas_fatiados |= Q(id=produto_id, preco=produtos[produto_id].preco, estoque_fatiado=True)
+
+    with transaction.atomic():
+        try:
+            debitar(cliente_id, total, "Compra (carrinho)")
+        except SaldoInsuficiente:
+            raise CompraError("Saldo insuficiente")
+
+        if linhas:
+            baixados = Produto.objects.filter(guardas).update(
+                estoque=Case(*baixas, default=F('estoque')), atualizado_em=timezone.now()
+            )
+            if baixados != len(linhas):
+                raise CompraError("Estoque insuficiente ou preço alterado. Tente novamente.", status.HTTP_409_CONFLICT)
+            invalidar_catalogo()
+        if fatiados:
+            if Produto.objects.filter(guardas_fatiados).count() != len(fatiados):
+                raise CompraError("Estoque insuficiente ou preço alterado. Tente novamente.", status.HTTP_409_CONFLICT)
+            sem_estoque = [produto_id for produto_id, quantidade in fatiados.items() if not baixar_fatias(produto_id, quantidade)]
+            if sem_estoque:
+                raise CompraError(f"Estoque insuficiente: {sem_estoque}")
+            invalidar_catalogo()
+            for produto_id in fatiados:
+                agendar_sincronizacao(produto_id)
+
+        transacoes = Transacao.objects.bulk_create([
+            Transacao(
+                cliente_id=cliente_id,
+                produto_id=produto_id,
+                quantidade=quantidade,
+                total=produtos[produto_id].preco * quantidade,
+            )
+            for produto_id, quantidade in quantidades.items()
+        ])
+        registrar_compras(cliente_id, transacoes)
+        registrar_vendas(transacoes)
+    return transacoes, total
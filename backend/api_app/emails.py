@@ -0,0 +1,84 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import EmailPendente
+
+
+# Fila (outbox) de e-mails: o cadastro apenas grava uma linha na mesma transacao
+# e responde na hora; o comando enviar_emails drena a fila em lotes usando uma
+# unica conexao SMTP por lote, com novas tentativas e espera exponencial. Cada
+# worker reivindica as linhas antes de envia-las, entao varios workers podem
+# drenar a mesma fila sem enviar o mesmo e-mail duas vezes.
+
+MAX_TENTATIVAS = 5
+ESPERA_BASE = timedelta(seconds=30)
+# reivindicacao abandonada (worker que caiu no meio do lote) volta para a fila
+PRAZO_PROCESSAMENTO = timedelta(minutes=10)
+
+
+def enfileirar_email(destinatario, assunto, mensagem):
+    return EmailPendente.objects.create(destinatario=destinatario, assunto=assunto, mensagem=mensagem)
+
+
+def _registrar_falha(email, erro, agora):
+    email.tentativas += 1
+    email.erro = str(erro)
+    email.proxima_tentativa = agora + ESPERA_BASE * (2 ** (email.tentativas - 1))
+    email.processando_em = None
+    email.save(update_fields=['tentativas', 'erro', 'proxima_tentativa', 'processando_em'])
+
+
+def reivindicar(lote, agora):
+    # marca ate `lote` e-mails com um UPDATE condicional e devolve so os que
+    # este worker marcou; outro worker (ou um cron sobreposto) que escolheu os
+    # mesmos ids nao os altera, porque processando_em ja nao esta livre
+    livre = Q(processando_em__isnull=True) | Q(processando_em__lt=agora - PRAZO_PROCESSAMENTO)
+    ids = list(
+        EmailPendente.objects.filter(
+            livre, enviado_em__isnull=True, proxima_tentativa__lte=agora, tentativas__lt=MAX_TENTATIVAS
+        ).order_by('id').values_list('id', flat=True)[:lote]
+    )
+    if not ids:
+        return []
+    with transaction.atomic():
+        EmailPendente.objects.filter(livre, id__in=ids, enviado_em__isnull=True).update(processando_em=agora)
+        return list(EmailPendente.objects.filter(id__in=ids, processando_em=agora).order_by('id'))
+
+
+def enviar_pendentes(lote=50):
+    # envia ate `lote` e-mails e devolve (enviados, falhas)
+    agora = timezone.now()
+    pendentes = reivindicar(lote, agora)
+    if not pendentes:
+        return 0, 0
+
+    conexao = get_connection(fail_silently=False)
+    try:
+        conexao.open()
+    except Exception as e:
+        for email in pendentes:
+            _registrar_falha(email, e, agora)
+        return 0, len(pendentes)
+
+    enviados = falhas = 0
+    try:
+        for email in pendentes:
+            mensagem = EmailMessage(
+                email.assunto, email.mensagem, settings.DEFAULT_FROM_EMAIL, [email.destinatario], connection=conexao
+            )
+            try:
+                conexao.send_messages([mensagem])
+            except Exception as e:
+                _registrar_falha(email, e, agora)
+                falhas += 1
+            else:
+                # marcado logo apos o envio: se o worker cair no meio do lote,
+                # os ja entregues nao sao reenviados
+                EmailPendente.objects.filter(id=email.id).update(enviado_em=timezone.now(), processando_em=None, erro='')
+                enviados += 1
+    finally:
+        conexao.close()
+    return enviados, falhas
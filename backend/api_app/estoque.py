@@ -0,0 +1,162 @@
+import random
+import threading
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from .catalogo import invalidar_catalogo
+from .models import FatiaEstoque, Produto
+
+
+# Estoque fatiado para produtos muito disputados (promocoes). Em vez de todas
+# as compras baixarem a mesma linha de Produto, o estoque e dividido em N
+# linhas de FatiaEstoque e cada compra baixa uma fatia sorteada, entao compras
+# concorrentes do mesmo produto quase nunca esperam pelo mesmo lock de linha.
+# O estoque real e a soma das fatias; Produto.estoque vira uma copia do total,
+# atualizada por sincronizar() e ao juntar as fatias de volta. Cada compra
+# fatiada agenda, no commit, a sincronizacao do seu produto para daqui a
+# INTERVALO_SINCRONIZACAO segundos; as compras que chegam nesse meio tempo
+# aproveitam o mesmo agendamento, entao a linha do Produto e escrita no maximo
+# uma vez por intervalo em cada processo e o estoque exibido atrasa no maximo
+# esse tempo.
+#
+# O ganho depende de locks por linha (PostgreSQL, MySQL). No SQLite toda escrita
+# pega o lock do banco inteiro, entao as fatias nao tiram a espera e so somam
+# consultas; por isso nenhum produto e fatiado sem o fatiar_estoque.
+
+FATIAS_PADRAO = 16
+MAX_FATIAS = 256
+INTERVALO_SINCRONIZACAO = 1.0
+
+_agendados = set()
+_trava_agendados = threading.Lock()
+
+
+def _dividir(total, fatias):
+    base, resto = divmod(total, fatias)
+    return [base + (1 if numero < resto else 0) for numero in range(fatias)]
+
+
+def fatiar(produto_id, fatias=FATIAS_PADRAO):
+    # divide (ou redivide) o estoque do produto em `fatias` partes iguais
+    with transaction.atomic():
+        # escreve antes de ler: no SQLite pega o lock de escrita logo de inicio
+        if not Produto.objects.filter(id=produto_id).update(estoque_fatiado=True):
+            raise Produto.DoesNotExist()
+        total = _total_bloqueando(produto_id)
+        FatiaEstoque.objects.filter(produto_id=produto_id).delete()
+        FatiaEstoque.objects.bulk_create([
+            FatiaEstoque(produto_id=produto_id, numero=numero, estoque=estoque)
+            for numero, estoque in enumerate(_dividir(total, fatias))
+        ])
+        Produto.objects.filter(id=produto_id).update(estoque=total, atualizado_em=timezone.now())
+    invalidar_catalogo()
+    return total
+
+
+def juntar(produto_id):
+    # volta o produto para o estoque em uma unica linha
+    with transaction.atomic():
+        if not Produto.objects.filter(id=produto_id, estoque_fatiado=True).update(estoque_fatiado=False):
+            return None
+        total = _total_bloqueando(produto_id)
+        FatiaEstoque.objects.filter(produto_id=produto_id).delete()
+        Produto.objects.filter(id=produto_id).update(estoque=total, atualizado_em=timezone.now())
+    invalidar_catalogo()
+    return total
+
+
+def _total_bloqueando(produto_id):
+    # chamado com o Produto ja atualizado na transacao; se o produto ainda nao
+    # tinha fatias, o total e o proprio Produto.estoque
+    fatias = list(FatiaEstoque.objects.select_for_update().filter(produto_id=produto_id).values_list('estoque', flat=True))
+    if fatias:
+        return sum(fatias)
+    return Produto.objects.filter(id=produto_id).values_list('estoque', flat=True).get()
+
+
+def estoque_total(produto_id):
+    return FatiaEstoque.objects.filter(produto_id=produto_id).aggregate(total=Sum('estoque'))['total'] or 0
+
+
+def sincronizar():
+    # copia a soma das fatias para Produto.estoque (listagens e ordenacao);
+    # feito fora do caminho de compra para nao voltar a disputar a linha
+    atualizados = 0
+    for produto_id in list(Produto.objects.filter(estoque_fatiado=True).values_list('id', flat=True)):
+        atualizados += _copiar_total(produto_id)
+    if atualizados:
+        invalidar_catalogo()
+    return atualizados
+
+
+def sincronizar_produto(produto_id):
+    if _copiar_total(produto_id):
+        invalidar_catalogo()
+
+
+def _copiar_total(produto_id):
+    total = estoque_total(produto_id)
+    return Produto.objects.filter(id=produto_id, estoque_fatiado=True).exclude(estoque=total).update(
+        estoque=total, atualizado_em=timezone.now()
+    )
+
+
+def agendar_sincronizacao(produto_id):
+    # chamada dentro da transacao da compra; so agenda depois do commit
+    transaction.on_commit(lambda: _agendar(produto_id))
+
+
+def _agendar(produto_id):
+    if not INTERVALO_SINCRONIZACAO:
+        sincronizar_produto(produto_id)
+        return
+    with _trava_agendados:
+        if produto_id in _agendados:
+            return
+        _agendados.add(produto_id)
+    timer = threading.Timer(INTERVALO_SINCRONIZACAO, _sincronizar_agendado, args=(produto_id,))
+    timer.daemon = True
+    timer.start()
+
+
+def _sincronizar_agendado(produto_id):
+    # sai do conjunto antes de ler as fatias: uma compra que fizer commit
+    # depois da leitura agenda uma nova sincronizacao
+    with _trava_agendados:
+        _agendados.discard(produto_id)
+    try:
+        sincronizar_produto(produto_id)
+    finally:
+        connection.close()
+
+
+def baixar_fatias(produto_id, quantidade):
+    # deve ser chamado dentro de uma transacao. Tenta as fatias com estoque
+    # suficiente em ordem aleatoria, cada uma com um UPDATE condicional; se
+    # nenhuma sozinha atende a quantidade, bloqueia as fatias e divide a baixa
+    # entre elas. Devolve False se a soma das fatias nao for suficiente.
+    candidatas = list(
+        FatiaEstoque.objects.filter(produto_id=produto_id, estoque__gte=quantidade).values_list('id', flat=True)
+    )
+    random.shuffle(candidatas)
+    for fatia_id in candidatas:
+        if FatiaEstoque.objects.filter(id=fatia_id, estoque__gte=quantidade).update(estoque=F('estoque') - quantidade):
+            return True
+
+    fatias = list(
+        FatiaEstoque.objects.select_for_update()
+        .filter(produto_id=produto_id, estoque__gt=0)
+        .order_by('numero')
+        .values_list('id', 'estoque')
+    )
+    if sum(estoque for _, estoque in fatias) < quantidade:
+        return False
+    random.shuffle(fatias)
+    restante = quantidade
+    for fatia_id, estoque in fatias:
+        baixa = min(estoque, restante)
+        FatiaEstoque.objects.filter(id=fatia_id).update(estoque=F('estoque') - baixa)
+        restante -= baixa
+        if not restante:
+            break
+    return True
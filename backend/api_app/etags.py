@@ -0,0 +1,86 @@
+import hashlib
+from rest_framework import status
+from rest_framework.response import Response
+from .catalogo import aversao_catalogo, catalogo_em_cache, parametros_normalizados, versao_catalogo
+from .models import Produto, ResumoCliente
+from .roteador import alias_leitura
+
+
+# ETags fortes das listagens, calculados a partir de marcadores baratos do banco
+# (maior id, maior atualizado_em, linha de resumo) mais os parametros da
+# requisicao, sem serializar a pagina
+
+
+def gerar_etag(*partes):
+    return '"' + hashlib.sha1('|'.join(str(parte) for parte in partes).encode()).hexdigest() + '"'
+
+
+def _marcadores_produtos():
+    # marcadores da tabela inteira, sem COUNT(*): qualquer insercao ou alteracao
+    # muda o ETag. Cada maximo e uma leitura de uma linha no fim do indice (um
+    # MAX duplo no mesmo SELECT faria o SQLite percorrer o indice todo).
+    # Remocoes nao mudam esses maximos, por isso a versao do catalogo (que o
+    # signal de post_delete incrementa) tambem entra no calculo. Sem cache
+    # compartilhado a versao e local ao processo e o total de linhas a substitui
+    ultimo_id = Produto.objects.order_by('-id').values_list('id', flat=True).first()
+    ultima_alteracao = Produto.objects.order_by('-atualizado_em').values_list('atualizado_em', flat=True).first()
+    versao = versao_catalogo() if catalogo_em_cache() else Produto.objects.count()
+    return versao, ultimo_id, ultima_alteracao
+
+
+async def _amarcadores_produtos():
+    ultimo_id = await Produto.objects.order_by('-id').values_list('id', flat=True).afirst()
+    ultima_alteracao = await Produto.objects.order_by('-atualizado_em').values_list('atualizado_em', flat=True).afirst()
+    versao = await aversao_catalogo() if catalogo_em_cache() else await Produto.objects.acount()
+    return versao, ultimo_id, ultima_alteracao
+
+
+def etag_produtos(request):
+    return gerar_etag(parametros_normalizados(request), alias_leitura(), *_marcadores_produtos())
+
+
+async def aetag_produtos(request):
+    return gerar_etag(parametros_normalizados(request), alias_leitura(), *await _amarcadores_produtos())
+
+
+# O historico do cliente cresce pelas compras, que atualizam o ResumoCliente na
+# mesma transacao (quantidade_compras sobe a cada transacao), e diminui por
+# remocoes, inclusive em cascata, que o signal de post_delete desconta do
+# resumo. Entao a linha do resumo e um marcador de uma leitura, sem agregar o
+# historico. O filtro `produto` compara o nome do produto: renomear um produto
+# muda as linhas que casam sem mudar o resumo, por isso nesse caso os
+# marcadores do catalogo tambem entram.
+
+def _filtra_por_produto(request):
+    return bool(request.query_params.get('produto'))
+
+
+def _marcador_cliente(cliente):
+    return ResumoCliente.objects.filter(cliente=cliente).values_list('quantidade_compras', 'ultima_compra').first()
+
+
+async def _amarcador_cliente(cliente):
+    return await ResumoCliente.objects.filter(cliente=cliente).values_list('quantidade_compras', 'ultima_compra').afirst()
+
+
+def etag_transacoes(request, cliente):
+    marcadores = _marcadores_produtos() if _filtra_por_produto(request) else ()
+    return gerar_etag(parametros_normalizados(request), cliente.pk, _marcador_cliente(cliente), *marcadores)
+
+
+async def aetag_transacoes(request, cliente):
+    marcadores = await _amarcadores_produtos() if _filtra_por_produto(request) else ()
+    return gerar_etag(parametros_normalizados(request), cliente.pk, await _amarcador_cliente(cliente), *marcadores)
+
+
+def etag_corresponde(request, etag):
+    cabecalho = request.META.get('HTTP_IF_NONE_MATCH')
+    if not cabecalho:
+        return False
+    # If-None-Match usa comparacao fraca, entao o prefixo W/ e ignorado
+    candidatos = [valor.strip() for valor in cabecalho.split(',')]
+    return '*' in candidatos or any(valor.removeprefix('W/') == etag for valor in candidatos)
+
+
+def nao_modificado(etag):
+    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
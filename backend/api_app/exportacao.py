@@ -0,0 +1,63 @@
+import csv
+import json
+from .serializers import TransacaoSerializer, aiterar_valores, iterar_valores
+
+
+# Exportacao do historico de transacoes. As linhas sao geradas a medida que o
+# cliente HTTP consome a resposta, lendo o banco em blocos de TAMANHO_BLOCO, entao
+# a memoria usada nao depende do tamanho do historico. Sob ASGI o gerador e
+# assincrono: com um iterador sincrono o Django consumiria a resposta inteira
+# antes de envia-la.
+
+TAMANHO_BLOCO = 2000
+FORMATOS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+}
+
+
+class _Eco:
+    # "arquivo" cujo write devolve a linha, para usar o csv.writer num gerador
+    def write(self, valor):
+        return valor
+
+
+def linhas_ndjson(itens):
+    for item in itens:
+        yield json.dumps(item, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def linhas_csv(itens, colunas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(colunas)
+    for item in itens:
+        yield escritor.writerow([item[coluna] for coluna in colunas])
+
+
+async def alinhas_ndjson(itens):
+    async for item in itens:
+        yield json.dumps(item, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+async def alinhas_csv(itens, colunas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(colunas)
+    async for item in itens:
+        yield escritor.writerow([item[coluna] for coluna in colunas])
+
+
+def exportar_transacoes(queryset, formato, assincrono=False):
+    # devolve (gerador de linhas, content type, extensao do arquivo)
+    if not queryset.ordered:
+        queryset = queryset.order_by('id')
+    content_type, extensao = FORMATOS[formato]
+    if assincrono:
+        itens = aiterar_valores(queryset, TransacaoSerializer, chunk_size=TAMANHO_BLOCO)
+        gerar_ndjson, gerar_csv = alinhas_ndjson, alinhas_csv
+    else:
+        itens = iterar_valores(queryset, TransacaoSerializer, chunk_size=TAMANHO_BLOCO)
+        gerar_ndjson, gerar_csv = linhas_ndjson, linhas_csv
+    if formato == 'csv':
+        colunas = list(TransacaoSerializer().fields)
+        return gerar_csv(itens, colunas), content_type, extensao
+    return gerar_ndjson(itens), content_type, extensao
@@ -0,0 +1,43 @@
+from .models import Produto, Transacao
+from .busca import buscar_por_nome
+
+
+ORDENACAO_PRODUTOS = ['estoque', 'preco']
+ORDENACAO_TRANSACOES = ['data', 'total']
+
+
+#filtros e ordenacao da listagem publica de produtos
+def filtrar_produtos(params):
+    queryset = Produto.objects.all()
+    ranqueado = False
+    nome = params.get('nome', None)
+    if nome:
+        queryset, ranqueado = buscar_por_nome(queryset, nome)
+
+    preco_max = params.get('preco_max', None)
+    if preco_max:
+        queryset = queryset.filter(preco__lte=preco_max)
+
+    ordenar_por = params.get('ordenar_por', None)
+    if ordenar_por in ORDENACAO_PRODUTOS:
+        queryset = queryset.order_by(ordenar_por)
+    elif ranqueado:
+        queryset = queryset.order_by('relevancia', 'id')
+    return queryset
+
+
+#filtros e ordenacao das transacoes de um cliente
+def filtrar_transacoes(cliente, params):
+    queryset = Transacao.objects.filter(cliente=cliente)
+    nome_produto = params.get('produto', None)
+    if nome_produto:
+        queryset = queryset.filter(produto__nome__icontains=nome_produto)
+
+    quantidade_min = params.get('quantidade_min', None)
+    if quantidade_min:
+        queryset = queryset.filter(quantidade__gte=quantidade_min)
+
+    ordenar_por = params.get('ordenar_por', None)
+    if ordenar_por in ORDENACAO_TRANSACOES:
+        queryset = queryset.order_by(ordenar_por)
+    return queryset
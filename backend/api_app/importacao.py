@@ -0,0 +1,107 @@
+import csv
+import io
+import json
+import time
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import empty
+from .catalogo import invalidar_catalogo
+from .models import Produto
+from .serializers import ProdutoSerializer
+
+
+# Importacao de produtos em massa. As linhas sao lidas do arquivo uma a uma,
+# validadas com os mesmos campos do ProdutoSerializer e gravadas com
+# bulk_create a cada `lote` produtos validos; linhas invalidas sao
+# informadas na resposta sem interromper a carga.
+
+LOTE_PADRAO = 1000
+MAX_LOTE = 5000
+MAX_ERROS = 100
+BLOCO_LEITURA = 64 * 1024
+
+
+def linhas_csv(arquivo):
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    yield from csv.DictReader(texto)
+
+
+def linhas_json(arquivo):
+    # le uma lista JSON de objetos aos poucos, sem carregar o arquivo inteiro
+    decodificador = json.JSONDecoder()
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig')
+    buffer = texto.read(BLOCO_LEITURA).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError("O JSON deve ser uma lista de produtos.")
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            objeto, fim = decodificador.raw_decode(buffer)
+        except json.JSONDecodeError:
+            mais = texto.read(BLOCO_LEITURA)
+            if not mais:
+                raise ValueError("JSON inválido.")
+            buffer += mais
+            continue
+        yield objeto
+        buffer = buffer[fim:]
+
+
+def validar_linha(campos, linha):
+    # devolve (dados, erros) usando os campos de escrita do ProdutoSerializer
+    if not isinstance(linha, dict):
+        return None, {"non_field_errors": ["Cada linha deve ser um objeto com nome, preco e estoque."]}
+    dados, erros = {}, {}
+    for nome, campo in campos:
+        try:
+            dados[nome] = campo.run_validation(linha.get(nome, empty))
+        except ValidationError as e:
+            erros[nome] = e.detail
+    return dados, erros
+
+
+def importar_produtos(linhas, lote=LOTE_PADRAO):
+    campos = [(nome, campo) for nome, campo in ProdutoSerializer().fields.items() if not campo.read_only]
+    criados = com_erro = 0
+    erros = []
+    pendentes = []
+    inicio = time.perf_counter()
+
+    def gravar():
+        nonlocal criados
+        if pendentes:
+            Produto.objects.bulk_create(pendentes)
+            criados += len(pendentes)
+            pendentes.clear()
+
+    numero = 0
+    try:
+        for numero, linha in enumerate(linhas, start=1):
+            dados, erros_linha = validar_linha(campos, linha)
+            if erros_linha:
+                com_erro += 1
+                if len(erros) < MAX_ERROS:
+                    erros.append({"linha": numero, "erros": erros_linha})
+                continue
+            pendentes.append(Produto(**dados))
+            if len(pendentes) >= lote:
+                gravar()
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        # arquivo malformado: o que ja foi lido e valido continua sendo gravado
+        com_erro += 1
+        erros.append({"linha": numero + 1, "erros": {"non_field_errors": [str(e)]}})
+    gravar()
+
+    if criados:
+        # bulk_create nao dispara signals, entao o cache do catalogo e invalidado aqui
+        invalidar_catalogo()
+    duracao = time.perf_counter() - inicio
+    return {
+        "criados": criados,
+        "com_erro": com_erro,
+        "erros": erros,
+        "duracao_segundos": round(duracao, 3),
+        "linhas_por_segundo": round((criados + com_erro) / duracao) if duracao else None,
+    }
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from django.core.management import call_command
+from django.db import connections, DEFAULT_DB_ALIAS
+
+
+# utilitarios compartilhados pelos comandos benchmark_*; o prefixo "_" impede
+# o Django de expor este modulo como comando
+
+
+@contextmanager
+def banco_temporario(options=None, conn_max_age=None):
+    # aponta o banco default para um arquivo SQLite descartavel, assim os
+    # benchmarks nunca tocam no db.sqlite3 de desenvolvimento
+    conexao = connections[DEFAULT_DB_ALIAS]
+    settings_dict = conexao.settings_dict
+    original = {chave: settings_dict.get(chave) for chave in ('NAME', 'OPTIONS', 'CONN_MAX_AGE')}
+    diretorio = tempfile.mkdtemp(prefix='bench_')
+
+    connections.close_all()
+    settings_dict['NAME'] = os.path.join(diretorio, 'bench.sqlite3')
+    if options is not None:
+        settings_dict['OPTIONS'] = options
+    if conn_max_age is not None:
+        settings_dict['CONN_MAX_AGE'] = conn_max_age
+    try:
+        call_command('migrate', verbosity=0, interactive=False)
+        yield settings_dict['NAME']
+    finally:
+        connections.close_all()
+        settings_dict.update(original)
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+def executar_concorrente(funcao, tarefas, threads):
+    # distribui as tarefas entre as threads e devolve (latencias, erros, duracao)
+    latencias = []
+    erros = []
+    trava = threading.Lock()
+    fila = list(tarefas)
+    fila.reverse()
+
+    def trabalhador():
+        try:
+            while True:
+                with trava:
+                    if not fila:
+                        return
+                    tarefa = fila.pop()
+                inicio = time.perf_counter()
+                try:
+                    funcao(*tarefa)
+                except Exception as e:
+                    with trava:
+                        erros.append(e)
+                else:
+                    with trava:
+                        latencias.append(time.perf_counter() - inicio)
+        finally:
+            connections.close_all()
+
+    inicio = time.perf_counter()
+    workers = [threading.Thread(target=trabalhador) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return latencias, erros, time.perf_counter() - inicio
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+def resumo(nome, latencias, erros, duracao):
+    total = len(latencias) + len(erros)
+    return (
+        f"{nome}: {total} operações em {duracao:.2f}s "
+        f"({len(latencias) / duracao if duracao else 0:.0f} ok/s), "
+        f"erros={len(erros)}, p50={percentil(latencias, 50) * 1000:.1f}ms, "
+        f"p99={percentil(latencias, 99) * 1000:.1f}ms"
+    )
@@ -0,0 +1,48 @@
+import random
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from api_app.agrupamento import AgrupadorCompras
+from api_app.compras import realizar_compra
+from api_app.models import Produto, Cliente, Transacao
+from ._bench import banco_temporario, executar_concorrente, resumo
+
+
+class Command(BaseCommand):
+    help = "Compara compras com uma transação por requisição e agrupadas (group commit)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compras', type=int, default=3000)
+        parser.add_argument('--threads', type=int, default=32)
+        parser.add_argument('--produtos', type=int, default=50)
+        parser.add_argument('--clientes', type=int, default=50)
+        parser.add_argument('--janela-ms', type=float, default=2)
+        parser.add_argument('--max-lote', type=int, default=32)
+
+    def handle(self, *args, **options):
+        with banco_temporario():
+            self.stdout.write(self.executar('uma transação por compra', realizar_compra, options))
+        with banco_temporario(), override_settings(COMPRAS_JANELA_MS=options['janela_ms'], COMPRAS_MAX_LOTE=options['max_lote']):
+            agrupador = AgrupadorCompras()
+            linha = self.executar('agrupadas', agrupador.executar, options)
+            self.stdout.write(f"{linha}, transações por lote={options['compras'] / max(agrupador.lotes, 1):.1f}")
+
+    def executar(self, nome, funcao, options):
+        clientes = [
+            Cliente.objects.create(
+                user=User.objects.create_user(username=f'bench{i}', password='bench'),
+                saldo=Decimal(options['compras']) * 10,
+            )
+            for i in range(options['clientes'])
+        ]
+        produtos = [
+            Produto.objects.create(nome=f'Bench {i}', preco=Decimal('1.00'), estoque=options['compras'])
+            for i in range(options['produtos'])
+        ]
+        tarefas = [(random.choice(clientes).id, random.choice(produtos).id, 1) for _ in range(options['compras'])]
+
+        latencias, erros, duracao = executar_concorrente(funcao, tarefas, options['threads'])
+        vendidos = sum(options['compras'] - p.estoque for p in Produto.objects.all())
+        transacoes = Transacao.objects.count()
+        return resumo(nome, latencias, erros, duracao) + f", transações={transacoes}, perdidas(estoque)={transacoes - vendidos}"
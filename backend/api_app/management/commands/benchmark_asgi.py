@@ -0,0 +1,153 @@
+import asyncio
+import io
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from rest_framework_simplejwt.tokens import RefreshToken
+from api_app.models import Produto, Cliente, Transacao
+from ._bench import banco_temporario, resumo
+
+
+HOST = 'localhost'
+
+
+class Command(BaseCommand):
+    help = "Compara as listagens em workers WSGI (views DRF) e no ASGI (views async) com clientes lentos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requisicoes', type=int, default=1000)
+        parser.add_argument('--clientes', type=int, default=500, help="Conexões simultâneas")
+        parser.add_argument('--workers', type=int, default=8, help="Threads do servidor WSGI")
+        parser.add_argument('--atraso-ms', type=float, default=200, help="Tempo que cada cliente lento leva para receber a resposta")
+        parser.add_argument('--produtos', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with banco_temporario():
+            pedidos = self.popular(options)
+            self.stdout.write(self.medir(f"WSGI ({options['workers']} workers)", self.executar_wsgi, pedidos, options))
+            self.stdout.write(self.medir("ASGI (views async, 1 processo)", self.executar_asgi, pedidos, options))
+
+    def popular(self, options):
+        user = User.objects.create_user(username='bench', password='bench')
+        cliente = Cliente.objects.create(user=user, saldo=Decimal('1000.00'))
+        produtos = Produto.objects.bulk_create([
+            Produto(nome=f'Bench {i}', preco=Decimal('1.00') + i % 100, estoque=i)
+            for i in range(options['produtos'])
+        ])
+        Transacao.objects.bulk_create([
+            Transacao(cliente=cliente, produto=random.choice(produtos), quantidade=1, total=Decimal('1.00'))
+            for _ in range(500)
+        ])
+        token = 'Bearer ' + str(RefreshToken.for_user(user).access_token)
+        # metade listagem publica (paginas variadas, para nao ficar so no
+        # cache de respostas) e metade transacoes do cliente
+        pedidos = []
+        for _ in range(options['requisicoes']):
+            if random.random() < 0.5:
+                pedidos.append(('/api/produtos/', f'pagina={random.randint(1, 50)}&preco_max={random.randint(1, 100)}', None))
+            else:
+                pedidos.append(('/api/transacoes/', f'pagina={random.randint(1, 50)}', token))
+        return pedidos
+
+    def medir(self, nome, executar, pedidos, options):
+        latencias, erros = [], []
+        inicio = time.perf_counter()
+        asyncio.run(executar(pedidos, latencias, erros, options))
+        connections.close_all()
+        return resumo(nome, latencias, erros, time.perf_counter() - inicio)
+
+    async def clientes(self, pedidos, atender, latencias, erros, options):
+        # cada cliente faz uma requisicao por vez; a latencia inclui a espera
+        # por um worker livre
+        fila = list(pedidos)
+
+        async def cliente():
+            while fila:
+                pedido = fila.pop()
+                inicio = time.perf_counter()
+                status_code = await atender(*pedido)
+                if status_code == 200:
+                    latencias.append(time.perf_counter() - inicio)
+                else:
+                    erros.append(status_code)
+
+        await asyncio.gather(*(cliente() for _ in range(options['clientes'])))
+
+    async def executar_wsgi(self, pedidos, latencias, erros, options):
+        aplicacao = WSGIHandler()
+        atraso = options['atraso_ms'] / 1000
+        loop = asyncio.get_running_loop()
+
+        def atender_bloqueando(caminho, query, token):
+            ambiente = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': caminho, 'QUERY_STRING': query,
+                'SERVER_NAME': HOST, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': HOST,
+                'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(),
+                'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+            }
+            if token:
+                ambiente['HTTP_AUTHORIZATION'] = token
+            resultado = {}
+
+            def start_response(status_linha, headers):
+                resultado['status'] = int(status_linha.split()[0])
+            corpo = aplicacao(ambiente, start_response)
+            try:
+                b''.join(corpo)
+                # o worker fica preso enquanto o cliente lento recebe a resposta
+                time.sleep(atraso)
+            finally:
+                corpo.close()
+            return resultado['status']
+
+        with ThreadPoolExecutor(options['workers']) as workers:
+            async def atender(*pedido):
+                return await loop.run_in_executor(workers, atender_bloqueando, *pedido)
+            try:
+                await self.clientes(pedidos, atender, latencias, erros, options)
+            finally:
+                # as conexoes ficam nas threads dos workers
+                await asyncio.gather(*(loop.run_in_executor(workers, connections.close_all) for _ in range(options['workers'])))
+
+    async def executar_asgi(self, pedidos, latencias, erros, options):
+        aplicacao = ASGIHandler()
+        atraso = options['atraso_ms'] / 1000
+
+        async def atender(caminho, query, token):
+            headers = [(b'host', HOST.encode())]
+            if token:
+                headers.append((b'authorization', token.encode()))
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': caminho, 'raw_path': caminho.encode(), 'query_string': query.encode(),
+                'root_path': '', 'headers': headers, 'client': ('127.0.0.1', 0), 'server': (HOST, 80),
+            }
+            corpo_lido = False
+            resultado = {}
+
+            async def receive():
+                nonlocal corpo_lido
+                if not corpo_lido:
+                    corpo_lido = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # o cliente nao desconecta; o Django cancela esta espera no fim
+                await asyncio.Event().wait()
+
+            async def send(mensagem):
+                if mensagem['type'] == 'http.response.start':
+                    resultado['status'] = mensagem['status']
+                elif not mensagem.get('more_body'):
+                    # o cliente lento so prende a corrotina, nao uma thread
+                    await asyncio.sleep(atraso)
+
+            await aplicacao(scope, receive, send)
+            return resultado['status']
+
+        await self.clientes(pedidos, atender, latencias, erros, options)
@@ -0,0 +1,109 @@
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import ExitStack
+from unittest import mock
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+from api_app.serializers import TokenRefreshSerializer
+from api_app.tokens import RefreshToken, lista_negra
+from ._bench import banco_temporario, percentil
+
+
+class Command(BaseCommand):
+    help = "Mede o refresh de tokens com a blacklist cheia, com e sem o filtro de Bloom"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--revogados', type=int, default=1000000)
+        parser.add_argument('--refreshes', type=int, default=2000)
+        parser.add_argument('--lote', type=int, default=20000)
+        parser.add_argument(
+            '--cache-arquivo', action='store_true',
+            help="usa um FileBasedCache temporario, em que ler a versao custa uma ida ao cache como num backend compartilhado",
+        )
+
+    def handle(self, *args, **options):
+        with ExitStack() as pilha:
+            pilha.enter_context(banco_temporario())
+            # um unico processo: o filtro pode ficar ligado mesmo com o locmem
+            pilha.enter_context(override_settings(LISTA_NEGRA_BLOOM=True))
+            if options['cache_arquivo']:
+                diretorio = tempfile.mkdtemp(prefix='bench_cache_')
+                pilha.callback(shutil.rmtree, diretorio, ignore_errors=True)
+                pilha.enter_context(override_settings(CACHES={'default': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': diretorio,
+                }}))
+            self.medir(options)
+
+    def medir(self, options):
+        user = User.objects.create_user(username='bench', password='bench')
+        self.popular(user, options['revogados'], options['lote'])
+
+        lista_negra.limpar()
+        inicio = time.perf_counter()
+        lista_negra.pode_estar_revogado('aquecimento')
+        self.stdout.write(
+            f"filtro reconstruido em {time.perf_counter() - inicio:.2f}s "
+            f"({len(lista_negra._filtro.bits) / 1024 / 1024:.1f} MiB, "
+            f"{lista_negra._filtro.num_hashes} hashes)"
+        )
+
+        for nome, token_class, serializer_class, intervalo_versao in (
+            ('consulta direta', BaseRefreshToken, BaseTokenRefreshSerializer, None),
+            # le a versao compartilhada em toda verificacao
+            ('filtro, versao sempre', RefreshToken, TokenRefreshSerializer, 0),
+            ('filtro de bloom', RefreshToken, TokenRefreshSerializer, None),
+        ):
+            with ExitStack() as pilha:
+                if intervalo_versao is not None:
+                    pilha.enter_context(mock.patch('api_app.tokens.INTERVALO_VERSAO', intervalo_versao))
+                self.medir_refreshes(nome, user, token_class, serializer_class, options['refreshes'])
+
+    def medir_refreshes(self, nome, user, token_class, serializer_class, refreshes):
+        tokens = [str(token_class.for_user(user)) for _ in range(refreshes)]
+
+        # so a verificacao da blacklist, que e o que o filtro evita
+        tempos = []
+        for token in tokens:
+            inicio = time.perf_counter()
+            token_class(token)
+            tempos.append(time.perf_counter() - inicio)
+        self.stdout.write(self.linha(f'{nome} (verificacao)', tempos))
+
+        # o refresh completo, com rotacao e blacklist do token antigo
+        tempos = []
+        for token in tokens:
+            inicio = time.perf_counter()
+            serializer = serializer_class(data={'refresh': token})
+            serializer.is_valid(raise_exception=True)
+            tempos.append(time.perf_counter() - inicio)
+        self.stdout.write(self.linha(f'{nome} (refresh)', tempos))
+
+    def linha(self, nome, tempos):
+        total = sum(tempos)
+        return (
+            f"{nome}: {len(tempos)} tokens em {total:.2f}s ({len(tempos) / total:.0f}/s), "
+            f"p50={percentil(tempos, 50) * 1000:.2f}ms, p99={percentil(tempos, 99) * 1000:.2f}ms"
+        )
+
+    def popular(self, user, total, lote):
+        inicio = time.perf_counter()
+        agora = timezone.now()
+        for base in range(0, total, lote):
+            outstanding = OutstandingToken.objects.bulk_create([
+                OutstandingToken(
+                    user=user, jti=uuid.uuid4().hex, token='bench',
+                    created_at=agora, expires_at=agora + timedelta(days=1),
+                )
+                for _ in range(min(lote, total - base))
+            ])
+            BlacklistedToken.objects.bulk_create([BlacklistedToken(token=token) for token in outstanding])
+        self.stdout.write(f"{total} tokens revogados criados em {time.perf_counter() - inicio:.1f}s")
@@ -0,0 +1,66 @@
+import random
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from api_app.busca import buscar_por_nome
+from api_app.models import Produto
+from ._bench import banco_temporario, percentil
+
+
+SILABAS = ['ca', 'fe', 'cho', 'co', 'la', 'te', 'ga', 'rra', 'fa', 'ter', 'mi', 'fil', 'tro', 'moe', 'dor', 'xi', 'bu', 'le', 'pren', 'sa']
+
+
+def gerar_vocabulario(tamanho):
+    # palavras sinteticas para que cada termo case com uma fracao pequena do
+    # catalogo, como numa busca real por nome
+    vocabulario = set()
+    while len(vocabulario) < tamanho:
+        vocabulario.add(''.join(random.choices(SILABAS, k=random.randint(2, 4))))
+    return sorted(vocabulario)
+
+
+class Command(BaseCommand):
+    help = "Compara a busca por nome com icontains e com o índice FTS5"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produtos', type=int, default=100000)
+        parser.add_argument('--buscas', type=int, default=50)
+        parser.add_argument('--lote', type=int, default=5000)
+        parser.add_argument('--vocabulario', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        with banco_temporario():
+            vocabulario = gerar_vocabulario(options['vocabulario'])
+            self.popular(vocabulario, options['produtos'], options['lote'])
+            termos = [random.choice(vocabulario) for _ in range(options['buscas'])]
+
+            for nome, filtrar in (
+                ('icontains', lambda termo: (Produto.objects.filter(nome__icontains=termo), False)),
+                ('fts5', lambda termo: buscar_por_nome(Produto.objects.all(), termo)),
+            ):
+                tempos = []
+                for termo in termos:
+                    inicio = time.perf_counter()
+                    queryset, ranqueado = filtrar(termo)
+                    if ranqueado:
+                        queryset = queryset.order_by('relevancia', 'id')
+                    queryset.count()
+                    list(queryset[:10])
+                    tempos.append(time.perf_counter() - inicio)
+                self.stdout.write(
+                    f"{nome}: {len(termos)} buscas em {options['produtos']} produtos, "
+                    f"p50={percentil(tempos, 50) * 1000:.1f}ms, p99={percentil(tempos, 99) * 1000:.1f}ms"
+                )
+
+    def popular(self, vocabulario, total, lote):
+        inicio = time.perf_counter()
+        for base in range(0, total, lote):
+            Produto.objects.bulk_create([
+                Produto(
+                    nome=' '.join(random.sample(vocabulario, 3)),
+                    preco=Decimal(random.randint(100, 100000)) / 100,
+                    estoque=random.randint(0, 100),
+                )
+                for _ in range(min(lote, total - base))
+            ])
+        self.stdout.write(f"{total} produtos criados em {time.perf_counter() - inicio:.1f}s")
@@ -0,0 +1,58 @@
+import random
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from api_app.compras import realizar_compra
+from api_app.saldos import saldo_atual
+from api_app.models import Produto, Cliente, Transacao
+from ._bench import banco_temporario, executar_concorrente, resumo
+
+
+def compra_legada(cliente_id, produto_id, quantidade):
+    # reproduz o fluxo antigo da CompraView (ler, conferir em Python e salvar)
+    cliente = Cliente.objects.get(id=cliente_id)
+    produto = Produto.objects.get(id=produto_id)
+    total = produto.preco * quantidade
+    if cliente.saldo < total or produto.estoque < quantidade:
+        raise ValueError("Saldo ou estoque insuficiente")
+    cliente.saldo -= total
+    produto.estoque -= quantidade
+    cliente.save()
+    produto.save()
+    Transacao.objects.create(cliente=cliente, produto=produto, quantidade=quantidade, total=total)
+
+
+class Command(BaseCommand):
+    help = "Compara o caminho de compra legado com o de UPDATE condicional sob concorrência"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compras', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--produtos', type=int, default=8)
+
+    def handle(self, *args, **options):
+        for nome, funcao in (('legado', compra_legada), ('update condicional', realizar_compra)):
+            with banco_temporario():
+                self.stdout.write(self.executar(nome, funcao, options))
+
+    def executar(self, nome, funcao, options):
+        user = User.objects.create_user(username='bench', password='bench')
+        estoque_inicial = options['compras']
+        cliente = Cliente.objects.create(user=user, saldo=Decimal(options['compras']) * 10)
+        produtos = [
+            Produto.objects.create(nome=f'Bench {i}', preco=Decimal('1.00'), estoque=estoque_inicial)
+            for i in range(options['produtos'])
+        ]
+        tarefas = [(cliente.id, random.choice(produtos).id, 1) for _ in range(options['compras'])]
+
+        latencias, erros, duracao = executar_concorrente(funcao, tarefas, options['threads'])
+
+        # atualizacoes perdidas: compras confirmadas que nao aparecem no estoque/saldo
+        vendidos = sum(estoque_inicial - p.estoque for p in Produto.objects.all())
+        gasto = Decimal(options['compras']) * 10 - saldo_atual(cliente.id)
+        transacoes = Transacao.objects.count()
+        return (
+            resumo(nome, latencias, erros, duracao)
+            + f", transações={transacoes}, perdidas(estoque)={transacoes - vendidos},"
+            f" perdidas(saldo)={transacoes - int(gasto)}"
+        )
@@ -0,0 +1,47 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from api_app.compras import realizar_compra
+from api_app.estoque import estoque_total, fatiar
+from api_app.models import Produto, Cliente, Transacao
+from ._bench import banco_temporario, executar_concorrente, resumo
+
+
+class Command(BaseCommand):
+    help = "Compara compras concorrentes de um único produto com estoque em uma linha e fatiado"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compras', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--fatias', type=int, default=16)
+        parser.add_argument('--clientes', type=int, default=16, help="Compradores distintos (evita disputar o saldo)")
+
+    def handle(self, *args, **options):
+        for fatias in (None, options['fatias']):
+            with banco_temporario():
+                self.stdout.write(self.executar(fatias, options))
+
+    def executar(self, fatias, options):
+        # estoque menor que o numero de compras, para medir tambem a disputa pelas ultimas unidades
+        estoque_inicial = options['compras'] * 3 // 4
+        produto = Produto.objects.create(nome='Promoção', preco=Decimal('1.00'), estoque=estoque_inicial)
+        if fatias:
+            fatiar(produto.id, fatias)
+        clientes = [
+            Cliente.objects.create(
+                user=User.objects.create_user(username=f'bench{i}', password='bench'),
+                saldo=Decimal(options['compras']),
+            )
+            for i in range(options['clientes'])
+        ]
+        tarefas = [(clientes[i % len(clientes)].id, produto.id, 1) for i in range(options['compras'])]
+
+        latencias, erros, duracao = executar_concorrente(realizar_compra, tarefas, options['threads'])
+
+        restante = estoque_total(produto.id) if fatias else Produto.objects.get(id=produto.id).estoque
+        transacoes = Transacao.objects.count()
+        nome = f"{fatias} fatias" if fatias else "linha única"
+        return (
+            resumo(nome, latencias, erros, duracao)
+            + f", transações={transacoes}, vendido={estoque_inicial - restante}, estoque final={restante}"
+        )
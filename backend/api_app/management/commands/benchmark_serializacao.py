@@ -0,0 +1,55 @@
+import random
+import time
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from api_app.models import Produto, Cliente, Transacao
+from api_app.serializers import ProdutoSerializer, TransacaoSerializer, serializar_valores
+from ._bench import banco_temporario, percentil
+
+
+class Command(BaseCommand):
+    help = "Compara o custo de CPU do ModelSerializer e de serializar_valores em páginas grandes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--itens', type=int, default=1000, help="Itens por página")
+        parser.add_argument('--repeticoes', type=int, default=50)
+
+    def handle(self, *args, **options):
+        itens = options['itens']
+        with banco_temporario():
+            user = User.objects.create_user(username='bench', password='bench')
+            cliente = Cliente.objects.create(user=user, saldo=Decimal('1000000.00'))
+            produtos = Produto.objects.bulk_create([
+                Produto(nome=f'Produto {i}', preco=Decimal(random.randint(100, 100000)) / 100, estoque=random.randint(0, 100))
+                for i in range(itens)
+            ])
+            Transacao.objects.bulk_create([
+                Transacao(cliente=cliente, produto=produto, quantidade=1, total=produto.preco)
+                for produto in produtos
+            ])
+
+            for nome_model, queryset, serializer_class in (
+                ('produtos', Produto.objects.order_by('id')[:itens], ProdutoSerializer),
+                ('transacoes', Transacao.objects.order_by('id')[:itens], TransacaoSerializer),
+            ):
+                esperado = JSONRenderer().render(serializer_class(queryset, many=True).data)
+                if JSONRenderer().render(serializar_valores(queryset, serializer_class)) != esperado:
+                    self.stderr.write(f"{nome_model}: saídas diferentes!")
+                    continue
+
+                for nome, serializar in (
+                    ('ModelSerializer', lambda: serializer_class(queryset, many=True).data),
+                    ('values_list', lambda: serializar_valores(queryset, serializer_class)),
+                ):
+                    tempos = []
+                    for _ in range(options['repeticoes']):
+                        # tempo de CPU do processo: consulta + serializacao
+                        inicio = time.process_time()
+                        serializar()
+                        tempos.append(time.process_time() - inicio)
+                    self.stdout.write(
+                        f"{nome_model} / {nome}: páginas de {itens} itens, "
+                        f"p50={percentil(tempos, 50) * 1000:.1f}ms CPU, p99={percentil(tempos, 99) * 1000:.1f}ms CPU"
+                    )
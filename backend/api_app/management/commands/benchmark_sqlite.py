@@ -0,0 +1,80 @@
+import random
+import time
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from api_app.compras import realizar_compra
+from api_app.filtros import filtrar_produtos
+from api_app.models import Produto, Cliente
+from api_app.serializers import ProdutoSerializer, serializar_valores
+from ._bench import banco_temporario, executar_concorrente, percentil, resumo
+
+
+class Command(BaseCommand):
+    help = "Compara o SQLite sem ajustes com o perfil de desempenho (PRAGMAs e conexões persistentes) em carga mista"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operacoes', type=int, default=4000)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--escritas', type=float, default=0.2, help="Fração das operações que são compras")
+        parser.add_argument('--produtos', type=int, default=200)
+
+    def handle(self, *args, **options):
+        perfis = (
+            ('sem ajustes', {}, 0),
+            ('perfil de desempenho', settings.SQLITE_PERFIL_DESEMPENHO, 600),
+        )
+        for nome, opcoes, conn_max_age in perfis:
+            with banco_temporario(opcoes, conn_max_age):
+                self.stdout.write(self.executar(nome, options))
+
+    def executar(self, nome, options):
+        clientes = [
+            Cliente.objects.create(
+                user=User.objects.create_user(username=f'bench{i}', password='bench'),
+                saldo=Decimal(options['operacoes']) * 10,
+            )
+            for i in range(options['threads'])
+        ]
+        produtos = [
+            Produto.objects.create(nome=f'Bench {i}', preco=Decimal('1.00'), estoque=options['operacoes'])
+            for i in range(options['produtos'])
+        ]
+        latencias = {'leitura': [], 'escrita': []}
+
+        def requisicao(tipo, cliente_id, produto_id):
+            # cada operacao simula uma requisicao: o Django chama
+            # close_old_connections no inicio e no fim, que so mantem a conexao
+            # aberta se CONN_MAX_AGE permitir
+            close_old_connections()
+            try:
+                if tipo == 'escrita':
+                    realizar_compra(cliente_id, produto_id, 1)
+                else:
+                    preco_max = random.randint(1, 2)
+                    serializar_valores(filtrar_produtos({'preco_max': preco_max, 'ordenar_por': 'estoque'})[:20], ProdutoSerializer)
+            finally:
+                close_old_connections()
+
+        def medir(tipo, *argumentos):
+            inicio = time.perf_counter()
+            requisicao(tipo, *argumentos)
+            latencias[tipo].append(time.perf_counter() - inicio)
+
+        tarefas = [
+            ('escrita' if random.random() < options['escritas'] else 'leitura', random.choice(clientes).id, random.choice(produtos).id)
+            for _ in range(options['operacoes'])
+        ]
+        total, erros, duracao = executar_concorrente(medir, tarefas, options['threads'])
+
+        bloqueios = sum('locked' in str(e) for e in erros)
+        return (
+            resumo(nome, total, erros, duracao)
+            + f", bloqueios={bloqueios}"
+            + "".join(
+                f", {tipo} p99={percentil(valores, 99) * 1000:.1f}ms"
+                for tipo, valores in latencias.items()
+            )
+        )
@@ -0,0 +1,43 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import OperationalError
+from django.db.models import Count
+from api_app.models import MovimentoSaldo
+from api_app.saldos import compactar
+
+
+class Command(BaseCommand):
+    help = "Incorpora ao saldo dos clientes os movimentos pendentes do livro-razão"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minimo', type=int, default=1, help="Só compacta clientes com pelo menos N movimentos pendentes")
+        parser.add_argument('--tentativas', type=int, default=3, help="Tentativas por cliente se o banco estiver ocupado")
+
+    def handle(self, *args, **options):
+        # a lista e lida antes das escritas; cada cliente e compactado na sua
+        # propria transacao curta
+        clientes = list(
+            MovimentoSaldo.objects.filter(incorporado=False)
+            .values('cliente_id')
+            .annotate(pendentes=Count('id'))
+            .filter(pendentes__gte=options['minimo'])
+            .order_by('cliente_id')
+            .values_list('cliente_id', flat=True)
+        )
+        compactados = movimentos = falhas = 0
+        inicio = time.perf_counter()
+        for cliente_id in clientes:
+            for tentativa in range(options['tentativas']):
+                try:
+                    movimentos += compactar(cliente_id)
+                    compactados += 1
+                    break
+                except OperationalError:
+                    time.sleep(0.05 * (tentativa + 1))
+            else:
+                falhas += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{compactados} clientes compactados ({movimentos} movimentos) em "
+            f"{time.perf_counter() - inicio:.2f}s, {falhas} falhas."
+        ))
@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from api_app.emails import enviar_pendentes
+
+
+class Command(BaseCommand):
+    help = "Envia os e-mails pendentes da fila em lotes, reaproveitando a conexão SMTP"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=50, help="E-mails enviados por conexão SMTP")
+        parser.add_argument('--continuo', action='store_true', help="Continua rodando e verificando a fila")
+        parser.add_argument('--intervalo', type=float, default=2.0, help="Segundos de espera com a fila vazia")
+
+    def handle(self, *args, **options):
+        total_enviados = total_falhas = 0
+        while True:
+            enviados, falhas = enviar_pendentes(options['lote'])
+            total_enviados += enviados
+            total_falhas += falhas
+            if enviados or falhas:
+                self.stdout.write(f"Lote processado: {enviados} enviados, {falhas} falhas.")
+                # lote cheio: provavelmente ha mais na fila
+                if enviados + falhas == options['lote']:
+                    continue
+            if not options['continuo']:
+                break
+            close_old_connections()
+            time.sleep(options['intervalo'])
+
+        self.stdout.write(self.style.SUCCESS(f"Total: {total_enviados} enviados, {total_falhas} falhas."))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from api_app.estoque import FATIAS_PADRAO, MAX_FATIAS, fatiar, juntar, sincronizar
+from api_app.models import Produto
+
+
+class Command(BaseCommand):
+    help = "Divide o estoque de produtos muito disputados em fatias (ou junta de volta)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('produtos', nargs='*', type=int, help="IDs dos produtos")
+        parser.add_argument('--fatias', type=int, default=FATIAS_PADRAO, help="Número de fatias por produto")
+        parser.add_argument('--juntar', action='store_true', help="Volta o estoque para uma única linha")
+        parser.add_argument('--sincronizar', action='store_true', help="Copia a soma das fatias para o estoque dos produtos fatiados")
+
+    def handle(self, *args, **options):
+        if options['sincronizar']:
+            atualizados = sincronizar()
+            self.stdout.write(self.style.SUCCESS(f"{atualizados} produtos sincronizados."))
+            return
+        if not options['produtos']:
+            raise CommandError("Informe os IDs dos produtos.")
+        if not 1 <= options['fatias'] <= MAX_FATIAS:
+            raise CommandError(f"--fatias deve estar entre 1 e {MAX_FATIAS}.")
+
+        for produto_id in options['produtos']:
+            if options['juntar']:
+                total = juntar(produto_id)
+                if total is None:
+                    self.stdout.write(f"Produto {produto_id} não tem estoque fatiado.")
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"Produto {produto_id}: fatias juntadas, estoque {total}."))
+                continue
+            try:
+                total = fatiar(produto_id, options['fatias'])
+            except Produto.DoesNotExist:
+                raise CommandError(f"Produto {produto_id} não encontrado.")
+            self.stdout.write(self.style.SUCCESS(
+                f"Produto {produto_id}: estoque {total} dividido em {options['fatias']} fatias."
+            ))
@@ -0,0 +1,60 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
+
+
+class Command(BaseCommand):
+    help = "Remove os tokens expirados da blacklist em faixas de id, com transações curtas"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=2000, help="Tamanho de cada faixa de ids")
+        parser.add_argument('--pausa', type=float, default=0.0, help="Segundos de espera entre as faixas")
+        parser.add_argument('--dry-run', action='store_true', help="Só conta o que seria removido")
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        if lote < 1:
+            self.stderr.write("O lote deve ser maior que zero.")
+            return
+
+        # o corte e fixado no inicio para que a execucao tenha um alvo estavel
+        corte = timezone.now()
+        faixa = OutstandingToken.objects.aggregate(inicio=Min('id'), fim=Max('id'))
+        if faixa['inicio'] is None:
+            self.stdout.write(self.style.SUCCESS("Nenhum token para remover."))
+            return
+
+        total_outstanding = total_blacklisted = 0
+        inicio = time.perf_counter()
+        for base in range(faixa['inicio'], faixa['fim'] + 1, lote):
+            outstanding = OutstandingToken.objects.filter(
+                id__gte=base, id__lt=base + lote, expires_at__lt=corte
+            )
+            blacklisted = BlacklistedToken.objects.filter(
+                token_id__gte=base, token_id__lt=base + lote, token__expires_at__lt=corte
+            )
+            if options['dry_run']:
+                total_blacklisted += blacklisted.count()
+                total_outstanding += outstanding.count()
+                continue
+
+            # uma transacao por faixa: o lock de escrita do SQLite fica preso
+            # so pelo tempo de apagar um lote
+            with transaction.atomic():
+                # a blacklist sai primeiro, assim o delete dos tokens nao
+                # precisa carregar as linhas relacionadas para o cascade
+                total_blacklisted += blacklisted.delete()[0]
+                total_outstanding += outstanding.delete()[0]
+            if options['pausa']:
+                time.sleep(options['pausa'])
+
+        duracao = time.perf_counter() - inicio
+        total = total_outstanding + total_blacklisted
+        acao = "seriam removidos" if options['dry_run'] else "removidos"
+        self.stdout.write(self.style.SUCCESS(
+            f"{total_outstanding} tokens e {total_blacklisted} entradas da blacklist {acao} "
+            f"em {duracao:.2f}s ({total / duracao if duracao else 0:.0f} linhas/s)."
+        ))
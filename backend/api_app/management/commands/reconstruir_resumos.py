@@ -0,0 +1,52 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+from api_app.models import Cliente, ResumoCliente
+from api_app.resumos import calcular_resumos, resumo_difere
+
+
+class Command(BaseCommand):
+    help = "Recalcula o resumo de gastos dos clientes a partir das transações, em lotes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help="Clientes por lote")
+        parser.add_argument('--verificar', action='store_true', help="Só compara e informa as divergências")
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        if lote < 1:
+            self.stderr.write("O lote deve ser maior que zero.")
+            return
+
+        faixa = Cliente.objects.aggregate(inicio=Min('id'), fim=Max('id'))
+        if faixa['inicio'] is None:
+            self.stdout.write(self.style.SUCCESS("Nenhum cliente encontrado."))
+            return
+
+        clientes = divergentes = 0
+        inicio = time.perf_counter()
+        for base in range(faixa['inicio'], faixa['fim'] + 1, lote):
+            # cada lote le e grava na mesma transacao curta
+            with transaction.atomic():
+                ids = list(Cliente.objects.filter(id__gte=base, id__lt=base + lote).values_list('id', flat=True))
+                esperados = calcular_resumos(ids)
+                atuais = ResumoCliente.objects.in_bulk(ids)
+                for cliente_id in ids:
+                    esperado = esperados.get(cliente_id, ResumoCliente(cliente_id=cliente_id))
+                    atual = atuais.get(cliente_id, ResumoCliente(cliente_id=cliente_id))
+                    if resumo_difere(atual, esperado):
+                        divergentes += 1
+                        if options['verificar']:
+                            self.stdout.write(f"Cliente {cliente_id}: resumo divergente.")
+                clientes += len(ids)
+
+                if not options['verificar']:
+                    ResumoCliente.objects.filter(cliente_id__in=ids).delete()
+                    ResumoCliente.objects.bulk_create(esperados.values())
+
+        duracao = time.perf_counter() - inicio
+        acao = "encontrados" if options['verificar'] else "corrigidos"
+        self.stdout.write(self.style.SUCCESS(
+            f"{clientes} clientes processados em {duracao:.2f}s, {divergentes} resumos divergentes {acao}."
+        ))
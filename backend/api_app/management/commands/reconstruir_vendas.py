@@ -0,0 +1,45 @@
+import time
+from datetime import datetime, time as hora
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from api_app.models import Transacao, VendaDiaria
+from api_app.vendas import consolidar
+
+
+class Command(BaseCommand):
+    help = "Recalcula o consolidado diário de vendas a partir das transações"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="Recalcula só a partir deste dia (AAAA-MM-DD); padrão: todo o histórico")
+        parser.add_argument('--lote', type=int, default=5000, help="Linhas lidas/gravadas por vez")
+
+    def handle(self, *args, **options):
+        transacoes = Transacao.objects.only('data', 'produto_id', 'quantidade', 'total')
+        consolidado_existente = VendaDiaria.objects.all()
+        if options['desde']:
+            desde = parse_date(options['desde'])
+            if desde is None:
+                raise CommandError("Data inválida em --desde. Use o formato AAAA-MM-DD.")
+            # inicio do dia no fuso ativo, o mesmo usado para consolidar as compras
+            transacoes = transacoes.filter(data__gte=timezone.make_aware(datetime.combine(desde, hora.min)))
+            consolidado_existente = consolidado_existente.filter(data__gte=desde)
+
+        inicio = time.perf_counter()
+        # leitura e gravacao na mesma transacao, para que uma compra concorrente
+        # nao seja somada duas vezes nem perdida
+        with transaction.atomic():
+            consolidado = consolidar(transacoes.iterator(chunk_size=options['lote']))
+            consolidado_existente.delete()
+            VendaDiaria.objects.bulk_create(
+                [
+                    VendaDiaria(data=data, produto_id=produto_id, quantidade=quantidade, receita=receita, transacoes=total)
+                    for (data, produto_id), (quantidade, receita, total) in consolidado.items()
+                ],
+                batch_size=options['lote'],
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(consolidado)} linhas de consolidado recalculadas em {time.perf_counter() - inicio:.2f}s."
+        ))
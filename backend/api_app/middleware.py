@@ -0,0 +1,27 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+
+URLCONF_ASGI = 'api_project.urls_asgi'
+
+
+class RotasAssincronasMiddleware:
+    # Sob ASGI a cadeia de middlewares e assincrona e as requisicoes passam a
+    # usar api_project.urls_asgi, que troca as listagens pelas versoes async
+    # (api_app.views_async). Sob WSGI nada muda.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.urlconf = URLCONF_ASGI
+        return await self.get_response(request)
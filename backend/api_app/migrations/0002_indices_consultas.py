@@ -0,0 +1,36 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_app', '0001_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['preco', 'id'], name='produto_preco_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['estoque', 'id'], name='produto_estoque_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transacao',
+            index=models.Index(fields=['cliente', 'data'], name='transacao_cliente_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transacao',
+            index=models.Index(fields=['cliente', 'total'], name='transacao_cliente_total_idx'),
+        ),
+        # VerifyEmailView busca EmailVerification por user__email; o indice fica
+        # na tabela do auth, que nao e deste app, por isso vai como SQL
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS api_app_auth_user_email_idx ON auth_user (email);',
+            reverse_sql='DROP INDEX IF EXISTS api_app_auth_user_email_idx;',
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+from ._fts import RunSQLFts5
+
+
+# indice FTS5 de api_app_produto.nome, mantido por triggers (ver api_app.busca)
+SQL_CRIAR_INDICE_BUSCA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS api_app_produto_fts USING fts5(
+        nome, content='api_app_produto', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS api_app_produto_fts_ai AFTER INSERT ON api_app_produto BEGIN
+        INSERT INTO api_app_produto_fts(rowid, nome) VALUES (new.id, new.nome);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS api_app_produto_fts_ad AFTER DELETE ON api_app_produto BEGIN
+        INSERT INTO api_app_produto_fts(api_app_produto_fts, rowid, nome) VALUES ('delete', old.id, old.nome);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS api_app_produto_fts_au AFTER UPDATE OF nome ON api_app_produto BEGIN
+        INSERT INTO api_app_produto_fts(api_app_produto_fts, rowid, nome) VALUES ('delete', old.id, old.nome);
+        INSERT INTO api_app_produto_fts(rowid, nome) VALUES (new.id, new.nome);
+    END""",
+    "INSERT INTO api_app_produto_fts(api_app_produto_fts) VALUES ('rebuild')",
+]
+
+
+SQL_REMOVER_INDICE_BUSCA = [
+    "DROP TRIGGER IF EXISTS api_app_produto_fts_ai",
+    "DROP TRIGGER IF EXISTS api_app_produto_fts_ad",
+    "DROP TRIGGER IF EXISTS api_app_produto_fts_au",
+    "DROP TABLE IF EXISTS api_app_produto_fts",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_app', '0002_indices_consultas'),
+    ]
+
+    operations = [
+        RunSQLFts5(SQL_CRIAR_INDICE_BUSCA, SQL_REMOVER_INDICE_BUSCA),
+    ]
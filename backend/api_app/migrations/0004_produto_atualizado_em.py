@@ -0,0 +1,46 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:34
+
+from django.db import migrations, models
+
+from ._fts import RunSQLFts5
+
+
+# no SQLite o AddField recria a tabela api_app_produto e descarta os
+# triggers que mantem o indice FTS5 sincronizado; mesmo SQL da 0003
+SQL_CRIAR_INDICE_BUSCA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS api_app_produto_fts USING fts5(
+        nome, content='api_app_produto', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS api_app_produto_fts_ai AFTER INSERT ON api_app_produto BEGIN
+        INSERT INTO api_app_produto_fts(rowid, nome) VALUES (new.id, new.nome);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS api_app_produto_fts_ad AFTER DELETE ON api_app_produto BEGIN
+        INSERT INTO api_app_produto_fts(api_app_produto_fts, rowid, nome) VALUES ('delete', old.id, old.nome);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS api_app_produto_fts_au AFTER UPDATE OF nome ON api_app_produto BEGIN
+        INSERT INTO api_app_produto_fts(api_app_produto_fts, rowid, nome) VALUES ('delete', old.id, old.nome);
+        INSERT INTO api_app_produto_fts(rowid, nome) VALUES (new.id, new.nome);
+    END""",
+    "INSERT INTO api_app_produto_fts(api_app_produto_fts) VALUES ('rebuild')",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_app', '0003_busca_produtos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['atualizado_em'], name='produto_atualizado_em_idx'),
+        ),
+        RunSQLFts5(SQL_CRIAR_INDICE_BUSCA, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:38
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_app', '0004_produto_atualizado_em'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailPendente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destinatario', models.EmailField(max_length=254)),
+                ('assunto', models.CharField(max_length=200)),
+                ('mensagem', models.TextField()),
+                ('tentativas', models.IntegerField(default=0)),
+                ('proxima_tentativa', models.DateTimeField(default=django.utils.timezone.now)),
+                ('enviado_em', models.DateTimeField(blank=True, null=True)),
+                ('erro', models.TextField(blank=True, default='')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['enviado_em', 'proxima_tentativa'], name='email_pendente_fila_idx')],
+            },
+        ),
+    ]
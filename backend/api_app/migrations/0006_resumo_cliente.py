@@ -0,0 +1,24 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_app', '0005_email_pendente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoCliente',
+            fields=[
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumo', serialize=False, to='api_app.cliente')),
+                ('total_gasto', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('quantidade_compras', models.IntegerField(default=0)),
+                ('itens_comprados', models.IntegerField(default=0)),
+                ('ultima_compra', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_app', '0006_resumo_cliente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('quantidade', models.IntegerField(default=0)),
+                ('receita', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('transacoes', models.IntegerField(default=0)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api_app.produto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('data', 'produto'), name='venda_diaria_data_produto_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_app', '0007_venda_diaria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimentoSaldo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('descricao', models.CharField(max_length=100)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('incorporado', models.BooleanField(default=False)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimentos', to='api_app.cliente')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['cliente', 'incorporado'], name='movimento_cliente_pendente_idx')],
+            },
+        ),
+    ]
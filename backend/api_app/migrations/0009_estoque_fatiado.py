@@ -0,0 +1,55 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from ._fts import RunSQLFts5
+
+
+# o AddField em api_app_produto recria a tabela no SQLite (ver 0004); mesmo
+# SQL da 0003
+SQL_CRIAR_INDICE_BUSCA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS api_app_produto_fts USING fts5(
+        nome, content='api_app_produto', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS api_app_produto_fts_ai AFTER INSERT ON api_app_produto BEGIN
+        INSERT INTO api_app_produto_fts(rowid, nome) VALUES (new.id, new.nome);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS api_app_produto_fts_ad AFTER DELETE ON api_app_produto BEGIN
+        INSERT INTO api_app_produto_fts(api_app_produto_fts, rowid, nome) VALUES ('delete', old.id, old.nome);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS api_app_produto_fts_au AFTER UPDATE OF nome ON api_app_produto BEGIN
+        INSERT INTO api_app_produto_fts(api_app_produto_fts, rowid, nome) VALUES ('delete', old.id, old.nome);
+        INSERT INTO api_app_produto_fts(rowid, nome) VALUES (new.id, new.nome);
+    END""",
+    "INSERT INTO api_app_produto_fts(api_app_produto_fts) VALUES ('rebuild')",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_app', '0008_movimento_saldo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='estoque_fatiado',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='FatiaEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveSmallIntegerField()),
+                ('estoque', models.IntegerField()),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fatias', to='api_app.produto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('produto', 'numero'), name='fatia_estoque_produto_numero_uniq')],
+            },
+        ),
+        RunSQLFts5(SQL_CRIAR_INDICE_BUSCA, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_app', '0009_estoque_fatiado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailpendente',
+            name='processando_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+# Operacao das migracoes do indice FTS5 de produtos (ver api_app.busca). O SQL
+# fica copiado em cada migracao, congelado; esta classe so decide onde ele
+# roda: apenas no SQLite compilado com FTS5, nos demais bancos a busca usa o
+# icontains. Toda migracao que recriar a tabela api_app_produto no SQLite
+# (AddField, AlterField...) perde os triggers e deve recria-los com ela.
+
+
+def _suporta_fts5(conexao):
+    if conexao.vendor != 'sqlite':
+        return False
+    with conexao.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+class RunSQLFts5(migrations.RunSQL):
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if _suporta_fts5(schema_editor.connection):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if _suporta_fts5(schema_editor.connection):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import User
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 
@@ -7,11 +8,37 @@ class Produto(models.Model):
     nome = models.CharField(max_length=100)
     preco = models.DecimalField(max_digits=10, decimal_places=2)
     estoque = models.IntegerField()
+    # produtos muito disputados podem ter o estoque dividido em fatias
+    # (api_app.estoque); enquanto estoque_fatiado for True, `estoque` e so uma
+    # copia do total e as compras baixam as fatias
+    estoque_fatiado = models.BooleanField(default=False)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['preco', 'id'], name='produto_preco_id_idx'),
+            models.Index(fields=['estoque', 'id'], name='produto_estoque_id_idx'),
+            models.Index(fields=['atualizado_em'], name='produto_atualizado_em_idx'),
+        ]
 
     def __str__(self):
         return self.nome
 
 
+class FatiaEstoque(models.Model):
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='fatias')
+    numero = models.PositiveSmallIntegerField()
+    estoque = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['produto', 'numero'], name='fatia_estoque_produto_numero_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.produto} #{self.numero}: {self.estoque}"
+
+
 class Cliente(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     saldo = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
@@ -20,6 +47,27 @@ class Cliente(models.Model):
         return self.user.email
 
 
+class MovimentoSaldo(models.Model):
+    # livro-razao do saldo: creditos e debitos so sao inseridos, e o valor nunca
+    # muda. A unica alteracao e a compactacao (compactar_saldos), que soma os
+    # pendentes ao Cliente.saldo e marca incorporado=True na mesma transacao; o
+    # saldo atual e Cliente.saldo mais os movimentos ainda nao incorporados
+    # (api_app.saldos)
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='movimentos')
+    valor = models.DecimalField(max_digits=12, decimal_places=2)
+    descricao = models.CharField(max_length=100)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    incorporado = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['cliente', 'incorporado'], name='movimento_cliente_pendente_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.cliente}: {self.valor} ({self.descricao})"
+
+
 class Transacao(models.Model):
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE)
     produto = models.ForeignKey(Produto, on_delete=models.CASCADE)
@@ -27,14 +75,69 @@ class Transacao(models.Model):
     total = models.DecimalField(max_digits=10, decimal_places=2)
     data = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['cliente', 'data'], name='transacao_cliente_data_idx'),
+            models.Index(fields=['cliente', 'total'], name='transacao_cliente_total_idx'),
+        ]
+
     def __str__(self):
         return f"{self.cliente} comprou {self.quantidade}x {self.produto}"
    
     
+class ResumoCliente(models.Model):
+    # mantido pelas compras (api_app.resumos); reconstruir_resumos recalcula a partir das transacoes
+    cliente = models.OneToOneField(Cliente, on_delete=models.CASCADE, primary_key=True, related_name='resumo')
+    total_gasto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    quantidade_compras = models.IntegerField(default=0)
+    itens_comprados = models.IntegerField(default=0)
+    ultima_compra = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.cliente}: {self.quantidade_compras} compras"
+
+
+class VendaDiaria(models.Model):
+    # consolidado de vendas por dia e produto (api_app.vendas); reconstruir_vendas recalcula a partir das transacoes
+    data = models.DateField()
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE)
+    quantidade = models.IntegerField(default=0)
+    receita = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    transacoes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['data', 'produto'], name='venda_diaria_data_produto_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.data} - {self.produto}: {self.quantidade}"
+
+
 class EmailVerification(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     verification_code = models.CharField(max_length=6)
     is_verified = models.BooleanField(default=False)
 
     def __str__(self):
-        return f"{self.user.email} - {self.verification_code}"
\ No newline at end of file
+        return f"{self.user.email} - {self.verification_code}"
+
+class EmailPendente(models.Model):
+    destinatario = models.EmailField()
+    assunto = models.CharField(max_length=200)
+    mensagem = models.TextField()
+    tentativas = models.IntegerField(default=0)
+    proxima_tentativa = models.DateTimeField(default=timezone.now)
+    enviado_em = models.DateTimeField(null=True, blank=True)
+    # marcado pelo worker que reivindicou o e-mail (api_app.emails)
+    processando_em = models.DateTimeField(null=True, blank=True)
+    erro = models.TextField(blank=True, default='')
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['enviado_em', 'proxima_tentativa'], name='email_pendente_fila_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.destinatario} - {self.assunto}"
@@ -0,0 +1,99 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+# Paginacao por cursor (keyset): em vez de OFFSET, cada pagina continua a partir
+# do ultimo (campo de ordenacao, id) visto, entao a pagina 10.000 custa o mesmo
+# que a pagina 1 e nao e preciso contar o total de itens.
+
+
+def usa_cursor(request):
+    return request.query_params.get('paginacao') == 'cursor' or 'cursor' in request.query_params
+
+
+def _valor_para_json(valor):
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return valor
+
+
+def codificar_cursor(campo, valor, pk):
+    dados = json.dumps([campo, _valor_para_json(valor), pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(dados.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(token, campo, model):
+    # devolve (valor, pk); ValueError para tokens adulterados ou de outra ordenacao
+    try:
+        dados = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        campo_token, valor, pk = json.loads(dados)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise ValueError("Cursor inválido.")
+    if campo_token != campo or not isinstance(pk, int):
+        raise ValueError("Cursor inválido.")
+    if campo is not None:
+        try:
+            valor = model._meta.get_field(campo).to_python(valor)
+        except ValidationError:
+            raise ValueError("Cursor inválido.")
+    return valor, pk
+
+
+def _valor_item(item, campo):
+    # itens podem ser instancias ou dicts ja serializados
+    return item[campo] if isinstance(item, dict) else getattr(item, campo)
+
+
+def paginar_por_cursor(queryset, campo, token, page_size, serializar=list):
+    # devolve (itens da pagina, token da proxima pagina ou None); serializar
+    # recebe o queryset fatiado e devolve a lista de itens
+    itens = serializar(_fatia_cursor(queryset, campo, token, page_size))
+    return _pagina_cursor(itens, campo, page_size)
+
+
+async def apaginar_por_cursor(queryset, campo, token, page_size, serializar):
+    # mesma paginacao, com serializar assincrono
+    itens = await serializar(_fatia_cursor(queryset, campo, token, page_size))
+    return _pagina_cursor(itens, campo, page_size)
+
+
+def _fatia_cursor(queryset, campo, token, page_size):
+    if page_size < 1:
+        raise ValueError("O número de itens por página deve ser maior que zero.")
+    ordem = [campo, 'id'] if campo else ['id']
+    queryset = queryset.order_by(*ordem)
+
+    if token:
+        valor, pk = decodificar_cursor(token, campo, queryset.model)
+        if campo:
+            queryset = queryset.filter(Q(**{f'{campo}__gt': valor}) | Q(**{campo: valor, 'id__gt': pk}))
+        else:
+            queryset = queryset.filter(id__gt=pk)
+
+    # busca um item a mais so para saber se existe proxima pagina
+    return queryset[:page_size + 1]
+
+
+def _pagina_cursor(itens, campo, page_size):
+    if len(itens) <= page_size:
+        return itens, None
+    itens = itens[:page_size]
+    ultimo = itens[-1]
+    return itens, codificar_cursor(campo, _valor_item(ultimo, campo) if campo else None, _valor_item(ultimo, 'id'))
+
+
+def link_proxima_pagina(request, token):
+    if token is None:
+        return None
+    params = request.query_params.copy()
+    params.pop('paginacao', None)
+    params.pop('pagina', None)
+    params['cursor'] = token
+    return request.build_absolute_uri(request.path) + '?' + params.urlencode()
@@ -0,0 +1,64 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import Greatest
+from .models import ResumoCliente, Transacao
+
+
+# Resumo de gastos por cliente, atualizado dentro da mesma transacao de cada
+# compra. Assim o GET do resumo le uma unica linha em vez de agregar todas as
+# transacoes do cliente.
+
+
+def registrar_compras(cliente_id, transacoes):
+    # deve ser chamada dentro do transaction.atomic() da compra
+    total = sum(t.total for t in transacoes)
+    itens = sum(t.quantidade for t in transacoes)
+    ultima = max(t.data for t in transacoes)
+    atualizado = ResumoCliente.objects.filter(cliente_id=cliente_id).update(
+        total_gasto=F('total_gasto') + total,
+        quantidade_compras=F('quantidade_compras') + len(transacoes),
+        itens_comprados=F('itens_comprados') + itens,
+        ultima_compra=Greatest('ultima_compra', ultima),
+    )
+    if atualizado:
+        return
+    try:
+        # savepoint: se outra compra criou a linha primeiro, cai no UPDATE
+        with transaction.atomic():
+            ResumoCliente.objects.create(
+                cliente_id=cliente_id, total_gasto=total, quantidade_compras=len(transacoes),
+                itens_comprados=itens, ultima_compra=ultima,
+            )
+    except IntegrityError:
+        registrar_compras(cliente_id, transacoes)
+
+
+def remover_compra(transacao):
+    # chamada no post_delete de Transacao (remocao direta ou em cascata, como ao
+    # remover um produto). ultima_compra fica como esta: recalcular o maximo
+    # exigiria ler o historico, e reconstruir_resumos o corrige. A contagem
+    # diminui, entao o ETag das transacoes (api_app.etags) muda.
+    ResumoCliente.objects.filter(cliente_id=transacao.cliente_id).update(
+        total_gasto=F('total_gasto') - transacao.total,
+        quantidade_compras=F('quantidade_compras') - 1,
+        itens_comprados=F('itens_comprados') - transacao.quantidade,
+    )
+
+
+def calcular_resumos(cliente_ids):
+    # recalcula a partir das transacoes; devolve {cliente_id: ResumoCliente}
+    agregados = (
+        Transacao.objects.filter(cliente_id__in=cliente_ids)
+        .values('cliente_id')
+        .annotate(
+            total_gasto=Sum('total'), quantidade_compras=Count('id'),
+            itens_comprados=Sum('quantidade'), ultima_compra=Max('data'),
+        )
+        .order_by()
+    )
+    return {linha['cliente_id']: ResumoCliente(**linha) for linha in agregados}
+
+
+def resumo_difere(atual, esperado):
+    campos = ('total_gasto', 'quantidade_compras', 'itens_comprados', 'ultima_compra')
+    return any(getattr(atual, campo) != getattr(esperado, campo) for campo in campos)
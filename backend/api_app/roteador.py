@@ -0,0 +1,79 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# Replica de leitura para as listagens (REPLICA_LEITURA). Fora de
+# ler_da_replica() toda consulta vai para o default, entao o caminho de compra
+# nao muda. Dentro dele as leituras vao para a replica, exceto:
+# - depois de uma escrita no mesmo contexto (a replica ainda nao a recebeu);
+# - por REPLICA_JANELA_PRIMARIO segundos depois de o usuario comprar ou
+#   adicionar saldo (fixar_no_primario), para que ele veja as proprias escritas.
+
+REPLICA = 'replica'
+
+_contexto = ContextVar('leitura_replica', default=None)
+
+
+def chave_primario(user_id):
+    return f'replica:primario:{user_id}'
+
+
+def fixar_no_primario(user_id):
+    if user_id is not None:
+        cache.set(chave_primario(user_id), True, settings.REPLICA_JANELA_PRIMARIO)
+
+
+def replica_configurada():
+    return settings.REPLICA_LEITURA and REPLICA in connections.databases
+
+
+@contextmanager
+def ler_da_replica(user_id=None):
+    estado = {'primario': not replica_configurada() or (user_id is not None and cache.get(chave_primario(user_id), False))}
+    token = _contexto.set(estado)
+    try:
+        yield
+    finally:
+        _contexto.reset(token)
+
+
+def alias_leitura():
+    # banco de onde vem as leituras deste contexto; entra nas chaves de cache e
+    # nos ETags derivados dessas leituras, para que uma pagina lida da replica
+    # (possivelmente atrasada) nunca seja servida a quem le do primario
+    estado = _contexto.get()
+    if estado is None or estado['primario']:
+        return DEFAULT_DB_ALIAS
+    return REPLICA
+
+
+def usar_replica(metodo):
+    # decorator para o get() das views de listagem; o usuario e autenticado
+    # antes, ainda no default
+    @wraps(metodo)
+    def wrapper(self, request, *args, **kwargs):
+        with ler_da_replica(request.user.pk):
+            return metodo(self, request, *args, **kwargs)
+    return wrapper
+
+
+class RoteadorReplica:
+    def db_for_read(self, model, **hints):
+        estado = _contexto.get()
+        if estado is None or estado['primario']:
+            return None
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        estado = _contexto.get()
+        if estado is not None:
+            estado['primario'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replica e primario tem os mesmos dados
+        return True
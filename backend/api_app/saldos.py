@@ -0,0 +1,75 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from .models import Cliente, MovimentoSaldo
+
+
+# Saldo em livro-razao. Creditos sao apenas INSERTs em MovimentoSaldo, sem
+# tocar na linha do Cliente, entao depositos concorrentes nao disputam a mesma
+# linha. O saldo atual e Cliente.saldo (o que ja foi incorporado) mais a soma
+# dos movimentos pendentes; compactar_saldos incorpora os pendentes de tempos
+# em tempos para manter essa soma pequena.
+
+
+CENTAVO = Decimal('0.01')
+
+
+class SaldoInsuficiente(Exception):
+    pass
+
+
+def _pendentes():
+    return (
+        MovimentoSaldo.objects.filter(cliente_id=OuterRef('pk'), incorporado=False)
+        .values('cliente_id')
+        .annotate(soma=Sum('valor'))
+        .values('soma')
+    )
+
+
+def anotar_saldo(queryset):
+    campo = Cliente._meta.get_field('saldo')
+    return queryset.annotate(
+        saldo_atual=F('saldo') + Coalesce(Subquery(_pendentes()), Value(Decimal('0')), output_field=campo)
+    )
+
+
+def saldo_atual(cliente_id):
+    saldo = anotar_saldo(Cliente.objects.filter(pk=cliente_id)).values_list('saldo_atual', flat=True).get()
+    # o SQLite so arredonda colunas, nao expressoes
+    return saldo.quantize(CENTAVO)
+
+
+def creditar(cliente_id, valor, descricao="Depósito"):
+    return MovimentoSaldo.objects.create(cliente_id=cliente_id, valor=valor, descricao=descricao)
+
+
+def debitar(cliente_id, valor, descricao):
+    # o debito e inserido antes da verificacao: no SQLite o INSERT ja pega o
+    # lock de escrita, e nos outros bancos o select_for_update serializa os
+    # debitos do mesmo cliente (creditos continuam livres). Se o saldo ficar
+    # negativo o savepoint desfaz o INSERT.
+    with transaction.atomic():
+        movimento = MovimentoSaldo.objects.create(cliente_id=cliente_id, valor=-valor, descricao=descricao)
+        list(Cliente.objects.select_for_update().filter(pk=cliente_id).values_list('pk'))
+        if saldo_atual(cliente_id) < 0:
+            raise SaldoInsuficiente()
+    return movimento
+
+
+def compactar(cliente_id):
+    # incorpora os movimentos pendentes ao Cliente.saldo; devolve quantos foram incorporados
+    with transaction.atomic():
+        list(Cliente.objects.select_for_update().filter(pk=cliente_id).values_list('pk'))
+        pendentes = list(
+            MovimentoSaldo.objects.select_for_update()
+            .filter(cliente_id=cliente_id, incorporado=False)
+            .values_list('id', 'valor')
+        )
+        if not pendentes:
+            return 0
+        soma = sum(valor for _, valor in pendentes)
+        Cliente.objects.filter(pk=cliente_id).update(saldo=F('saldo') + soma)
+        MovimentoSaldo.objects.filter(id__in=[movimento_id for movimento_id, _ in pendentes]).update(incorporado=True)
+    return len(pendentes)
@@ -1,14 +1,24 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from rest_framework.exceptions import ValidationError
-from .models import Produto, Cliente, Transacao, EmailVerification
+from .models import Produto, Cliente, Transacao, EmailVerification, ResumoCliente, MovimentoSaldo
 import random
-from django.core.mail import send_mail
+from django.db import transaction
+from .emails import enfileirar_email
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+from .tokens import RefreshToken
+from decimal import Decimal, getcontext
+from django.utils import timezone
+from rest_framework.settings import api_settings
+from rest_framework import ISO_8601
+from asgiref.sync import sync_to_async
+from itertools import islice
 
 class ProdutoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Produto
         fields = '__all__'
+        read_only_fields = ['estoque_fatiado']
 
 class ClienteSerializer(serializers.ModelSerializer):
     class Meta:
@@ -20,6 +30,157 @@ class TransacaoSerializer(serializers.ModelSerializer):
         model = Transacao
         fields = '__all__'
 
+class ResumoClienteSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ResumoCliente
+        fields = ('total_gasto', 'quantidade_compras', 'itens_comprados', 'ultima_compra')
+
+class MovimentoSaldoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MovimentoSaldo
+        fields = ('id', 'valor', 'descricao', 'criado_em')
+
+class VendasDiaSerializer(serializers.Serializer):
+    data = serializers.DateField()
+    quantidade = serializers.IntegerField()
+    receita = serializers.DecimalField(max_digits=14, decimal_places=2)
+    transacoes = serializers.IntegerField()
+
+class VendasProdutoSerializer(serializers.Serializer):
+    produto_id = serializers.IntegerField()
+    produto = serializers.CharField(source='produto__nome')
+    quantidade = serializers.IntegerField()
+    receita = serializers.DecimalField(max_digits=14, decimal_places=2)
+    transacoes = serializers.IntegerField()
+
+#serializacao rapida das listagens: le tuplas com values_list() e converte
+#Decimal e datetime num laco simples, com a mesma saida dos ModelSerializer
+_planos = {}
+
+
+def _conversor_decimal(campo):
+    coerce_to_string = getattr(campo, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if campo.decimal_places is None or campo.localize or campo.normalize_output or not coerce_to_string:
+        return campo.to_representation
+    expoente = Decimal('.1') ** campo.decimal_places
+    contexto = getcontext().copy()
+    if campo.max_digits is not None:
+        contexto.prec = campo.max_digits
+
+    def converter(valor):
+        return '{:f}'.format(valor.quantize(expoente, rounding=campo.rounding, context=contexto))
+    return converter
+
+
+def _conversor_data_hora(campo):
+    formato = getattr(campo, 'format', api_settings.DATETIME_FORMAT)
+    if formato is None or formato.lower() != ISO_8601 or hasattr(campo, 'timezone'):
+        return campo.to_representation
+    fuso = campo.default_timezone()
+    if fuso is None:
+        return campo.to_representation
+
+    def converter(valor):
+        if timezone.is_naive(valor):
+            return campo.to_representation(valor)
+        texto = valor.astimezone(fuso).isoformat()
+        if texto.endswith('+00:00'):
+            texto = texto[:-6] + 'Z'
+        return texto
+    return converter
+
+
+def _plano(serializer_class):
+    # (nomes, fontes do values_list, campos que precisam de conversao) ou None
+    # quando algum campo nao e uma coluna simples do model
+    if serializer_class not in _planos:
+        nomes, fontes, campos = [], [], []
+        for campo in serializer_class().fields.values():
+            if campo.write_only:
+                continue
+            if campo.source == '*' or '.' in campo.source or isinstance(campo, serializers.SerializerMethodField):
+                _planos[serializer_class] = None
+                return None
+            nomes.append(campo.field_name)
+            fontes.append(campo.source)
+            campos.append(campo)
+        _planos[serializer_class] = (nomes, fontes, campos)
+    return _planos[serializer_class]
+
+
+def iterar_valores(queryset, serializer_class, chunk_size=None):
+    # gera os itens um a um; com chunk_size le o banco em blocos via iterator()
+    plano = _plano(serializer_class)
+    if plano is None:
+        objetos = queryset.iterator(chunk_size=chunk_size) if chunk_size else queryset
+        for objeto in objetos:
+            yield serializer_class(objeto).data
+        return
+
+    converter = _conversor_linha(plano)
+    linhas = queryset.values_list(*plano[1])
+    if chunk_size:
+        linhas = linhas.iterator(chunk_size=chunk_size)
+    for linha in linhas:
+        yield converter(linha)
+
+
+async def aiterar_valores(queryset, serializer_class, chunk_size=2000):
+    # versao assincrona de iterar_valores, para respostas em streaming sob ASGI.
+    # Le cada bloco do gerador sincrono numa thread: o aiterator() do Django
+    # executa a consulta de values_list() ainda no contexto async e falha
+    itens = iterar_valores(queryset, serializer_class, chunk_size=chunk_size)
+    proximo_bloco = sync_to_async(lambda: list(islice(itens, chunk_size)))
+    while True:
+        bloco = await proximo_bloco()
+        for item in bloco:
+            yield item
+        if len(bloco) < chunk_size:
+            return
+
+
+def _conversor_linha(plano):
+    nomes, _, campos = plano
+
+    # os conversores sao montados a cada chamada porque o fuso horario ativo
+    # pode mudar entre requisicoes
+    conversoes = []
+    for indice, campo in enumerate(campos):
+        if isinstance(campo, serializers.DecimalField):
+            conversoes.append((indice, _conversor_decimal(campo)))
+        elif isinstance(campo, serializers.DateTimeField):
+            conversoes.append((indice, _conversor_data_hora(campo)))
+        elif not isinstance(campo, (serializers.IntegerField, serializers.CharField,
+                                    serializers.BooleanField, serializers.PrimaryKeyRelatedField)):
+            conversoes.append((indice, campo.to_representation))
+
+    def converter_linha(linha):
+        if conversoes:
+            linha = list(linha)
+            for indice, converter in conversoes:
+                valor = linha[indice]
+                if valor is not None:
+                    linha[indice] = converter(valor)
+        return dict(zip(nomes, linha))
+    return converter_linha
+
+
+def serializar_valores(queryset, serializer_class):
+    if _plano(serializer_class) is None:
+        return serializer_class(queryset, many=True).data
+    return list(iterar_valores(queryset, serializer_class))
+
+
+async def aserializar_valores(queryset, serializer_class):
+    # versao para as views async: le as linhas com o ORM assincrono
+    plano = _plano(serializer_class)
+    if plano is None:
+        objetos = [objeto async for objeto in queryset]
+        return serializer_class(objetos, many=True).data
+    converter = _conversor_linha(plano)
+    return [converter(linha) async for linha in queryset.values_list(*plano[1])]
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -30,23 +191,31 @@ class UserSerializer(serializers.ModelSerializer):
         if User.objects.filter(username=validated_data['username']).exists():
             raise ValidationError("Este username já está em uso. Escolha outro.")
         
-        user = User(
-            email=validated_data['email'],
-            username=validated_data['username']
-        )
-        user.set_password(validated_data['password'])
-        user.save()
+        with transaction.atomic():
+            user = User(
+                email=validated_data['email'],
+                username=validated_data['username']
+            )
+            user.set_password(validated_data['password'])
+            user.save()
 
-        verification_code = str(random.randint(100000, 999999)) 
-        EmailVerification.objects.create(user=user, verification_code=verification_code)
+            verification_code = str(random.randint(100000, 999999)) 
+            EmailVerification.objects.create(user=user, verification_code=verification_code)
 
-        self.send_verification_email(user.email, verification_code)
+            self.send_verification_email(user.email, verification_code)
 
-        Cliente.objects.create(user=user)
+            Cliente.objects.create(user=user)
 
         return user
 
     def send_verification_email(self, email, code):
+        # o envio sai da requisicao: o e-mail vai para a fila e o comando
+        # enviar_emails faz a entrega SMTP
         subject = "Código de Verificação"
         message = f"Seu código de verificação é: {code}"
-        send_mail(subject, message, 'djangoapirestful@gmail.com', [email])  
\ No newline at end of file
+        enfileirar_email(email, subject, message)
+
+
+#refresh de token consultando o filtro de Bloom antes da blacklist
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    token_class = RefreshToken
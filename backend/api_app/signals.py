@@ -0,0 +1,39 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.contrib.auth.models import User
+from .models import Produto, Cliente, Transacao
+from .catalogo import invalidar_catalogo
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from .authentication import invalidar_usuario
+from .tokens import lista_negra, sinalizar_revogacao
+from .resumos import remover_compra
+
+
+@receiver(post_save, sender=Produto)
+@receiver(post_delete, sender=Produto)
+def produto_alterado(sender, **kwargs):
+    invalidar_catalogo()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def usuario_alterado(sender, instance, **kwargs):
+    invalidar_usuario(instance.pk)
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+def cliente_alterado(sender, instance, **kwargs):
+    invalidar_usuario(instance.user_id)
+
+
+@receiver(post_delete, sender=Transacao)
+def transacao_removida(sender, instance, **kwargs):
+    remover_compra(instance)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def token_revogado(sender, instance, created, **kwargs):
+    if created:
+        lista_negra.adicionar(instance.token.jti)
+        sinalizar_revogacao(instance.token.jti)
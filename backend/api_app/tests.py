@@ -1,9 +1,55 @@
+import asyncio
+import base64
+import csv
+import importlib
+import json
+import re
+import sys
+import threading
+import time
+import unittest
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+import requests
 from rest_framework.test import APITestCase
+from rest_framework.renderers import JSONRenderer
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Q
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from django.test.utils import CaptureQueriesContext
 from rest_framework_simplejwt.tokens import RefreshToken
-from .models import Cliente, Produto, Transacao, EmailVerification
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
+from .models import Cliente, Produto, Transacao, EmailVerification, EmailPendente, ResumoCliente, VendaDiaria, MovimentoSaldo, FatiaEstoque
+from .authentication import chave_usuario
+from .emails import enviar_pendentes, reivindicar, PRAZO_PROCESSAMENTO
+from .catalogo import versao_catalogo, catalogo_em_cache
+from .checks import verificar_caches_locais
+from .tokens import FiltroBloom, ListaNegraJti, lista_negra, bloom_ativo, chave_revogacao, versao_lista_negra
+from .compras import realizar_compra, realizar_checkout, CompraError
+from .estoque import fatiar, juntar, estoque_total, baixar_fatias, _sincronizar_agendado, _agendados
+from .atualizacao import atualizar_produtos
+from .agrupamento import AgrupadorCompras
+from .roteador import RoteadorReplica, ler_da_replica, fixar_no_primario
+from .views_async import ListarProdutosAsyncView, ListarTransacoesAsyncView
+from .saldos import saldo_atual, creditar, debitar, SaldoInsuficiente
+from .serializers import ProdutoSerializer, TransacaoSerializer, serializar_valores
+from .filtros import filtrar_produtos, filtrar_transacoes
+from .busca import TABELA_FTS, fts_disponivel
 from decimal import Decimal
+from datetime import timedelta
 
 class RegisterViewTest(APITestCase):
     def test_register_and_verify_user(self):
@@ -34,6 +80,70 @@ class RegisterViewTest(APITestCase):
         self.assertIsNotNone(access_token)
 
 
+class FilaEmailsTest(APITestCase):
+    def cadastrar(self, username):
+        data = {'username': username, 'email': f'{username}@email.com', 'password': 'senha123'}
+        return self.client.post(reverse('register'), data, format='json')
+
+    def test_cadastro_enfileira_email(self):
+        response = self.cadastrar('cliente13')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        pendente = EmailPendente.objects.get(destinatario='cliente13@email.com')
+        self.assertIsNone(pendente.enviado_em)
+        codigo = EmailVerification.objects.get(user__username='cliente13').verification_code
+        self.assertIn(codigo, pendente.mensagem)
+
+    def test_envio_em_lote(self):
+        for i in range(3):
+            self.cadastrar(f'lote{i}')
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open') as abrir:
+            call_command('enviar_emails', lote=2, stdout=StringIO())
+        self.assertEqual(abrir.call_count, 2)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(EmailPendente.objects.filter(enviado_em__isnull=True).exists())
+
+    def test_falha_agenda_nova_tentativa(self):
+        self.cadastrar('cliente14')
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('SMTP indisponível')):
+            call_command('enviar_emails', stdout=StringIO())
+        pendente = EmailPendente.objects.get(destinatario='cliente14@email.com')
+        self.assertEqual(pendente.tentativas, 1)
+        self.assertGreater(pendente.proxima_tentativa, timezone.now())
+
+        # ainda dentro da espera: nada e reenviado
+        call_command('enviar_emails', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_workers_concorrentes_nao_reenviam(self):
+        for i in range(3):
+            self.cadastrar(f'worker{i}')
+        # outro worker reivindicou os dois primeiros e ainda esta enviando
+        reivindicados = reivindicar(2, timezone.now())
+        self.assertEqual(len(reivindicados), 2)
+        self.assertEqual(enviar_pendentes(), (1, 0))
+        self.assertEqual([m.to for m in mail.outbox], [['worker2@email.com']])
+        self.assertEqual(reivindicar(10, timezone.now()), [])
+
+    def test_queda_no_meio_do_lote(self):
+        for i in range(3):
+            self.cadastrar(f'queda{i}')
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=[1, SystemExit]) as enviar:
+            with self.assertRaises(SystemExit):
+                enviar_pendentes()
+        self.assertEqual(enviar.call_count, 2)
+        self.assertEqual(EmailPendente.objects.filter(enviado_em__isnull=False).count(), 1)
+
+        # reivindicacao ainda valida: nada e reenviado
+        self.assertEqual(enviar_pendentes(), (0, 0))
+        # depois do prazo os dois nao confirmados voltam para a fila
+        EmailPendente.objects.filter(enviado_em__isnull=True).update(
+            processando_em=timezone.now() - PRAZO_PROCESSAMENTO - timedelta(seconds=1)
+        )
+        self.assertEqual(enviar_pendentes(), (2, 0))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['queda1@email.com', 'queda2@email.com'])
+
+
 class AddSaldoViewTest(APITestCase):
     def setUp(self):
         self.user_data = {
@@ -57,7 +167,62 @@ class AddSaldoViewTest(APITestCase):
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, 200)
         self.cliente.refresh_from_db()
-        self.assertEqual(str(self.cliente.saldo), '100.00')
+        self.assertEqual(str(saldo_atual(self.cliente.id)), '100.00')
+
+    def test_deposito_nao_altera_linha_do_cliente(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.access_token)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(reverse('add_saldo'), {'saldo': '25.50'}, format='json')
+        self.assertEqual(response.data['message'], 'Saldo atualizado para 25.50.')
+        self.assertFalse(any(q['sql'].startswith('UPDATE "api_app_cliente"') for q in consultas.captured_queries))
+        self.assertEqual(MovimentoSaldo.objects.get(cliente=self.cliente).valor, Decimal('25.50'))
+
+    def test_extrato(self):
+        creditar(self.cliente.id, Decimal('50.00'))
+        debitar(self.cliente.id, Decimal('20.00'), 'Compra')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.access_token)
+        response = self.client.get(reverse('extrato') + '?itens_por_pagina=1')
+        self.assertEqual(response.data['saldo'], '30.00')
+        self.assertEqual([m['valor'] for m in response.data['movimentos']], ['50.00'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([m['valor'] for m in response.data['movimentos']], ['-20.00'])
+        self.assertIsNone(response.data['next'])
+
+
+class LivroRazaoSaldoTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='cliente_razao', password='senha123')
+        self.cliente = Cliente.objects.create(user=user, saldo=Decimal('10.00'))
+
+    def test_saldo_derivado(self):
+        creditar(self.cliente.id, Decimal('5.25'))
+        debitar(self.cliente.id, Decimal('3.00'), 'Compra')
+        self.assertEqual(saldo_atual(self.cliente.id), Decimal('12.25'))
+
+    def test_debito_sem_saldo_nao_fica_registrado(self):
+        with self.assertRaises(SaldoInsuficiente):
+            debitar(self.cliente.id, Decimal('10.01'), 'Compra')
+        self.assertFalse(MovimentoSaldo.objects.exists())
+        self.assertEqual(saldo_atual(self.cliente.id), Decimal('10.00'))
+
+    def test_compactar_saldos(self):
+        for valor in ('1.00', '2.00', '3.00'):
+            creditar(self.cliente.id, Decimal(valor))
+        debitar(self.cliente.id, Decimal('4.00'), 'Compra')
+
+        saida = StringIO()
+        call_command('compactar_saldos', stdout=saida)
+        self.assertIn('1 clientes compactados (4 movimentos)', saida.getvalue())
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.saldo, Decimal('12.00'))
+        self.assertEqual(saldo_atual(self.cliente.id), Decimal('12.00'))
+        # o historico continua completo
+        self.assertEqual(MovimentoSaldo.objects.filter(cliente=self.cliente, incorporado=True).count(), 4)
+
+        creditar(self.cliente.id, Decimal('1.00'))
+        call_command('compactar_saldos', minimo=2, stdout=StringIO())
+        self.assertEqual(MovimentoSaldo.objects.filter(incorporado=False).count(), 1)
+        self.assertEqual(saldo_atual(self.cliente.id), Decimal('13.00'))
 
 
 class CreateProdutoViewTest(APITestCase):
@@ -88,8 +253,129 @@ class CreateProdutoViewTest(APITestCase):
         self.assertEqual(response.data['nome'], 'Produto A')
 
 
+class ImportarProdutosTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cliente_importacao', password='senha123')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(refresh.access_token))
+
+    def enviar(self, nome, conteudo, params=''):
+        arquivo = SimpleUploadedFile(nome, conteudo.encode())
+        return self.client.post(reverse('importar_produtos') + params, {'arquivo': arquivo}, format='multipart')
+
+    def test_importar_csv_com_erros_por_linha(self):
+        conteudo = "nome,preco,estoque\nProduto A,10.50,5\n,3.00,1\nProduto C,abc,2\nProduto D,7.00,-\nProduto E,1.99,0\n"
+        response = self.enviar('produtos.csv', conteudo)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['criados'], 2)
+        self.assertEqual(response.data['com_erro'], 3)
+        self.assertEqual([erro['linha'] for erro in response.data['erros']], [2, 3, 4])
+        self.assertIn('nome', response.data['erros'][0]['erros'])
+        self.assertEqual(sorted(Produto.objects.values_list('nome', flat=True)), ['Produto A', 'Produto E'])
+
+    def test_importar_json_em_lotes(self):
+        produtos = [{'nome': f'Produto {i}', 'preco': '2.50', 'estoque': i} for i in range(25)]
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.enviar('produtos.json', json.dumps(produtos), '?lote=10')
+        self.assertEqual(response.data['criados'], 25)
+        inserts = [q for q in consultas.captured_queries if q['sql'].startswith('INSERT INTO "api_app_produto"')]
+        self.assertEqual(len(inserts), 3)
+
+    def test_importar_lista_no_corpo(self):
+        response = self.client.post(reverse('importar_produtos'), [{'nome': 'Produto A', 'preco': '1.00', 'estoque': 1}], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Produto.objects.get().nome, 'Produto A')
+
+    def test_json_malformado_mantem_linhas_validas(self):
+        response = self.enviar('produtos.json', '[{"nome": "Produto A", "preco": "1.00", "estoque": 1}, {"nome": ')
+        self.assertEqual(response.data['criados'], 1)
+        self.assertEqual(response.data['erros'][0]['linha'], 2)
+
+    def test_importacao_invalida_cache_do_catalogo(self):
+        versao = versao_catalogo()
+        self.enviar('produtos.csv', "nome,preco,estoque\nProduto A,1.00,1\n")
+        self.assertNotEqual(versao_catalogo(), versao)
+
+    def test_vazao(self):
+        total = 5000
+        linhas = ''.join(f'Produto {i},{i % 1000}.99,{i % 50}\n' for i in range(total))
+        response = self.enviar('produtos.csv', 'nome,preco,estoque\n' + linhas)
+        self.assertEqual(response.data['criados'], total)
+        print(f"\nimportacao: {total} produtos em {response.data['duracao_segundos']}s "
+              f"({response.data['linhas_por_segundo']} linhas/s)")
+
+
+class AtualizarProdutosTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cliente_atualizacao', password='senha123', is_staff=True)
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(refresh.access_token))
+        self.produtos = [Produto.objects.create(nome=f'Produto {i}', preco=Decimal('10.00'), estoque=5) for i in range(3)]
+
+    def atualizar(self, registros, params=''):
+        return self.client.post(reverse('atualizar_produtos') + params, {'produtos': registros}, format='json')
+
+    def test_somente_administradores(self):
+        comum = User.objects.create_user(username='cliente_comum', password='senha123')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(comum).access_token))
+        response = self.atualizar([{'id': self.produtos[0].id, 'preco': '1.00'}])
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Produto.objects.get(id=self.produtos[0].id).preco, Decimal('10.00'))
+
+    def test_atualizacao_em_massa(self):
+        a, b, c = self.produtos
+        response = self.atualizar([
+            {'id': a.id, 'preco': '12.90'},
+            {'id': b.id, 'estoque': 40},
+            {'id': c.id, 'preco': '7.00', 'estoque_delta': -3},
+            {'id': 999999, 'estoque': 1},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['atualizados'], 3)
+        self.assertEqual(response.data['nao_encontrados'], [999999])
+        self.assertEqual(response.data['rejeitados'], [])
+        valores = {p.id: (p.preco, p.estoque) for p in Produto.objects.all()}
+        self.assertEqual(valores[a.id], (Decimal('12.90'), 5))
+        self.assertEqual(valores[b.id], (Decimal('10.00'), 40))
+        self.assertEqual(valores[c.id], (Decimal('7.00'), 2))
+
+    def test_registros_rejeitados(self):
+        a, b, c = self.produtos
+        response = self.atualizar([
+            {'id': a.id, 'estoque_delta': -6},
+            {'id': b.id, 'preco': 'abc'},
+            {'id': c.id},
+            {'id': c.id, 'estoque': 1, 'estoque_delta': 1},
+            {'preco': '1.00'},
+        ])
+        self.assertEqual(response.data['atualizados'], 0)
+        self.assertEqual(sorted(r['id'] for r in response.data['rejeitados'] if r['id']), [a.id, b.id, c.id, c.id])
+        self.assertFalse(Produto.objects.exclude(estoque=5).exists())
+
+    def test_um_update_por_lote(self):
+        registros = [{'id': p.id, 'estoque_delta': 1} for p in self.produtos]
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.atualizar(registros, '?lote=2')
+        self.assertEqual(response.data['atualizados'], 3)
+        updates = [q['sql'] for q in consultas.captured_queries if q['sql'].startswith('UPDATE "api_app_produto"')]
+        self.assertEqual(len(updates), 2)
+        self.assertTrue(all('CASE WHEN' in sql for sql in updates))
+        self.assertFalse(Produto.objects.exclude(estoque=6).exists())
+
+    def test_atualizacao_invalida_listagem_em_cache(self):
+        versao = versao_catalogo()
+        self.atualizar([{'id': self.produtos[0].id, 'preco': '1.00'}])
+        self.assertNotEqual(versao_catalogo(), versao)
+        self.assertGreater(Produto.objects.get(id=self.produtos[0].id).atualizado_em, self.produtos[0].atualizado_em)
+
+    def test_lista_vazia(self):
+        self.assertEqual(self.atualizar([]).status_code, 400)
+
+
+@override_settings(CATALOGO_EM_CACHE=True)
 class ListarProdutosViewTest(APITestCase):
     def setUp(self):
+        cache.clear()
         Produto.objects.create(nome='Produto A', preco=Decimal('100.00'), estoque=10)
         Produto.objects.create(nome='Produto B', preco=Decimal('200.00'), estoque=5)
 
@@ -105,6 +391,210 @@ class ListarProdutosViewTest(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.data['produtos']), 1)
 
+    def test_total_items_em_cache(self):
+        url = reverse('listar_produtos') + '?nome=Produto'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.data['total_items'], 2)
+        self.assertFalse(response.data['total_aproximado'])
+        self.assertFalse(any('COUNT' in q['sql'] for q in queries.captured_queries))
+
+        Produto.objects.create(nome='Produto C', preco=Decimal('10.00'), estoque=1)
+        response = self.client.get(url)
+        self.assertEqual(response.data['total_items'], 3)
+
+    def test_total_items_aproximado(self):
+        url = reverse('listar_produtos')
+        self.client.get(url)
+        Produto.objects.create(nome='Produto C', preco=Decimal('10.00'), estoque=1)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url + '?contar=false')
+        self.assertEqual(response.data['total_items'], 2)
+        self.assertTrue(response.data['total_aproximado'])
+        self.assertFalse(any('COUNT' in q['sql'] for q in queries.captured_queries))
+
+    def test_resposta_em_cache(self):
+        url = reverse('listar_produtos') + '?ordenar_por=preco'
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('listar_produtos') + '?itens_por_pagina=&ordenar_por=preco')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(len(queries.captured_queries), 0)
+        self.assertEqual(response.data['total_items'], 2)
+
+    def test_compra_invalida_resposta_em_cache(self):
+        user = User.objects.create_user(username='cliente11', password='senha123')
+        cliente = Cliente.objects.create(user=user, saldo=Decimal('1000.00'))
+        produto = Produto.objects.get(nome='Produto A')
+        url = reverse('listar_produtos') + '?ordenar_por=preco'
+        self.client.get(url)
+        realizar_compra(cliente.id, produto.id, 4)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['produtos'][0]['estoque'], 6)
+
+    def test_estatisticas_cache(self):
+        admin = User.objects.create_superuser(username='admin', password='senha123')
+        self.client.get(reverse('listar_produtos'))
+        self.client.get(reverse('listar_produtos'))
+        self.client.force_authenticate(admin)
+        response = self.client.get(reverse('cache_catalogo'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['hits'], 1)
+        self.assertEqual(response.data['misses'], 1)
+
+    def test_listar_produtos_por_cursor(self):
+        Produto.objects.create(nome='Produto C', preco=Decimal('100.00'), estoque=1)
+        url = reverse('listar_produtos') + '?paginacao=cursor&ordenar_por=preco&itens_por_pagina=2'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('total_items', response.data)
+        self.assertEqual([p['nome'] for p in response.data['produtos']], ['Produto A', 'Produto C'])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(response.data['next'])
+        self.assertFalse(any('COUNT' in q['sql'] for q in queries.captured_queries))
+        self.assertEqual([p['nome'] for p in response.data['produtos']], ['Produto B'])
+        self.assertIsNone(response.data['next'])
+
+    def test_listar_produtos_cursor_invalido(self):
+        response = self.client.get(reverse('listar_produtos') + '?cursor=invalido')
+        self.assertEqual(response.status_code, 400)
+
+
+class CacheCatalogoLocalTest(APITestCase):
+    # com o locmem padrao cada processo teria a sua versao do catalogo
+    def setUp(self):
+        cache.clear()
+        self.produto = Produto.objects.create(nome='Produto A', preco=Decimal('100.00'), estoque=10)
+
+    def test_desligado_sem_cache_compartilhado(self):
+        self.assertFalse(catalogo_em_cache())
+        url = reverse('listar_produtos')
+        etag = self.client.get(url)['ETag']
+        # escrita feita por outro processo: a versao deste processo nao muda
+        with mock.patch('api_app.catalogo.invalidar_catalogo'), mock.patch('api_app.signals.invalidar_catalogo'):
+            Produto.objects.filter(pk=self.produto.pk).update(preco=Decimal('80.00'), atualizado_em=timezone.now())
+            Produto.objects.create(nome='Produto B', preco=Decimal('5.00'), estoque=1).delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['produtos'][0]['preco'], '80.00')
+        self.assertEqual(response.data['total_items'], 1)
+
+    def test_etag_muda_com_remocao_em_outro_processo(self):
+        Produto.objects.create(nome='Produto B', preco=Decimal('5.00'), estoque=1)
+        url = reverse('listar_produtos')
+        etag = self.client.get(url)['ETag']
+        with mock.patch('api_app.signals.invalidar_catalogo'):
+            Produto.objects.filter(nome='Produto B').delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_ligado_com_cache_compartilhado(self):
+        compartilhado = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379'}}
+        with override_settings(CACHES=compartilhado):
+            self.assertTrue(catalogo_em_cache())
+        with override_settings(CATALOGO_EM_CACHE=False, CACHES=compartilhado):
+            self.assertFalse(catalogo_em_cache())
+
+    def test_aviso_ao_forcar_cache_local(self):
+        self.assertEqual(verificar_caches_locais(None), [])
+        with override_settings(CATALOGO_EM_CACHE=True):
+            self.assertEqual([aviso.id for aviso in verificar_caches_locais(None)], ['api_app.W001'])
+        with override_settings(LISTA_NEGRA_BLOOM=True):
+            self.assertEqual([aviso.id for aviso in verificar_caches_locais(None)], ['api_app.W002'])
+        with override_settings(REPLICA_LEITURA=True):
+            self.assertEqual([aviso.id for aviso in verificar_caches_locais(None)], ['api_app.W003'])
+        with override_settings(USUARIO_EM_CACHE=True):
+            self.assertEqual([aviso.id for aviso in verificar_caches_locais(None)], ['api_app.W004'])
+
+
+@override_settings(CATALOGO_EM_CACHE=True)
+class ETagListagensTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cliente12', password='senha123')
+        self.cliente = Cliente.objects.create(user=self.user, saldo=Decimal('1000.00'))
+        self.produto = Produto.objects.create(nome='Produto A', preco=Decimal('100.00'), estoque=10)
+
+    def test_produtos_nao_modificados(self):
+        url = reverse('listar_produtos')
+        etag = self.client.get(url)['ETag']
+        with mock.patch.object(ProdutoSerializer, 'to_representation') as to_representation:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            # sem a resposta em cache o ETag e recalculado pelos marcadores do banco
+            with mock.patch('api_app.views.obter_resposta', return_value=None):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+        to_representation.assert_not_called()
+
+        response = self.client.get(url + '?ordenar_por=preco', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_produtos_etag_muda_apos_compra(self):
+        url = reverse('listar_produtos')
+        etag = self.client.get(url)['ETag']
+        realizar_compra(self.cliente.id, self.produto.id, 1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['produtos'][0]['estoque'], 9)
+
+    def test_transacoes_nao_modificadas(self):
+        url = reverse('listar_transacoes')
+        self.client.force_authenticate(self.user)
+        realizar_compra(self.cliente.id, self.produto.id, 1)
+        etag = self.client.get(url)['ETag']
+        with mock.patch.object(TransacaoSerializer, 'to_representation') as to_representation:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        to_representation.assert_not_called()
+
+        realizar_compra(self.cliente.id, self.produto.id, 1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_items'], 2)
+
+    def test_transacoes_etag_nao_percorre_historico(self):
+        url = reverse('listar_transacoes')
+        self.client.force_authenticate(self.user)
+        realizar_compra(self.cliente.id, self.produto.id, 1)
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('api_app_transacao' in q['sql'] for q in queries.captured_queries))
+
+    def test_transacoes_etag_muda_com_remocao_em_cascata(self):
+        outro = Produto.objects.create(nome='Outro', preco=Decimal('10.00'), estoque=10)
+        realizar_compra(self.cliente.id, self.produto.id, 1)
+        realizar_compra(self.cliente.id, outro.id, 1)
+        url = reverse('listar_transacoes')
+        self.client.force_authenticate(self.user)
+        etag = self.client.get(url)['ETag']
+        outro.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_items'], 1)
+        resumo = ResumoCliente.objects.get(cliente=self.cliente)
+        self.assertEqual((resumo.quantidade_compras, resumo.total_gasto), (1, Decimal('100.00')))
+
+    def test_transacoes_filtro_produto_etag_muda_ao_renomear(self):
+        outro = Produto.objects.create(nome='Outro', preco=Decimal('10.00'), estoque=10)
+        realizar_compra(self.cliente.id, outro.id, 1)
+        url = reverse('listar_transacoes') + '?produto=Caneca'
+        self.client.force_authenticate(self.user)
+        response = self.client.get(url)
+        self.assertEqual(response.data['total_items'], 0)
+        outro.nome = 'Caneca'
+        outro.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_items'], 1)
+
 
 class CompraViewTest(APITestCase):
     def setUp(self):
@@ -136,10 +626,339 @@ class CompraViewTest(APITestCase):
         self.produto.refresh_from_db()
         self.cliente.refresh_from_db()
         self.assertEqual(self.produto.estoque, 2)
-        self.assertEqual(str(self.cliente.saldo), '200.00')
+        self.assertEqual(str(saldo_atual(self.cliente.id)), '200.00')
+
+    def test_comprar_sem_estoque_nao_debita_saldo(self):
+        url = reverse('compra')
+        data = {
+            'username': 'cliente4',
+            'produto_id': self.produto.id,
+            'quantidade': 6
+        }
+        self.cliente.saldo = Decimal('1000.00')
+        self.cliente.save()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.access_token)
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Estoque insuficiente')
+        self.cliente.refresh_from_db()
+        self.assertEqual(str(saldo_atual(self.cliente.id)), '1000.00')
+        self.assertFalse(Transacao.objects.exists())
+
+    def test_comprar_quantidade_invalida(self):
+        url = reverse('compra')
+        data = {
+            'username': 'cliente4',
+            'produto_id': self.produto.id,
+            'quantidade': -1
+        }
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.access_token)
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.estoque, 5)
+
+    def test_compra_usa_updates_condicionais(self):
+        with CaptureQueriesContext(connection) as queries:
+            realizar_compra(self.cliente.id, self.produto.id, 1)
+        sqls = [q['sql'] for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']]
+        # o resumo do cliente e o consolidado de vendas sao atualizados na mesma transacao
+        resumo = [sql for sql in sqls if '"api_app_resumocliente"' in sql]
+        vendas = [sql for sql in sqls if '"api_app_vendadiaria"' in sql]
+        self.assertTrue(resumo)
+        self.assertEqual(len(vendas), 1)
+        # preco, debito no livro-razao (INSERT, lock e saldo), estoque e transacao
+        self.assertEqual(len(sqls) - len(resumo) - len(vendas), 6)
+        self.assertFalse(any(sql.startswith('UPDATE "api_app_cliente"') for sql in sqls))
+        self.assertTrue(any('UPDATE "api_app_produto"' in sql and '"estoque" >=' in sql for sql in sqls))
+
+    def test_compra_atualiza_resumo(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.access_token)
+        for quantidade in (1, 2):
+            self.client.post(reverse('compra'), {'username': 'cliente4', 'produto_id': self.produto.id, 'quantidade': quantidade}, format='json')
+
+        # uma consulta autentica (usuario e cliente juntos) e outra le o resumo
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('resumo_cliente'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_gasto'], '300.00')
+        self.assertEqual(response.data['quantidade_compras'], 2)
+        self.assertEqual(response.data['itens_comprados'], 3)
+        ultima = Transacao.objects.latest('data').data
+        self.assertEqual(response.data['ultima_compra'], ultima.isoformat().replace('+00:00', 'Z'))
+
+    def test_resumo_sem_compras(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.access_token)
+        response = self.client.get(reverse('resumo_cliente'))
+        self.assertEqual(response.data['total_gasto'], '0.00')
+        self.assertEqual(response.data['quantidade_compras'], 0)
+        self.assertIsNone(response.data['ultima_compra'])
+
+    def test_reconstruir_resumos(self):
+        realizar_compra(self.cliente.id, self.produto.id, 2)
+        ResumoCliente.objects.filter(cliente=self.cliente).update(total_gasto=0, quantidade_compras=7)
+
+        saida = StringIO()
+        call_command('reconstruir_resumos', verificar=True, stdout=saida)
+        self.assertIn('1 resumos divergentes encontrados', saida.getvalue())
+        self.assertEqual(ResumoCliente.objects.get(cliente=self.cliente).quantidade_compras, 7)
+
+        call_command('reconstruir_resumos', lote=1, stdout=StringIO())
+        resumo = ResumoCliente.objects.get(cliente=self.cliente)
+        self.assertEqual((resumo.total_gasto, resumo.quantidade_compras, resumo.itens_comprados), (Decimal('200.00'), 1, 2))
+
+
+class AgrupamentoComprasTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='agrupado', password='senha123')
+        self.cliente = Cliente.objects.create(user=self.user, saldo=Decimal('100.00'))
+        self.produto = Produto.objects.create(nome='Produto', preco=Decimal('10.00'), estoque=5)
+
+    def test_lote_isola_compras_recusadas(self):
+        agrupador = AgrupadorCompras()
+        resultados = {}
+
+        def comprar(quantidade):
+            # espera a thread principal virar lider; so o lider usa o banco
+            while not agrupador._lider_ativo:
+                time.sleep(0.001)
+            try:
+                resultados[quantidade] = agrupador.executar(self.cliente.id, self.produto.id, quantidade)
+            except CompraError as e:
+                resultados[quantidade] = e
+
+        # o lider espera ate juntar COMPRAS_MAX_LOTE pedidos, entao as tres compras caem no mesmo lote
+        with override_settings(COMPRAS_JANELA_MS=5000, COMPRAS_MAX_LOTE=3):
+            threads = [threading.Thread(target=comprar, args=(quantidade,)) for quantidade in (9, 2)]
+            for thread in threads:
+                thread.start()
+            resultados[1] = agrupador.executar(self.cliente.id, self.produto.id, 1)
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(agrupador.lotes, 1)
+        self.assertIsInstance(resultados[1], Transacao)
+        self.assertIsInstance(resultados[2], Transacao)
+        self.assertEqual(resultados[9].mensagem, 'Estoque insuficiente')
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.estoque, 2)
+        self.assertEqual(saldo_atual(self.cliente.id), Decimal('70.00'))
+
+    @override_settings(COMPRAS_AGRUPADAS=True, COMPRAS_JANELA_MS=0)
+    def test_compra_view_agrupada(self):
+        self.client.force_authenticate(self.user)
+        url = reverse('compra')
+        response = self.client.post(url, {'username': 'agrupado', 'produto_id': self.produto.id, 'quantidade': 2}, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(url, {'username': 'agrupado', 'produto_id': self.produto.id, 'quantidade': 4}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Estoque insuficiente')
+        self.assertEqual(Transacao.objects.count(), 1)
+
+
+class CheckoutViewTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cliente5', email='cliente5@email.com', password='senha123')
+        self.cliente = Cliente.objects.create(user=self.user, saldo=Decimal('1000.00'))
+        self.produtos = [
+            Produto.objects.create(nome=f'Produto {i}', preco=Decimal('10.00'), estoque=5)
+            for i in range(20)
+        ]
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(refresh.access_token))
+
+    def test_checkout_carrinho(self):
+        itens = [{'produto_id': p.id, 'quantidade': 2} for p in self.produtos]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('checkout'), {'itens': itens}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total'], '400.00')
+        self.assertEqual(Transacao.objects.filter(cliente=self.cliente).count(), 20)
+        self.assertFalse(Produto.objects.exclude(estoque=3).exists())
+        self.cliente.refresh_from_db()
+        self.assertEqual(str(saldo_atual(self.cliente.id)), '600.00')
+        self.assertEqual(self.cliente.resumo.quantidade_compras, 20)
+        self.assertEqual(self.cliente.resumo.total_gasto, Decimal('400.00'))
+        # o numero de consultas nao cresce com o tamanho do carrinho
+        sqls = [q['sql'] for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']]
+        self.assertLess(len(sqls), 14)
+
+    def test_checkout_sem_estoque_desfaz_tudo(self):
+        itens = [
+            {'produto_id': self.produtos[0].id, 'quantidade': 1},
+            {'produto_id': self.produtos[1].id, 'quantidade': 3},
+            {'produto_id': self.produtos[1].id, 'quantidade': 3},
+        ]
+        response = self.client.post(reverse('checkout'), {'itens': itens}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Transacao.objects.exists())
+        self.assertFalse(Produto.objects.exclude(estoque=5).exists())
+        self.cliente.refresh_from_db()
+        self.assertEqual(str(saldo_atual(self.cliente.id)), '1000.00')
+
+    def test_checkout_produto_inexistente(self):
+        itens = [{'produto_id': 999999, 'quantidade': 1}]
+        response = self.client.post(reverse('checkout'), {'itens': itens}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
 
+class EstoqueFatiadoTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='promo', password='senha123')
+        self.cliente = Cliente.objects.create(user=user, saldo=Decimal('1000.00'))
+        self.produto = Produto.objects.create(nome='Promoção', preco=Decimal('1.00'), estoque=10)
+        fatiar(self.produto.id, 4)
+
+    def test_fatiar_divide_estoque(self):
+        self.assertEqual(sorted(FatiaEstoque.objects.values_list('estoque', flat=True)), [2, 2, 3, 3])
+        self.assertEqual(estoque_total(self.produto.id), 10)
+        self.produto.refresh_from_db()
+        self.assertTrue(self.produto.estoque_fatiado)
+
+    def test_compra_baixa_uma_fatia_sem_tocar_no_produto(self):
+        with CaptureQueriesContext(connection) as queries:
+            realizar_compra(self.cliente.id, self.produto.id, 2)
+        self.assertEqual(estoque_total(self.produto.id), 8)
+        self.assertEqual(FatiaEstoque.objects.filter(estoque__lt=2).count(), 1)
+        self.assertFalse(any(q['sql'].startswith('UPDATE "api_app_produto"') for q in queries.captured_queries))
+
+    def test_compra_sincroniza_estoque_exibido(self):
+        versao = versao_catalogo()
+        with mock.patch('api_app.estoque.INTERVALO_SINCRONIZACAO', 0):
+            with self.captureOnCommitCallbacks(execute=True):
+                realizar_compra(self.cliente.id, self.produto.id, 2)
+            self.assertNotEqual(versao_catalogo(), versao)
+            self.assertEqual(Produto.objects.get(id=self.produto.id).estoque, 8)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                realizar_checkout(self.cliente.id, [{'produto_id': self.produto.id, 'quantidade': 3}])
+            self.assertEqual(Produto.objects.get(id=self.produto.id).estoque, 5)
+
+    def test_compras_no_intervalo_agendam_uma_sincronizacao(self):
+        self.addCleanup(_agendados.clear)
+        with mock.patch('api_app.estoque.threading.Timer') as timer:
+            for _ in range(3):
+                with self.captureOnCommitCallbacks(execute=True):
+                    realizar_compra(self.cliente.id, self.produto.id, 1)
+            timer.assert_called_once()
+            with mock.patch('api_app.estoque.connection'):
+                _sincronizar_agendado(*timer.call_args.kwargs['args'])
+        self.assertEqual(Produto.objects.get(id=self.produto.id).estoque, 7)
+
+        # depois da sincronizacao a proxima compra agenda de novo
+        with mock.patch('api_app.estoque.threading.Timer') as timer:
+            with self.captureOnCommitCallbacks(execute=True):
+                realizar_compra(self.cliente.id, self.produto.id, 1)
+        timer.assert_called_once()
+
+    def test_baixa_maior_que_uma_fatia_usa_varias(self):
+        with transaction.atomic():
+            self.assertTrue(baixar_fatias(self.produto.id, 7))
+        self.assertEqual(estoque_total(self.produto.id), 3)
+        with transaction.atomic():
+            self.assertFalse(baixar_fatias(self.produto.id, 4))
+        self.assertEqual(estoque_total(self.produto.id), 3)
+
+    def test_compra_sem_estoque_nas_fatias(self):
+        with self.assertRaisesMessage(CompraError, 'Estoque insuficiente'):
+            realizar_compra(self.cliente.id, self.produto.id, 11)
+        self.assertEqual(estoque_total(self.produto.id), 10)
+        self.assertEqual(saldo_atual(self.cliente.id), Decimal('1000.00'))
+
+    def test_checkout_com_produto_fatiado(self):
+        comum = Produto.objects.create(nome='Comum', preco=Decimal('5.00'), estoque=5)
+        itens = [{'produto_id': self.produto.id, 'quantidade': 9}, {'produto_id': comum.id, 'quantidade': 1}]
+        _, total = realizar_checkout(self.cliente.id, itens)
+        self.assertEqual(total, Decimal('14.00'))
+        self.assertEqual(estoque_total(self.produto.id), 1)
+        self.assertEqual(Produto.objects.get(id=comum.id).estoque, 4)
+
+        with self.assertRaises(CompraError):
+            realizar_checkout(self.cliente.id, [{'produto_id': comum.id, 'quantidade': 1}, {'produto_id': self.produto.id, 'quantidade': 2}])
+        self.assertEqual(Produto.objects.get(id=comum.id).estoque, 4)
+
+    def test_atualizacao_em_massa_nao_altera_estoque_fatiado(self):
+        resultado = atualizar_produtos([{'id': self.produto.id, 'estoque_delta': 5}])
+        self.assertEqual(resultado['atualizados'], 0)
+        self.assertEqual(resultado['rejeitados'][0]['id'], self.produto.id)
+        self.assertEqual(atualizar_produtos([{'id': self.produto.id, 'preco': '2.00'}])['atualizados'], 1)
+
+    def test_sincronizar_e_juntar(self):
+        realizar_compra(self.cliente.id, self.produto.id, 3)
+        saida = StringIO()
+        call_command('fatiar_estoque', sincronizar=True, stdout=saida)
+        self.assertIn('1 produtos sincronizados', saida.getvalue())
+        self.assertEqual(Produto.objects.get(id=self.produto.id).estoque, 7)
+
+        self.assertEqual(juntar(self.produto.id), 7)
+        self.produto.refresh_from_db()
+        self.assertFalse(self.produto.estoque_fatiado)
+        self.assertFalse(FatiaEstoque.objects.exists())
+        realizar_compra(self.cliente.id, self.produto.id, 1)
+        self.assertEqual(Produto.objects.get(id=self.produto.id).estoque, 6)
+
+
+class VendasAnaliticasTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin_vendas', password='senha123', is_staff=True)
+        user = User.objects.create_user(username='cliente_vendas', password='senha123')
+        self.cliente = Cliente.objects.create(user=user, saldo=Decimal('10000.00'))
+        self.produto_a = Produto.objects.create(nome='Produto A', preco=Decimal('10.00'), estoque=100)
+        self.produto_b = Produto.objects.create(nome='Produto B', preco=Decimal('50.00'), estoque=100)
+        realizar_compra(self.cliente.id, self.produto_a.id, 5)
+        realizar_compra(self.cliente.id, self.produto_a.id, 1)
+        realizar_compra(self.cliente.id, self.produto_b.id, 2)
+        self.hoje = timezone.localdate().isoformat()
+        refresh = RefreshToken.for_user(self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(refresh.access_token))
+
+    def test_compras_atualizam_consolidado(self):
+        linha = VendaDiaria.objects.get(produto=self.produto_a)
+        self.assertEqual((linha.quantidade, linha.receita, linha.transacoes), (6, Decimal('60.00'), 2))
+
+    def test_vendas_por_dia(self):
+        response = self.client.get(reverse('vendas_por_dia') + f'?inicio={self.hoje}&fim={self.hoje}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['dias'], [{'data': self.hoje, 'quantidade': 8, 'receita': '160.00', 'transacoes': 3}])
+
+        response = self.client.get(reverse('vendas_por_dia') + '?fim=2000-01-01')
+        self.assertEqual(response.data['dias'], [])
+
+    def test_top_produtos(self):
+        response = self.client.get(reverse('vendas_por_produto') + '?top=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['produto'] for p in response.data['produtos']], ['Produto A'])
+
+        response = self.client.get(reverse('vendas_por_produto') + '?ordenar_por=receita')
+        self.assertEqual([(p['produto'], p['receita']) for p in response.data['produtos']], [('Produto B', '100.00'), ('Produto A', '60.00')])
+
+    def test_nao_consulta_transacoes(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('vendas_por_produto') + '?top=5')
+        self.assertFalse(any('"api_app_transacao"' in q['sql'] for q in consultas.captured_queries))
+
+    def test_parametros_invalidos(self):
+        for params in ('?inicio=ontem', '?inicio=2024-02-10&fim=2024-02-01'):
+            response = self.client.get(reverse('vendas_por_dia') + params)
+            self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('vendas_por_produto') + '?top=0')
+        self.assertEqual(response.status_code, 400)
+
+    def test_somente_administradores(self):
+        refresh = RefreshToken.for_user(self.cliente.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(refresh.access_token))
+        self.assertEqual(self.client.get(reverse('vendas_por_dia')).status_code, 403)
+
+    def test_reconstruir_vendas(self):
+        VendaDiaria.objects.filter(produto=self.produto_a).update(quantidade=0)
+        VendaDiaria.objects.filter(produto=self.produto_b).delete()
+        call_command('reconstruir_vendas', desde=self.hoje, stdout=StringIO())
+        consolidado = dict(VendaDiaria.objects.values_list('produto_id', 'quantidade'))
+        self.assertEqual(consolidado, {self.produto_a.id: 6, self.produto_b.id: 2})
 
 
+@override_settings(LISTA_NEGRA_BLOOM=True)
 class LogoutViewTest(APITestCase):
     def setUp(self):
         self.user_data = {
@@ -155,6 +974,7 @@ class LogoutViewTest(APITestCase):
         refresh = RefreshToken.for_user(self.user)
         self.access_token = str(refresh.access_token)
         self.refresh_token = str(refresh)
+        lista_negra.limpar()
 
     def test_logout(self):
         url = reverse('logout')
@@ -164,6 +984,134 @@ class LogoutViewTest(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data['message'], 'Logout realizado com sucesso!')
 
+    def test_refresh_revogado_no_logout_e_recusado(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.access_token)
+        self.client.post(reverse('logout'), {'refresh': self.refresh_token}, format='json')
+
+        response = self.client.post(reverse('token_refresh'), {'refresh': self.refresh_token}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_rotacionado_e_recusado(self):
+        response = self.client.post(reverse('token_refresh'), {'refresh': self.refresh_token}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(reverse('token_refresh'), {'refresh': self.refresh_token}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_nao_revogado_nao_consulta_blacklist(self):
+        # carrega o filtro antes de medir
+        lista_negra.pode_estar_revogado('aquecimento')
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(reverse('token_refresh'), {'refresh': self.refresh_token}, format='json')
+        self.assertEqual(response.status_code, 200)
+        selects = [q['sql'] for q in consultas.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertFalse(any('INNER JOIN "token_blacklist_outstandingtoken"' in sql for sql in selects))
+
+    def test_revogacao_de_outro_processo_e_sincronizada(self):
+        lista_negra.pode_estar_revogado('aquecimento')
+        token = RefreshToken(self.refresh_token)
+        # grava direto na tabela, sem o signal, como faria outro processo
+        with mock.patch('api_app.signals.lista_negra'):
+            token.blacklist()
+        with mock.patch('api_app.tokens.INTERVALO_SINCRONIZACAO', 0):
+            self.assertTrue(lista_negra.pode_estar_revogado(token['jti']))
+
+    def test_revogacao_vale_na_hora_em_outro_processo(self):
+        # outro_processo simula o filtro de outro worker: nao recebe o signal,
+        # so o que for publicado no cache
+        outro_processo = ListaNegraJti()
+        outro_processo.pode_estar_revogado('aquecimento')
+        token = RefreshToken(self.refresh_token)
+        with mock.patch('api_app.tokens.INTERVALO_SINCRONIZACAO', 3600), \
+                mock.patch('api_app.tokens.INTERVALO_VERSAO', 0):
+            with self.captureOnCommitCallbacks(execute=True):
+                token.blacklist()
+            with CaptureQueriesContext(connection) as consultas:
+                self.assertTrue(outro_processo.pode_estar_revogado(token['jti']))
+            # o jti publicado no cache basta, sem ir ao banco
+            self.assertEqual(len(consultas.captured_queries), 0)
+
+            outro = RefreshToken.for_user(self.user)
+            with self.captureOnCommitCallbacks(execute=True):
+                outro.blacklist()
+            cache.delete(chave_revogacao(versao_lista_negra()))
+            self.assertTrue(outro_processo.pode_estar_revogado(outro['jti']))
+
+    def test_versao_lida_no_maximo_uma_vez_por_intervalo(self):
+        outro_processo = ListaNegraJti()
+        outro_processo.pode_estar_revogado('aquecimento')
+        token = RefreshToken(self.refresh_token)
+        with mock.patch('api_app.tokens.INTERVALO_SINCRONIZACAO', 3600), \
+                mock.patch('api_app.tokens.INTERVALO_VERSAO', 3600):
+            with self.captureOnCommitCallbacks(execute=True):
+                token.blacklist()
+            with mock.patch('api_app.tokens.versao_lista_negra') as versao:
+                # dentro do intervalo vale a versao ja lida, sem ir ao cache
+                self.assertFalse(outro_processo.pode_estar_revogado(token['jti']))
+            versao.assert_not_called()
+            outro_processo._versao_lida_em -= 3600
+            self.assertTrue(outro_processo.pode_estar_revogado(token['jti']))
+
+    def test_sem_cache_compartilhado_consulta_a_blacklist(self):
+        lista_negra.pode_estar_revogado('aquecimento')
+        token = RefreshToken(self.refresh_token)
+        # revogado por outro processo sem nada publicado no cache
+        with mock.patch('api_app.signals.lista_negra'), mock.patch('api_app.signals.sinalizar_revogacao'):
+            token.blacklist()
+        with override_settings(LISTA_NEGRA_BLOOM=None):
+            self.assertFalse(bloom_ativo())
+            response = self.client.post(reverse('token_refresh'), {'refresh': self.refresh_token}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+
+class PodarTokensTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cliente_tokens', password='senha123')
+        agora = timezone.now()
+        self.expirados = []
+        for i in range(5):
+            token = OutstandingToken.objects.create(
+                user=self.user, jti=f'expirado-{i}', token='x',
+                created_at=agora - timedelta(days=2), expires_at=agora - timedelta(days=1),
+            )
+            self.expirados.append(token)
+        BlacklistedToken.objects.create(token=self.expirados[0])
+        BlacklistedToken.objects.create(token=self.expirados[1])
+        self.valido = OutstandingToken.objects.create(
+            user=self.user, jti='valido', token='x', created_at=agora, expires_at=agora + timedelta(days=1),
+        )
+        BlacklistedToken.objects.create(token=self.valido)
+
+    def test_remove_apenas_expirados(self):
+        saida = StringIO()
+        call_command('podar_tokens', lote=2, stdout=saida)
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), ['valido'])
+        self.assertEqual(BlacklistedToken.objects.get().token_id, self.valido.id)
+        self.assertIn('5 tokens e 2 entradas da blacklist removidos', saida.getvalue())
+
+    def test_dry_run_nao_remove(self):
+        saida = StringIO()
+        call_command('podar_tokens', dry_run=True, stdout=saida)
+        self.assertEqual(OutstandingToken.objects.count(), 6)
+        self.assertEqual(BlacklistedToken.objects.count(), 3)
+        self.assertIn('5 tokens e 2 entradas da blacklist seriam removidos', saida.getvalue())
+
+
+class FiltroBloomTest(unittest.TestCase):
+    def test_sem_falso_negativo(self):
+        filtro = FiltroBloom(1000)
+        valores = [f'jti-{i}' for i in range(1000)]
+        for valor in valores:
+            filtro.adicionar(valor)
+        self.assertTrue(all(valor in filtro for valor in valores))
+
+    def test_taxa_de_falso_positivo(self):
+        filtro = FiltroBloom(1000, taxa_falso_positivo=0.01)
+        for i in range(1000):
+            filtro.adicionar(f'jti-{i}')
+        falsos = sum(f'outro-{i}' in filtro for i in range(10000))
+        self.assertLess(falsos, 300)
+
 
 class ListarTransacoesViewTest(APITestCase):
     def setUp(self):
@@ -198,6 +1146,115 @@ class ListarTransacoesViewTest(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data['total_items'], 1)
 
+    def test_listar_transacoes_por_cursor(self):
+        for quantidade in (1, 3):
+            Transacao.objects.create(cliente=self.cliente, produto=self.produto, quantidade=quantidade, total=Decimal('100.00') * quantidade)
+        url = reverse('listar_transacoes') + '?paginacao=cursor&ordenar_por=total&itens_por_pagina=2'
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.access_token)
+        response = self.client.get(url)
+        self.assertEqual([t['total'] for t in response.data['transacoes']], ['100.00', '200.00'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([t['total'] for t in response.data['transacoes']], ['300.00'])
+        self.assertIsNone(response.data['next'])
+
+
+    def test_exportar_ndjson(self):
+        for quantidade in (1, 3):
+            Transacao.objects.create(cliente=self.cliente, produto=self.produto, quantidade=quantidade, total=Decimal('100.00') * quantidade)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.access_token)
+        response = self.client.get(reverse('exportar_transacoes') + '?ordenar_por=total&quantidade_min=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        linhas = [json.loads(linha) for linha in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([linha['total'] for linha in linhas], ['200.00', '300.00'])
+        listagem = self.client.get(reverse('listar_transacoes') + '?ordenar_por=total&quantidade_min=2')
+        self.assertEqual(linhas, [dict(t) for t in listagem.data['transacoes']])
+
+    def test_exportar_csv(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.access_token)
+        response = self.client.get(reverse('exportar_transacoes') + '?formato=csv')
+        self.assertEqual(response.status_code, 200)
+        linhas = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(linhas[0], ['id', 'quantidade', 'total', 'data', 'cliente', 'produto'])
+        self.assertEqual(linhas[1][:3], [str(self.transacao.id), '2', '200.00'])
+        self.assertEqual(len(linhas), 2)
+
+    def test_exportar_formato_invalido(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.access_token)
+        response = self.client.get(reverse('exportar_transacoes') + '?formato=xml')
+        self.assertEqual(response.status_code, 400)
+
+    async def test_exportar_sob_asgi_em_streaming_assincrono(self):
+        for quantidade in (1, 3):
+            await Transacao.objects.acreate(cliente=self.cliente, produto=self.produto, quantidade=quantidade, total=Decimal('100.00') * quantidade)
+        autorizacao = {'Authorization': 'Bearer ' + self.access_token}
+        for formato in ('ndjson', 'csv'):
+            url = reverse('exportar_transacoes') + f'?formato={formato}&ordenar_por=total'
+            self.client.credentials(HTTP_AUTHORIZATION=autorizacao['Authorization'])
+            sincrona = await sync_to_async(self.client.get)(url)
+            esperado = b''.join(await sync_to_async(list)(sincrona.streaming_content))
+
+            with mock.patch('api_app.exportacao.TAMANHO_BLOCO', 1), warnings.catch_warnings():
+                # iterador sincrono sob ASGI: o Django avisa e junta tudo em memoria
+                warnings.filterwarnings('error', message='StreamingHttpResponse must consume synchronous iterators')
+                response = await self.async_client.get(url, headers=autorizacao)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.is_async)
+                conteudo = b''.join([parte async for parte in response.streaming_content])
+            self.assertEqual(conteudo, esperado)
+
+@override_settings(USUARIO_EM_CACHE=True)
+class AutenticacaoEmCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cliente15', password='senha123')
+        self.cliente = Cliente.objects.create(user=self.user, saldo=Decimal('0.00'))
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(refresh.access_token))
+
+    def consultas_auth(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [q['sql'] for q in queries.captured_queries if '"auth_user"' in q['sql'] or '"api_app_cliente"' in q['sql']]
+
+    def test_usuario_e_cliente_em_uma_consulta(self):
+        url = reverse('listar_transacoes')
+        consultas = self.consultas_auth(url)
+        self.assertEqual(len(consultas), 1)
+        self.assertIn('"api_app_cliente"', consultas[0])
+        # no acerto do cache so o is_active e conferido, sem o join
+        consultas = self.consultas_auth(url)
+        self.assertEqual(len(consultas), 1)
+        self.assertNotIn('"api_app_cliente"', consultas[0])
+
+    def test_usuario_desativado_sem_signal_perde_acesso(self):
+        url = reverse('listar_transacoes')
+        self.consultas_auth(url)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 401)
+        self.assertIsNone(cache.get(chave_usuario(self.user.pk)))
+
+    def test_desligado_com_cache_local(self):
+        url = reverse('listar_transacoes')
+        with override_settings(USUARIO_EM_CACHE=None):
+            self.consultas_auth(url)
+            self.assertIsNone(cache.get(chave_usuario(self.user.pk)))
+            consultas = self.consultas_auth(url)
+        self.assertEqual(len(consultas), 1)
+        self.assertIn('"api_app_cliente"', consultas[0])
+
+    def test_invalida_ao_alterar_senha_e_saldo(self):
+        self.consultas_auth(reverse('listar_transacoes'))
+        self.client.post(reverse('add_saldo'), {'saldo': '10.00'}, format='json')
+        self.assertIsNone(cache.get(chave_usuario(self.user.pk)))
+
+        self.consultas_auth(reverse('listar_transacoes'))
+        data = {'senha_atual': 'senha123', 'nova_senha': 'novaSenha123', 'confirmar_senha': 'novaSenha123'}
+        self.client.post(reverse('alterar_senha'), data, format='json')
+        self.assertIsNone(cache.get(chave_usuario(self.user.pk)))
+
 
 class ChangePasswordViewTest(APITestCase):
     def setUp(self):
@@ -260,3 +1317,384 @@ class DeleteUserViewTest(APITestCase):
             Cliente.objects.get(user=self.user)
         with self.assertRaises(User.DoesNotExist):
             User.objects.get(username=self.user_data['username'])
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "FTS5 é específico do SQLite")
+class BuscaProdutosTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.cafe = Produto.objects.create(nome='Café Expresso', preco=Decimal('10.00'), estoque=5)
+        self.cafeteira = Produto.objects.create(nome='Cafeteira Elétrica Café', preco=Decimal('90.00'), estoque=5)
+        Produto.objects.create(nome='Chá Verde', preco=Decimal('8.00'), estoque=5)
+
+    def buscar(self, nome):
+        response = self.client.get(reverse('listar_produtos'), {'nome': nome})
+        return [p['nome'] for p in response.data['produtos']]
+
+    def test_busca_por_prefixo_sem_acento(self):
+        self.assertEqual(set(self.buscar('cafe')), {'Café Expresso', 'Cafeteira Elétrica Café'})
+        self.assertEqual(self.buscar('caf expr'), ['Café Expresso'])
+
+    def test_busca_ordenada_por_relevancia(self):
+        self.assertEqual(self.buscar('café')[0], 'Cafeteira Elétrica Café')
+
+    def test_indice_sincronizado(self):
+        self.cafe.nome = 'Chocolate Quente'
+        self.cafe.save()
+        self.assertEqual(self.buscar('expresso'), [])
+        self.assertEqual(self.buscar('choc'), ['Chocolate Quente'])
+        self.cafeteira.delete()
+        self.assertEqual(self.buscar('cafeteira'), [])
+
+    def test_busca_sem_palavras_usa_icontains(self):
+        self.assertEqual(self.buscar('%'), [])
+
+    def test_indice_mantido_apos_todas_as_migracoes(self):
+        # o banco de teste e criado pelas migracoes; se alguma recriar a tabela
+        # api_app_produto sem recriar os triggers, o produto novo nao entra no
+        # indice e a busca cairia silenciosamente no icontains
+        self.assertTrue(fts_disponivel())
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'api_app_produto'")
+            self.assertEqual({linha[0] for linha in cursor.fetchall()}, {f'{TABELA_FTS}_ai', f'{TABELA_FTS}_ad', f'{TABELA_FTS}_au'})
+        produto = Produto.objects.create(nome='Biscoito Integral', preco=Decimal('4.00'), estoque=5)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT rowid FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s", ['"biscoito"*'])
+            self.assertEqual([linha[0] for linha in cursor.fetchall()], [produto.id])
+        self.assertEqual(self.buscar('biscoito'), ['Biscoito Integral'])
+
+
+class SerializacaoRapidaTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='cliente_serializacao', password='senha123')
+        cliente = Cliente.objects.create(user=user, saldo=Decimal('100.00'))
+        for i, preco in enumerate(['0.10', '19.90', '1234.50', '99999999.99']):
+            produto = Produto.objects.create(nome=f'Produto {i}', preco=Decimal(preco), estoque=i)
+            Transacao.objects.create(cliente=cliente, produto=produto, quantidade=i + 1, total=Decimal(preco))
+
+    def assertMesmoJson(self, queryset, serializer_class):
+        esperado = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        self.assertEqual(JSONRenderer().render(serializar_valores(queryset, serializer_class)), esperado)
+
+    def test_produtos_identicos_ao_serializer(self):
+        self.assertMesmoJson(Produto.objects.order_by('id'), ProdutoSerializer)
+
+    def test_transacoes_identicas_ao_serializer(self):
+        self.assertMesmoJson(Transacao.objects.order_by('id'), TransacaoSerializer)
+
+    def test_datas_no_fuso_ativo(self):
+        with timezone.override('America/Recife'):
+            self.assertMesmoJson(Transacao.objects.order_by('id'), TransacaoSerializer)
+
+    def test_busca_por_nome(self):
+        queryset = filtrar_produtos(QueryDict('nome=produto'))
+        self.assertMesmoJson(queryset, ProdutoSerializer)
+
+    def test_uma_consulta(self):
+        with self.assertNumQueries(1):
+            serializar_valores(Transacao.objects.all(), TransacaoSerializer)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN é específico do SQLite")
+class PlanoConsultasTest(TestCase):
+    # garante que as consultas das listagens continuam usando indices; um
+    # "SCAN tabela" sem indice ou um sort em B-tree temporaria reprova o teste
+
+    def assertUsaIndice(self, queryset, ordena_resultado=False):
+        plano = queryset.explain()
+        for linha in plano.splitlines():
+            if not ordena_resultado:
+                self.assertNotIn('USE TEMP B-TREE', linha, plano)
+            self.assertFalse(re.search(r'\bSCAN \w+$', linha.strip()), plano)
+
+    def test_listagem_produtos(self):
+        for params in ['preco_max=10', 'ordenar_por=preco', 'ordenar_por=estoque', 'preco_max=10&ordenar_por=preco']:
+            with self.subTest(params=params):
+                self.assertUsaIndice(filtrar_produtos(QueryDict(params))[0:10])
+
+    def test_listagem_produtos_por_cursor(self):
+        for campo, valor in [('preco', Decimal('10.00')), ('estoque', 3)]:
+            with self.subTest(campo=campo):
+                queryset = Produto.objects.order_by(campo, 'id').filter(
+                    Q(**{f'{campo}__gt': valor}) | Q(**{campo: valor, 'id__gt': 1})
+                )
+                self.assertUsaIndice(queryset[:11])
+
+    def test_listagem_transacoes(self):
+        for params in ['', 'ordenar_por=data', 'ordenar_por=total', 'quantidade_min=2&ordenar_por=data', 'produto=A']:
+            with self.subTest(params=params):
+                self.assertUsaIndice(filtrar_transacoes(1, QueryDict(params))[0:10])
+
+    def test_listagem_transacoes_por_cursor(self):
+        data = timezone.now()
+        queryset = Transacao.objects.filter(cliente=1).order_by('data', 'id').filter(
+            Q(data__gt=data) | Q(data=data, id__gt=1)
+        )
+        self.assertUsaIndice(queryset[:11])
+
+    def test_busca_por_nome(self):
+        # a ordenacao por relevancia so ordena as linhas que casaram com o MATCH
+        self.assertUsaIndice(filtrar_produtos(QueryDict('nome=cafe'))[0:10], ordena_resultado=True)
+
+    def test_verificacao_email(self):
+        self.assertUsaIndice(EmailVerification.objects.filter(user__email='cliente@email.com'))
+
+
+class PerfilSqliteTest(TestCase):
+    def pragma(self, nome):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {nome}')
+            return cursor.fetchone()[0]
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', "perfil especifico do SQLite")
+    def test_pragmas_aplicados_na_conexao(self):
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('temp_store'), 2)
+        self.assertEqual(self.pragma('cache_size'), -65536)
+
+
+@override_settings(REPLICA_LEITURA=True, CATALOGO_EM_CACHE=True)
+class ReplicaLeituraTest(APITestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='leitor', password='senha123')
+        Produto.objects.create(nome='No primario', preco=Decimal('1.00'), estoque=1)
+        # a replica de teste e um banco separado, entao o que existe so nela
+        # mostra de onde a listagem leu
+        Produto.objects.using('replica').create(nome='Na replica', preco=Decimal('1.00'), estoque=1)
+
+    def nomes_listados(self, **params):
+        response = self.client.get(reverse('listar_produtos'), params)
+        return [produto['nome'] for produto in response.data['produtos']]
+
+    def test_listagem_le_da_replica(self):
+        self.assertEqual(self.nomes_listados(), ['Na replica'])
+
+    def test_usuario_que_escreveu_le_do_primario(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.nomes_listados(), ['Na replica'])
+        fixar_no_primario(self.user.pk)
+        # mesma query string: a resposta lida da replica esta no cache, mas nao
+        # serve para quem le do primario
+        self.assertEqual(self.nomes_listados(), ['No primario'])
+
+    def test_etag_da_replica_nao_vale_no_primario(self):
+        self.client.force_authenticate(self.user)
+        etag = self.client.get(reverse('listar_produtos'))['ETag']
+        fixar_no_primario(self.user.pk)
+        response = self.client.get(reverse('listar_produtos'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    @override_settings(REPLICA_LEITURA=False)
+    def test_replica_desligada(self):
+        self.assertEqual(self.nomes_listados(), ['No primario'])
+
+    def test_leituras_depois_de_escrever_ficam_no_primario(self):
+        roteador = RoteadorReplica()
+        self.assertIsNone(roteador.db_for_read(Produto))
+        with ler_da_replica():
+            self.assertEqual(roteador.db_for_read(Produto), 'replica')
+            self.assertEqual(roteador.db_for_write(Produto), 'default')
+            self.assertIsNone(roteador.db_for_read(Produto))
+        with ler_da_replica():
+            self.assertEqual(roteador.db_for_read(Produto), 'replica')
+
+
+@override_settings(CATALOGO_EM_CACHE=True)
+class ViewsAsyncTest(TestCase):
+    # o AsyncClient passa pela cadeia de middlewares assincrona, como o ASGI
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='assincrono', password='senha123')
+        self.cliente = Cliente.objects.create(user=self.user, saldo=Decimal('500.00'))
+        for i in range(15):
+            produto = Produto.objects.create(nome=f'Produto {i}', preco=Decimal('10.50') + i, estoque=i)
+            Transacao.objects.create(cliente=self.cliente, produto=produto, quantidade=1, total=produto.preco)
+        self.autorizacao = 'Bearer ' + str(RefreshToken.for_user(self.user).access_token)
+
+    async def comparar(self, url, **extra):
+        # sem o cache de respostas, para que as duas views executem as consultas
+        with mock.patch('api_app.views.obter_resposta', return_value=None), \
+                mock.patch('api_app.views_async.aobter_resposta', new_callable=mock.AsyncMock, return_value=None):
+            sincrona = await sync_to_async(self.client.get)(url, **extra)
+            assincrona = await self.async_client.get(url, **extra)
+        self.assertEqual(assincrona.status_code, sincrona.status_code)
+        self.assertEqual(assincrona.content, sincrona.content)
+        self.assertEqual(assincrona.get('ETag'), sincrona.get('ETag'))
+        return assincrona
+
+    async def test_listar_produtos_async(self):
+        url = reverse('listar_produtos')
+        response = await self.comparar(url)
+        self.assertIs(response.resolver_match.func.view_class, ListarProdutosAsyncView)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        await self.comparar(url + '?ordenar_por=preco&preco_max=15&itens_por_pagina=3&pagina=2')
+        await self.comparar(url + '?nome=produto&contar=false')
+
+        primeira = await self.comparar(url + '?paginacao=cursor&ordenar_por=preco&itens_por_pagina=4')
+        await self.comparar(json.loads(primeira.content)['next'])
+        self.assertEqual((await self.comparar(url + '?cursor=invalido')).status_code, 400)
+
+    async def test_listar_produtos_async_cache_e_etag(self):
+        url = reverse('listar_produtos')
+        primeira = await self.async_client.get(url)
+        self.assertEqual((await self.async_client.get(url))['X-Cache'], 'HIT')
+        response = await self.async_client.get(url, headers={'If-None-Match': primeira['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_head_nas_rotas_async(self):
+        response = await self.async_client.head(reverse('listar_produtos'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        self.assertTrue(response['ETag'])
+        response = await self.async_client.head(reverse('listar_transacoes'), headers={'Authorization': self.autorizacao})
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(USUARIO_EM_CACHE=True)
+    async def test_cache_nao_bloqueia_o_event_loop(self):
+        # a API sincrona do cache so pode rodar fora do event loop (nas threads
+        # do sync_to_async usado pelos metodos async do backend)
+        chamadas_no_loop = []
+
+        def vigiar(nome):
+            original = getattr(cache, nome)
+
+            def chamar(*args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                    chamadas_no_loop.append(nome)
+                except RuntimeError:
+                    pass
+                return original(*args, **kwargs)
+            return mock.patch.object(cache, nome, chamar)
+
+        with ExitStack() as pilha:
+            for nome in ('get', 'get_many', 'set', 'set_many', 'add', 'incr', 'delete'):
+                pilha.enter_context(vigiar(nome))
+            for _ in range(2):
+                await self.async_client.get(reverse('listar_produtos') + '?contar=false')
+                await self.async_client.get(reverse('listar_transacoes') + '?produto=1', headers={'Authorization': self.autorizacao})
+        self.assertEqual(chamadas_no_loop, [])
+
+    async def test_listar_transacoes_async(self):
+        url = reverse('listar_transacoes') + '?ordenar_por=total&itens_por_pagina=5'
+        response = await self.comparar(url, headers={'Authorization': self.autorizacao})
+        self.assertIs(response.resolver_match.func.view_class, ListarTransacoesAsyncView)
+        self.assertEqual(json.loads(response.content)['total_items'], 15)
+        await self.comparar(url + '&paginacao=cursor', headers={'Authorization': self.autorizacao})
+
+        response = await self.async_client.get(url, headers={'Authorization': self.autorizacao, 'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_autenticacao_async(self):
+        url = reverse('listar_transacoes')
+        response = await self.comparar(url)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+        response = await self.comparar(url, headers={'Authorization': 'Bearer invalido'})
+        self.assertEqual(response.status_code, 401)
+
+
+def token_falso(jti, validade=3600):
+    # JWT com exp no futuro; o cliente so le o payload, sem validar a assinatura
+    payload = json.dumps({'exp': int(time.time()) + validade, 'jti': jti}).encode()
+    return 'cabecalho.' + base64.urlsafe_b64encode(payload).decode().rstrip('=') + '.assinatura'
+
+
+class SessionFalsa(requests.Session):
+    # troca a rede por uma funcao que recebe a requisicao e devolve (status, json)
+    def __init__(self, responder):
+        super().__init__()
+        self.responder = responder
+        self.chamadas = []
+        self._trava = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        with self._trava:
+            self.chamadas.append((method, url, kwargs.get('params')))
+        status_code, dados = self.responder(
+            method, url, params=kwargs.get('params'), json=kwargs.get('json'), headers=kwargs.get('headers') or {}
+        )
+        response = requests.Response()
+        response.status_code = status_code
+        response.url = url
+        response._content = b'' if dados is None else json.dumps(dados).encode()
+        return response
+
+
+class ClienteHttpTest(SimpleTestCase):
+    # client/basic_client.py com a camada HTTP trocada por uma SessionFalsa
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        diretorio = str(Path(__file__).resolve().parents[2] / 'client')
+        sys.path.insert(0, diretorio)
+        cls.addClassCleanup(sys.path.remove, diretorio)
+        cls.modulo = importlib.import_module('basic_client')
+
+    def criar_cliente(self, responder, token=None, refresh='refresh-1'):
+        cliente = self.modulo.EcommerceClient('http://api/')
+        cliente.session = SessionFalsa(responder)
+        cliente.token = token or token_falso('antigo')
+        cliente.refresh = refresh
+        return cliente
+
+    def test_401_simultaneos_renovam_o_token_uma_vez(self):
+        threads = 8
+        novo = token_falso('novo')
+        # todas as threads so recebem o 401 depois que todas enviaram o token
+        # antigo, entao todas tentam renovar ao mesmo tempo
+        barreira = threading.Barrier(threads)
+        renovacoes = []
+
+        def responder(metodo, url, json, headers, **kwargs):
+            if url.endswith('login/refresh/'):
+                renovacoes.append(json['refresh'])
+                return 200, {'access': novo, 'refresh': 'refresh-2'}
+            if headers['Authorization'] == f'Bearer {novo}':
+                return 200, {'total_items': 0, 'transacoes': []}
+            barreira.wait(timeout=5)
+            return 401, {'detail': 'Token expirado'}
+
+        cliente = self.criar_cliente(responder)
+        with ThreadPoolExecutor(threads) as executor:
+            resultados = list(executor.map(lambda _: cliente.listar_transacoes(), range(threads)))
+        self.assertEqual(renovacoes, ['refresh-1'])
+        self.assertEqual(resultados, [{'total_items': 0, 'transacoes': []}] * threads)
+        self.assertEqual((cliente.token, cliente.refresh), (novo, 'refresh-2'))
+
+    def test_refresh_recusado_nao_repete_a_requisicao(self):
+        def responder(metodo, url, **kwargs):
+            if url.endswith('login/refresh/'):
+                return 401, {'detail': 'Token is blacklisted', 'code': 'token_not_valid'}
+            return 401, {'detail': 'Token expirado'}
+
+        cliente = self.criar_cliente(responder)
+        with self.assertRaises(self.modulo.ErroApi) as erro:
+            cliente.listar_transacoes()
+        self.assertEqual(erro.exception.status_code, 401)
+        self.assertEqual(
+            [(metodo, url) for metodo, url, _ in cliente.session.chamadas],
+            [('GET', 'http://api/transacoes/'), ('POST', 'http://api/login/refresh/')],
+        )
+
+    def test_todas_as_paginas_em_ordem(self):
+        for total, paginas in ((25, [1, 2, 3]), (20, [1, 2]), (0, [1])):
+            with self.subTest(total=total):
+                def responder(metodo, url, params, **kwargs):
+                    pagina, tamanho = params['pagina'], params['itens_por_pagina']
+                    # as ultimas paginas respondem primeiro
+                    time.sleep(0.01 * (4 - pagina))
+                    ids = range((pagina - 1) * tamanho + 1, min(pagina * tamanho, total) + 1)
+                    return 200, {'total_items': total, 'pagina': pagina, 'produtos': [{'id': i} for i in ids]}
+
+                cliente = self.criar_cliente(responder)
+                produtos = cliente.listar_todos_produtos(itens_por_pagina=10, preco_max=100)
+                self.assertEqual([produto['id'] for produto in produtos], list(range(1, total + 1)))
+                pedidas = sorted(params['pagina'] for _, _, params in cliente.session.chamadas)
+                self.assertEqual(pedidas, paginas)
+                self.assertTrue(all(params['preco_max'] == 100 for _, _, params in cliente.session.chamadas))
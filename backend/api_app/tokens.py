@@ -0,0 +1,194 @@
+import hashlib
+import math
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+from .catalogo import cache_compartilhado
+
+
+# Filtro de Bloom com os jti da blacklist de tokens. Um "nao" do filtro e
+# definitivo, entao a maioria dos refreshes (tokens que nunca foram revogados)
+# dispensa a consulta em BlacklistedToken; um "talvez" cai na consulta normal.
+#
+# O filtro e reconstruido a partir da tabela no primeiro uso e recebe os jti
+# blacklistados neste processo via signal. Cada revogacao tambem e publicada, no
+# commit, no cache: um contador de versao e o jti guardado sob o numero da
+# versao. Quando a versao lida muda, o filtro pega os jti publicados desde a
+# ultima leitura (ou, se algum foi despejado, sincroniza pelo banco). A versao
+# e lida no maximo a cada INTERVALO_VERSAO segundos: ler a cada verificacao
+# custaria uma ida ao cache compartilhado por refresh, mais do que a consulta
+# indexada que o filtro evita. Assim uma revogacao feita em outro processo vale
+# aqui em ate INTERVALO_VERSAO segundos; as deste processo valem na hora, pelo
+# signal. A cada INTERVALO_SINCRONIZACAO segundos o filtro tambem le as
+# revogacoes novas do banco, para escritas que nao passam pelo signal.
+#
+# As revogacoes so chegam aos outros processos com um cache compartilhado; com
+# o locmem (LISTA_NEGRA_BLOOM = None) o filtro fica desligado e todo refresh
+# consulta a blacklist, como no simplejwt.
+
+TAXA_FALSO_POSITIVO = 0.001
+CAPACIDADE_MINIMA = 10000
+INTERVALO_SINCRONIZACAO = 1.0
+INTERVALO_VERSAO = 0.05
+CHAVE_VERSAO = 'tokens:lista_negra:versao'
+# por quanto tempo um jti publicado fica no cache para os outros processos
+TEMPO_PUBLICACAO = 60 * 10
+# ids relidos a cada sincronizacao, para cobrir transacoes que gravaram um id
+# menor mas fizeram commit depois da ultima leitura
+MARGEM_SINCRONIZACAO = 1000
+
+
+class FiltroBloom:
+    def __init__(self, capacidade, taxa_falso_positivo=TAXA_FALSO_POSITIVO):
+        self.capacidade = capacidade
+        self.num_bits = max(8, math.ceil(-capacidade * math.log(taxa_falso_positivo) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacidade * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.quantidade = 0
+
+    def _posicoes(self, valor):
+        # double hashing (Kirsch-Mitzenmacher) sobre um unico digest
+        digest = hashlib.blake2b(valor.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def adicionar(self, valor):
+        for posicao in self._posicoes(valor):
+            self.bits[posicao >> 3] |= 1 << (posicao & 7)
+        self.quantidade += 1
+
+    def __contains__(self, valor):
+        return all(self.bits[posicao >> 3] & (1 << (posicao & 7)) for posicao in self._posicoes(valor))
+
+
+def bloom_ativo():
+    if settings.LISTA_NEGRA_BLOOM is None:
+        return cache_compartilhado()
+    return settings.LISTA_NEGRA_BLOOM
+
+
+def versao_lista_negra():
+    versao = cache.get(CHAVE_VERSAO)
+    if versao is None:
+        # valor baseado no relogio, como a versao do catalogo, para nao repetir
+        # uma versao ja vista caso o contador seja despejado do cache
+        cache.add(CHAVE_VERSAO, int(time.time() * 1000), timeout=None)
+        versao = cache.get(CHAVE_VERSAO)
+    return versao
+
+
+def chave_revogacao(versao):
+    return f'{CHAVE_VERSAO}:{versao}'
+
+
+def _publicar(jti):
+    try:
+        versao = cache.incr(CHAVE_VERSAO)
+    except ValueError:
+        # contador despejado: a versao nova e diferente da que os processos
+        # guardaram, entao eles sincronizam pelo banco
+        versao_lista_negra()
+        return
+    cache.set(chave_revogacao(versao), jti, TEMPO_PUBLICACAO)
+
+
+def sinalizar_revogacao(jti):
+    # no commit: antes dele os outros processos ainda nao veriam a linha
+    transaction.on_commit(lambda: _publicar(jti))
+
+
+class ListaNegraJti:
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.limpar()
+
+    def limpar(self):
+        self._filtro = None
+        self._ultimo_id = 0
+        self._versao = None
+        self._versao_lida_em = 0.0
+        self._sincronizado_em = 0.0
+
+    def _reconstruir(self):
+        total = BlacklistedToken.objects.count()
+        filtro = FiltroBloom(max(CAPACIDADE_MINIMA, total * 2))
+        ultimo_id = 0
+        for token_id, jti in BlacklistedToken.objects.values_list('id', 'token__jti').iterator(chunk_size=10000):
+            filtro.adicionar(jti)
+            ultimo_id = max(ultimo_id, token_id)
+        self._filtro = filtro
+        self._ultimo_id = ultimo_id
+
+    def _sincronizar(self):
+        novos = BlacklistedToken.objects.filter(
+            id__gt=self._ultimo_id - MARGEM_SINCRONIZACAO
+        ).values_list('id', 'token__jti')
+        for token_id, jti in novos:
+            self._filtro.adicionar(jti)
+            self._ultimo_id = max(self._ultimo_id, token_id)
+        self._verificar_capacidade()
+
+    def _aplicar_publicados(self, versao):
+        # adiciona os jti publicados entre a versao guardada e `versao`; devolve
+        # False se faltar algum, e entao a sincronizacao vai ao banco
+        if self._versao is None or not 0 < versao - self._versao <= MARGEM_SINCRONIZACAO:
+            return False
+        chaves = [chave_revogacao(numero) for numero in range(self._versao + 1, versao + 1)]
+        publicados = cache.get_many(chaves)
+        if len(publicados) < len(chaves):
+            return False
+        for jti in publicados.values():
+            self._filtro.adicionar(jti)
+        self._verificar_capacidade()
+        return True
+
+    def _verificar_capacidade(self):
+        # cheio demais a taxa de falso positivo sobe; refaz com o dobro do espaco
+        if self._filtro.quantidade > self._filtro.capacidade:
+            self._reconstruir()
+
+    def _versao_atual(self):
+        # entre duas leituras da versao compartilhada vale a ultima vista
+        agora = time.monotonic()
+        if self._versao is None or agora - self._versao_lida_em >= INTERVALO_VERSAO:
+            self._versao_lida_em = agora
+            return versao_lista_negra()
+        return self._versao
+
+    def pode_estar_revogado(self, jti):
+        # a versao e lida antes de sincronizar: uma revogacao que fizer commit
+        # depois disso muda a versao de novo e e vista na proxima leitura
+        versao = self._versao_atual()
+        with self._trava:
+            agora = time.monotonic()
+            if self._filtro is None:
+                self._reconstruir()
+                self._sincronizado_em = agora
+            elif agora - self._sincronizado_em >= INTERVALO_SINCRONIZACAO:
+                self._sincronizar()
+                self._sincronizado_em = agora
+            elif versao != self._versao and not self._aplicar_publicados(versao):
+                self._sincronizar()
+                self._sincronizado_em = agora
+            self._versao = versao
+            return jti in self._filtro
+
+    def adicionar(self, jti):
+        with self._trava:
+            if self._filtro is not None:
+                self._filtro.adicionar(jti)
+
+
+lista_negra = ListaNegraJti()
+
+
+class RefreshToken(BaseRefreshToken):
+    def check_blacklist(self):
+        if not bloom_ativo() or lista_negra.pode_estar_revogado(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
@@ -1,6 +1,6 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from .views import RegisterView, AddSaldoView, CreateProdutoView, CompraView, VerifyEmailView, DeleteUserView, ListarProdutosView, LogoutView, ChangePasswordView, ListarTransacoesView
+from .views import RegisterView, AddSaldoView, CreateProdutoView, CompraView, VerifyEmailView, DeleteUserView, ListarProdutosView, LogoutView, ChangePasswordView, ListarTransacoesView, CheckoutView, CacheCatalogoView, ExportarTransacoesView, ResumoClienteView, VendasPorDiaView, VendasPorProdutoView, ImportarProdutosView, AtualizarProdutosView, ExtratoView
 
 urlpatterns = [
     #cadastro de cliente
@@ -13,15 +13,30 @@ urlpatterns = [
     #adicionar saldo 
     path('add-saldo/', AddSaldoView.as_view(), name='add_saldo'),
 
+    #extrato do saldo
+    path('extrato/', ExtratoView.as_view(), name='extrato'),
+
     #criar um novo produto
     path('criar-produto/', CreateProdutoView.as_view(), name='criar_produto'),
+
+    #importar produtos em massa
+    path('produtos/importar/', ImportarProdutosView.as_view(), name='importar_produtos'),
+
+    #atualizar preco e estoque em massa
+    path('produtos/atualizar/', AtualizarProdutosView.as_view(), name='atualizar_produtos'),
     
     #listar Produtos
     path('produtos/', ListarProdutosView.as_view(), name='listar_produtos'),
 
+    #estatisticas do cache de produtos
+    path('produtos/cache/', CacheCatalogoView.as_view(), name='cache_catalogo'),
+
     #comprar produtos
     path('compra/', CompraView.as_view(), name='compra'),
 
+    #comprar varios produtos de uma vez
+    path('checkout/', CheckoutView.as_view(), name='checkout'),
+
     #Validar email
     path('verify-email/', VerifyEmailView.as_view(), name='verify_email'),
 
@@ -36,4 +51,14 @@ urlpatterns = [
 
     #Listar transacoes
     path('transacoes/', ListarTransacoesView.as_view(), name='listar_transacoes'),
+
+    #exportar historico de transacoes
+    path('transacoes/exportar/', ExportarTransacoesView.as_view(), name='exportar_transacoes'),
+
+    #resumo de gastos do cliente
+    path('resumo/', ResumoClienteView.as_view(), name='resumo_cliente'),
+
+    #relatorios de vendas (administradores)
+    path('vendas/diarias/', VendasPorDiaView.as_view(), name='vendas_por_dia'),
+    path('vendas/produtos/', VendasPorProdutoView.as_view(), name='vendas_por_produto'),
 ]
\ No newline at end of file
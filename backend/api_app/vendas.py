@@ -0,0 +1,99 @@
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .models import VendaDiaria
+
+
+# Consolidado diario de vendas por produto. Cada compra soma suas transacoes na
+# linha (dia, produto) dentro da propria transacao, e os relatorios leem so
+# esta tabela, que tem uma linha por produto vendido no dia em vez de uma por
+# transacao.
+
+
+def consolidar(transacoes):
+    # {(data, produto_id): [quantidade, receita, transacoes]}
+    consolidado = {}
+    for t in transacoes:
+        chave = (timezone.localdate(t.data), t.produto_id)
+        linha = consolidado.setdefault(chave, [0, 0, 0])
+        linha[0] += t.quantidade
+        linha[1] += t.total
+        linha[2] += 1
+    return consolidado
+
+
+def registrar_vendas(transacoes):
+    # deve ser chamada dentro do transaction.atomic() da compra. Um unico
+    # INSERT ... ON CONFLICT soma todas as linhas (SQLite >= 3.24 e PostgreSQL),
+    # sem corrida entre compras concorrentes do mesmo produto no mesmo dia
+    consolidado = consolidar(transacoes)
+    if not consolidado:
+        return
+    tabela = connection.ops.quote_name(VendaDiaria._meta.db_table)
+    valores = ', '.join(['(%s, %s, %s, %s, %s)'] * len(consolidado))
+    params = []
+    for (data, produto_id), (quantidade, receita, total_transacoes) in consolidado.items():
+        params += [data.isoformat(), produto_id, quantidade, str(receita), total_transacoes]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""INSERT INTO {tabela} (data, produto_id, quantidade, receita, transacoes) VALUES {valores}
+            ON CONFLICT (data, produto_id) DO UPDATE SET
+                quantidade = {tabela}.quantidade + excluded.quantidade,
+                receita = {tabela}.receita + excluded.receita,
+                transacoes = {tabela}.transacoes + excluded.transacoes""",
+            params,
+        )
+
+
+ORDENACAO_VENDAS = ['quantidade', 'receita']
+MAX_TOP = 100
+
+
+def ler_periodo(params):
+    # devolve (inicio, fim) a partir de ?inicio=AAAA-MM-DD&fim=AAAA-MM-DD
+    periodo = []
+    for chave in ('inicio', 'fim'):
+        valor = params.get(chave)
+        data = None
+        if valor:
+            try:
+                data = parse_date(valor)
+            except ValueError:
+                data = None
+            if data is None:
+                raise ValueError(f"Data inválida em '{chave}'. Use o formato AAAA-MM-DD.")
+        periodo.append(data)
+    if periodo[0] and periodo[1] and periodo[0] > periodo[1]:
+        raise ValueError("A data de início deve ser anterior à data de fim.")
+    return tuple(periodo)
+
+
+def filtrar_periodo(inicio=None, fim=None):
+    queryset = VendaDiaria.objects.all()
+    if inicio:
+        queryset = queryset.filter(data__gte=inicio)
+    if fim:
+        queryset = queryset.filter(data__lte=fim)
+    return queryset
+
+
+def vendas_por_dia(inicio=None, fim=None):
+    return list(
+        filtrar_periodo(inicio, fim)
+        .values('data')
+        .annotate(quantidade=Sum('quantidade'), receita=Sum('receita'), transacoes=Sum('transacoes'))
+        .order_by('data')
+    )
+
+
+def vendas_por_produto(inicio=None, fim=None, ordenar_por='quantidade', limite=None):
+    queryset = (
+        filtrar_periodo(inicio, fim)
+        .values('produto_id', 'produto__nome')
+        .annotate(quantidade=Sum('quantidade'), receita=Sum('receita'), transacoes=Sum('transacoes'))
+        .order_by(f'-{ordenar_por}', 'produto_id')
+    )
+    if limite:
+        queryset = queryset[:limite]
+    return list(queryset)
@@ -2,12 +2,28 @@ from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.parsers import JSONParser, MultiPartParser
 from django.contrib.auth.models import User
-from .models import Produto, Cliente, Transacao, EmailVerification
-from .serializers import ProdutoSerializer, UserSerializer, TransacaoSerializer
-from decimal import Decimal
+from .models import Produto, Cliente, Transacao, EmailVerification, ResumoCliente, MovimentoSaldo
+from .tokens import RefreshToken
+from .serializers import ProdutoSerializer, UserSerializer, TransacaoSerializer, ResumoClienteSerializer, MovimentoSaldoSerializer, VendasDiaSerializer, VendasProdutoSerializer, serializar_valores
+from .authentication import invalidar_usuario
+from .compras import CompraError, resolver_cliente_id, realizar_checkout
+from .agrupamento import comprar
+from .roteador import usar_replica, fixar_no_primario
+from .paginacao import usa_cursor, paginar_por_cursor, link_proxima_pagina
+from .catalogo import contar_produtos, chave_resposta, obter_resposta, guardar_resposta, estatisticas_cache
+from .etags import etag_produtos, etag_transacoes, etag_corresponde, nao_modificado
+from .filtros import filtrar_produtos, filtrar_transacoes, ORDENACAO_PRODUTOS, ORDENACAO_TRANSACOES
+from .exportacao import exportar_transacoes, FORMATOS
+from .importacao import importar_produtos, linhas_csv, linhas_json, LOTE_PADRAO, MAX_LOTE
+from . import atualizacao
+from .saldos import creditar, saldo_atual
+from .vendas import ler_periodo, vendas_por_dia, vendas_por_produto, ORDENACAO_VENDAS, MAX_TOP
+from decimal import Decimal, InvalidOperation
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
@@ -102,7 +118,7 @@ class AddSaldoView(APIView):
 
     def post(self, request):
         try:
-            cliente = Cliente.objects.get(user=request.user)
+            cliente = request.user.cliente
         except Cliente.DoesNotExist:
             return Response({"error": "Cliente não encontrado."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -110,13 +126,57 @@ class AddSaldoView(APIView):
 
         try:
             saldo_adicionar = Decimal(saldo_adicionar)  
-        except (ValueError, TypeError):
+        except (ValueError, TypeError, InvalidOperation):
             return Response({"error": "O valor do saldo deve ser numérico."}, status=status.HTTP_400_BAD_REQUEST)
 
-        cliente.saldo += saldo_adicionar  
-        cliente.save()
+        # o deposito e so um INSERT no livro-razao, sem disputar a linha do cliente
+        creditar(cliente.pk, saldo_adicionar)
+        invalidar_usuario(request.user.pk)
+        fixar_no_primario(request.user.pk)
+        saldo = saldo_atual(cliente.pk)
 
-        return Response({"message": f"Saldo atualizado para {cliente.saldo}."}, status=status.HTTP_200_OK)
+        return Response({"message": f"Saldo atualizado para {saldo}."}, status=status.HTTP_200_OK)
+
+
+#extrato do saldo (livro-razao)
+class ExtratoView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Extrato de créditos e débitos do cliente",
+        manual_parameters=[
+            openapi.Parameter(
+                'itens_por_pagina', openapi.IN_QUERY, description="Número de movimentos por página (padrão: 50)",
+                type=openapi.TYPE_INTEGER, required=False
+            ),
+            openapi.Parameter(
+                'cursor', openapi.IN_QUERY, description="Cursor opaco devolvido em 'next' pela página anterior",
+                type=openapi.TYPE_STRING, required=False
+            ),
+        ],
+        responses={
+            200: openapi.Response('Saldo atual e movimentos, do mais antigo para o mais recente.'),
+            400: openapi.Response('Parâmetros inválidos.'),
+        }
+    )
+    def get(self, request):
+        cliente = request.user.cliente
+        try:
+            page_size = int(request.query_params.get('itens_por_pagina', 50))
+        except ValueError:
+            page_size = 0
+        try:
+            movimentos, proximo = paginar_por_cursor(
+                MovimentoSaldo.objects.filter(cliente_id=cliente.pk), None, request.query_params.get('cursor'), page_size
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "saldo": MovimentoSaldoSerializer().fields['valor'].to_representation(saldo_atual(cliente.pk)),
+            "next": link_proxima_pagina(request, proximo),
+            "movimentos": MovimentoSaldoSerializer(movimentos, many=True).data,
+        }, status=status.HTTP_200_OK)
 
 
 #criar um novo produto
@@ -148,6 +208,108 @@ class CreateProdutoView(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+#importar produtos em massa (CSV ou JSON)
+class ImportarProdutosView(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, JSONParser]
+
+    @swagger_auto_schema(
+        operation_summary="Importar produtos em massa",
+        operation_description=(
+            "Envie um arquivo CSV (colunas nome, preco, estoque) ou JSON (lista de objetos) no campo "
+            "'arquivo' (multipart), ou uma lista JSON no corpo da requisição."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                'lote', openapi.IN_QUERY, description=f"Produtos gravados por INSERT (padrão: {LOTE_PADRAO}, máximo: {MAX_LOTE})",
+                type=openapi.TYPE_INTEGER, required=False
+            ),
+        ],
+        responses={
+            201: openapi.Response('Produtos importados; linhas inválidas listadas em erros.'),
+            400: openapi.Response('Nenhum produto válido ou arquivo inválido.'),
+        }
+    )
+    def post(self, request):
+        try:
+            lote = int(request.query_params.get('lote', LOTE_PADRAO))
+        except ValueError:
+            lote = 0
+        if not 0 < lote <= MAX_LOTE:
+            return Response({"error": f"O lote deve ser um número entre 1 e {MAX_LOTE}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        arquivo = request.FILES.get('arquivo')
+        if arquivo is not None:
+            nome = arquivo.name.lower()
+            if nome.endswith('.csv') or arquivo.content_type == 'text/csv':
+                linhas = linhas_csv(arquivo)
+            elif nome.endswith('.json') or arquivo.content_type == 'application/json':
+                linhas = linhas_json(arquivo)
+            else:
+                return Response({"error": "Envie um arquivo .csv ou .json."}, status=status.HTTP_400_BAD_REQUEST)
+        elif isinstance(request.data, list):
+            linhas = request.data
+        else:
+            return Response({"error": "Envie um arquivo no campo 'arquivo' ou uma lista de produtos."}, status=status.HTTP_400_BAD_REQUEST)
+
+        resultado = importar_produtos(linhas, lote)
+        codigo = status.HTTP_201_CREATED if resultado['criados'] else status.HTTP_400_BAD_REQUEST
+        return Response(resultado, status=codigo)
+
+
+#atualizar preco e estoque de varios produtos
+class AtualizarProdutosView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_summary="Atualizar preço e estoque de produtos em massa",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'produtos': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'id': openapi.Schema(type=openapi.TYPE_INTEGER, description="ID do produto"),
+                            'preco': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_DECIMAL, description="Novo preço"),
+                            'estoque': openapi.Schema(type=openapi.TYPE_INTEGER, description="Novo estoque"),
+                            'estoque_delta': openapi.Schema(type=openapi.TYPE_INTEGER, description="Ajuste somado ao estoque atual"),
+                        },
+                        required=['id'],
+                    ),
+                ),
+            },
+            required=['produtos'],
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                'lote', openapi.IN_QUERY, description=f"Produtos por UPDATE (padrão: {atualizacao.LOTE_PADRAO}, máximo: {atualizacao.MAX_LOTE})",
+                type=openapi.TYPE_INTEGER, required=False
+            ),
+        ],
+        responses={
+            200: openapi.Response('Resumo com o total atualizado e os ids não encontrados ou rejeitados.'),
+            400: openapi.Response('Requisição inválida.'),
+        }
+    )
+    def post(self, request):
+        try:
+            lote = int(request.query_params.get('lote', atualizacao.LOTE_PADRAO))
+        except ValueError:
+            lote = 0
+        if not 0 < lote <= atualizacao.MAX_LOTE:
+            return Response({"error": f"O lote deve ser um número entre 1 e {atualizacao.MAX_LOTE}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        registros = request.data.get('produtos') if isinstance(request.data, dict) else request.data
+        if not isinstance(registros, list) or not registros:
+            return Response({"error": "Informe uma lista de produtos."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(registros) > atualizacao.MAX_REGISTROS:
+            return Response({"error": f"Envie no máximo {atualizacao.MAX_REGISTROS} produtos por requisição."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(atualizacao.atualizar_produtos(registros, lote), status=status.HTTP_200_OK)
+
+
 #listar produtos (publica)
 class ListarProdutosView(ListAPIView):
     serializer_class = ProdutoSerializer
@@ -156,7 +318,7 @@ class ListarProdutosView(ListAPIView):
         operation_summary="Listar todos os produtos",
         manual_parameters=[
             openapi.Parameter(
-                'nome', openapi.IN_QUERY, description="Filtrar por nome do produto (contém)", 
+                'nome', openapi.IN_QUERY, description="Buscar por nome do produto (prefixo das palavras, ordenado por relevância)", 
                 type=openapi.TYPE_STRING, required=False
             ),
             openapi.Parameter(
@@ -175,6 +337,18 @@ class ListarProdutosView(ListAPIView):
                 'pagina', openapi.IN_QUERY, description="Número da página (padrão: 1)", 
                 type=openapi.TYPE_INTEGER, required=False
             ),
+            openapi.Parameter(
+                'contar', openapi.IN_QUERY, description="Use 'false' para aceitar uma contagem aproximada em cache", 
+                type=openapi.TYPE_BOOLEAN, required=False
+            ),
+            openapi.Parameter(
+                'paginacao', openapi.IN_QUERY, description="Use 'cursor' para paginação por cursor (sem total_items)", 
+                type=openapi.TYPE_STRING, enum=['cursor'], required=False
+            ),
+            openapi.Parameter(
+                'cursor', openapi.IN_QUERY, description="Cursor opaco devolvido em 'next' pela página anterior", 
+                type=openapi.TYPE_STRING, required=False
+            ),
         ],
         responses={
             200: openapi.Response(
@@ -183,6 +357,7 @@ class ListarProdutosView(ListAPIView):
                     type=openapi.TYPE_OBJECT,
                     properties={
                         'total_items': openapi.Schema(type=openapi.TYPE_INTEGER, description='Número total de produtos'),
+                        'total_aproximado': openapi.Schema(type=openapi.TYPE_BOOLEAN, description='Indica se total_items é uma estimativa (contar=false)'),
                         'pagina': openapi.Schema(type=openapi.TYPE_INTEGER, description='Número da página atual'),
                         'itens_por_pagina': openapi.Schema(type=openapi.TYPE_INTEGER, description='Número de itens por página'),
                         'produtos': openapi.Schema(
@@ -192,38 +367,78 @@ class ListarProdutosView(ListAPIView):
                     }
                 )
             ),
+            304: openapi.Response('Nenhuma alteração desde o ETag informado em If-None-Match.'),
         }
     )
+    @usar_replica
     def get(self, request, *args, **kwargs):
-        queryset = Produto.objects.all()
-        nome = request.query_params.get('nome', None)
-        if nome:
-            queryset = queryset.filter(nome__icontains=nome)
-
-        preco_max = request.query_params.get('preco_max', None)
-        if preco_max:
-            queryset = queryset.filter(preco__lte=preco_max)
-
+        chave_cache = chave_resposta(request)
+        em_cache = obter_resposta(chave_cache)
+        if em_cache is not None:
+            if etag_corresponde(request, em_cache['etag']):
+                return nao_modificado(em_cache['etag'])
+            return Response(em_cache['dados'], status=status.HTTP_200_OK, headers={'X-Cache': 'HIT', 'ETag': em_cache['etag']})
+
+        etag = etag_produtos(request)
+        if etag_corresponde(request, etag):
+            return nao_modificado(etag)
+
+        queryset = filtrar_produtos(request.query_params)
         ordenar_por = request.query_params.get('ordenar_por', None)
-        if ordenar_por in ['estoque', 'preco']:
-            queryset = queryset.order_by(ordenar_por)
 
         page_size = int(request.query_params.get('itens_por_pagina', 10)) 
+
+        if usa_cursor(request):
+            campo = ordenar_por if ordenar_por in ORDENACAO_PRODUTOS else None
+            try:
+                produtos_pagina, proximo = paginar_por_cursor(
+                    queryset, campo, request.query_params.get('cursor'), page_size,
+                    serializar=lambda fatia: serializar_valores(fatia, ProdutoSerializer),
+                )
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            dados = {
+                "itens_por_pagina": page_size,
+                "next": link_proxima_pagina(request, proximo),
+                "produtos": produtos_pagina
+            }
+            guardar_resposta(chave_cache, {'etag': etag, 'dados': dados})
+            return Response(dados, status=status.HTTP_200_OK, headers={'X-Cache': 'MISS', 'ETag': etag})
+
         page = int(request.query_params.get('pagina', 1))  
-        total_items = queryset.count()  
+        contar = request.query_params.get('contar', 'true').lower() != 'false'
+        filtros = {'nome': request.query_params.get('nome'), 'preco_max': request.query_params.get('preco_max')}
+        total_items, total_aproximado = contar_produtos(queryset, filtros, exato=contar)
 
         start = (page - 1) * page_size
         end = start + page_size
         produtos_paginados = queryset[start:end]
 
-        serializer = ProdutoSerializer(produtos_paginados, many=True)
-
-        return Response({
+        dados = {
             "total_items": total_items,
+            "total_aproximado": total_aproximado,
             "pagina": page,
             "itens_por_pagina": page_size,
-            "produtos": serializer.data
-        }, status=status.HTTP_200_OK)
+            "produtos": serializar_valores(produtos_paginados, ProdutoSerializer)
+        }
+        guardar_resposta(chave_cache, {'etag': etag, 'dados': dados})
+        return Response(dados, status=status.HTTP_200_OK, headers={'X-Cache': 'MISS', 'ETag': etag})
+
+
+#estatisticas do cache do catalogo
+class CacheCatalogoView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_summary="Estatísticas do cache da listagem de produtos",
+        responses={
+            200: openapi.Response('Contadores de hits e misses do cache.'),
+            403: openapi.Response('Acesso negado.'),
+        }
+    )
+    def get(self, request):
+        return Response(estatisticas_cache(), status=status.HTTP_200_OK)
 
     
 #realizar uma compra
@@ -255,34 +470,77 @@ class CompraView(APIView):
         quantidade = request.data.get('quantidade')
 
         try:
-            user = User.objects.get(username=username)  
-            cliente = Cliente.objects.get(user=user)
-            produto = Produto.objects.get(id=produto_id)
-        except User.DoesNotExist:
-            return Response({"error": "Usuário não encontrado."}, status=status.HTTP_404_NOT_FOUND)
-        except Cliente.DoesNotExist:
-            return Response({"error": "Cliente não encontrado"}, status=status.HTTP_404_NOT_FOUND)
-        except Produto.DoesNotExist:
-            return Response({"error": "Produto não encontrado"}, status=status.HTTP_404_NOT_FOUND)
+            cliente_id = self.cliente_da_compra(request, username)
+            comprar(cliente_id, produto_id, quantidade)
+        except CompraError as e:
+            return Response({"error": e.mensagem}, status=e.status_code)
+        invalidar_usuario(request.user.pk)
+        fixar_no_primario(request.user.pk)
+
+        return Response({"message": "Compra realizada com sucesso"}, status=status.HTTP_201_CREATED)
+
+    def cliente_da_compra(self, request, username):
+        # o cliente do proprio usuario ja vem da autenticacao, sem consulta extra
+        if username == request.user.username:
+            try:
+                return request.user.cliente.pk
+            except Cliente.DoesNotExist:
+                raise CompraError("Cliente não encontrado", status.HTTP_404_NOT_FOUND)
+        return resolver_cliente_id(username)
 
-        total = produto.preco * quantidade
 
-        if cliente.saldo < total:
-            return Response({"error": "Saldo insuficiente"}, status=status.HTTP_400_BAD_REQUEST)
+#finalizar carrinho com varios produtos
+class CheckoutView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Comprar vários produtos em uma única transação",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'itens': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'produto_id': openapi.Schema(type=openapi.TYPE_INTEGER, description="ID do produto"),
+                            'quantidade': openapi.Schema(type=openapi.TYPE_INTEGER, description="Quantidade do produto"),
+                        },
+                        required=['produto_id', 'quantidade'],
+                    ),
+                    description="Itens do carrinho"
+                ),
+            },
+            required=['itens'],
+        ),
+        responses={
+            201: openapi.Response('Compra realizada com sucesso.'),
+            404: openapi.Response('Cliente ou produto não encontrado.'),
+            400: openapi.Response('Carrinho inválido, saldo insuficiente ou estoque insuficiente.'),
+            409: openapi.Response('Estoque ou preço alterado durante a compra.'),
+        }
+    )
+
 
-        if produto.estoque < quantidade:
-            return Response({"error": "Estoque insuficiente"}, status=status.HTTP_400_BAD_REQUEST)
+    def post(self, request):
+        try:
+            cliente = request.user.cliente
+        except Cliente.DoesNotExist:
+            return Response({"error": "Cliente não encontrado"}, status=status.HTTP_404_NOT_FOUND)
 
-        cliente.saldo -= total
-        produto.estoque -= quantidade
-        cliente.save()
-        produto.save()
+        try:
+            transacoes, total = realizar_checkout(cliente.pk, request.data.get('itens'))
+        except CompraError as e:
+            return Response({"error": e.mensagem}, status=e.status_code)
+        invalidar_usuario(request.user.pk)
+        fixar_no_primario(request.user.pk)
 
-        transacao = Transacao(cliente=cliente, produto=produto, quantidade=quantidade, total=total)
-        transacao.save()
+        return Response({
+            "message": "Compra realizada com sucesso",
+            "total": str(total),
+            "itens": len(transacoes)
+        }, status=status.HTTP_201_CREATED)
 
-        return Response({"message": "Compra realizada com sucesso"}, status=status.HTTP_201_CREATED)
-    
 
 #listar transacoes
 class ListarTransacoesView(ListAPIView):
@@ -312,6 +570,14 @@ class ListarTransacoesView(ListAPIView):
                 'pagina', openapi.IN_QUERY, description="Número da página (padrão: 1)", 
                 type=openapi.TYPE_INTEGER, required=False
             ),
+            openapi.Parameter(
+                'paginacao', openapi.IN_QUERY, description="Use 'cursor' para paginação por cursor (sem total_items)", 
+                type=openapi.TYPE_STRING, enum=['cursor'], required=False
+            ),
+            openapi.Parameter(
+                'cursor', openapi.IN_QUERY, description="Cursor opaco devolvido em 'next' pela página anterior", 
+                type=openapi.TYPE_STRING, required=False
+            ),
         ],
         responses={
             200: openapi.Response(
@@ -329,29 +595,41 @@ class ListarTransacoesView(ListAPIView):
                     }
                 )
             ),
+            304: openapi.Response('Nenhuma alteração desde o ETag informado em If-None-Match.'),
             403: openapi.Response('Acesso negado.'),
         }
     )
+    @usar_replica
     def get(self, request, *args, **kwargs):
         cliente = request.user.cliente
 
-        # Filtro de produto e quantidade mínima
-        queryset = Transacao.objects.filter(cliente=cliente)
-        nome_produto = request.query_params.get('produto', None)
-        if nome_produto:
-            queryset = queryset.filter(produto__nome__icontains=nome_produto)
-
-        quantidade_min = request.query_params.get('quantidade_min', None)
-        if quantidade_min:
-            queryset = queryset.filter(quantidade__gte=quantidade_min)
+        etag = etag_transacoes(request, cliente)
+        if etag_corresponde(request, etag):
+            return nao_modificado(etag)
 
-        # Ordenação
+        # Filtro de produto, quantidade mínima e ordenação
+        queryset = filtrar_transacoes(cliente, request.query_params)
         ordenar_por = request.query_params.get('ordenar_por', None)
-        if ordenar_por in ['data', 'total']:
-            queryset = queryset.order_by(ordenar_por)
 
         # Paginação
         page_size = int(request.query_params.get('itens_por_pagina', 10)) 
+
+        if usa_cursor(request):
+            campo = ordenar_por if ordenar_por in ORDENACAO_TRANSACOES else None
+            try:
+                transacoes_pagina, proximo = paginar_por_cursor(
+                    queryset, campo, request.query_params.get('cursor'), page_size,
+                    serializar=lambda fatia: serializar_valores(fatia, TransacaoSerializer),
+                )
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            return Response({
+                "itens_por_pagina": page_size,
+                "next": link_proxima_pagina(request, proximo),
+                "transacoes": transacoes_pagina
+            }, status=status.HTTP_200_OK, headers={'ETag': etag})
+
         page = int(request.query_params.get('pagina', 1)) 
         total_items = queryset.count()  
 
@@ -359,16 +637,167 @@ class ListarTransacoesView(ListAPIView):
         end = start + page_size
         transacoes_paginadas = queryset[start:end]
 
-        serializer = TransacaoSerializer(transacoes_paginadas, many=True)
-
         return Response({
             "total_items": total_items,
             "pagina": page,
             "itens_por_pagina": page_size,
-            "transacoes": serializer.data
-        }, status=status.HTTP_200_OK)
+            "transacoes": serializar_valores(transacoes_paginadas, TransacaoSerializer)
+        }, status=status.HTTP_200_OK, headers={'ETag': etag})
     
 
+#exportar todo o historico de transacoes do cliente
+class ExportarTransacoesView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Exportar o histórico de transações do cliente",
+        manual_parameters=[
+            openapi.Parameter(
+                'formato', openapi.IN_QUERY, description="Formato do arquivo (padrão: ndjson)",
+                type=openapi.TYPE_STRING, enum=list(FORMATOS), required=False
+            ),
+            openapi.Parameter(
+                'produto', openapi.IN_QUERY, description="Filtrar por nome do produto (contém)",
+                type=openapi.TYPE_STRING, required=False
+            ),
+            openapi.Parameter(
+                'quantidade_min', openapi.IN_QUERY, description="Filtrar por quantidade mínima",
+                type=openapi.TYPE_INTEGER, required=False
+            ),
+            openapi.Parameter(
+                'ordenar_por', openapi.IN_QUERY, description="Ordenar por 'data' ou 'total'",
+                type=openapi.TYPE_STRING, enum=ORDENACAO_TRANSACOES, required=False
+            ),
+        ],
+        responses={
+            200: openapi.Response('Arquivo com uma transação por linha, enviado em streaming.'),
+            400: openapi.Response('Formato inválido.'),
+            403: openapi.Response('Acesso negado.'),
+        }
+    )
+    def get(self, request, *args, **kwargs):
+        formato = request.query_params.get('formato', 'ndjson')
+        if formato not in FORMATOS:
+            return Response({"error": f"Formato inválido. Use: {', '.join(FORMATOS)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = filtrar_transacoes(request.user.cliente, request.query_params)
+        # sob ASGI a resposta precisa de um iterador assincrono para ser enviada aos poucos
+        assincrono = isinstance(request._request, ASGIRequest)
+        linhas, content_type, extensao = exportar_transacoes(queryset, formato, assincrono)
+
+        response = StreamingHttpResponse(linhas, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="transacoes.{extensao}"'
+        return response
+
+
+#resumo de gastos do cliente
+class ResumoClienteView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Resumo de gastos do cliente",
+        responses={
+            200: openapi.Response(
+                'Resumo retornado com sucesso.',
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'total_gasto': openapi.Schema(type=openapi.TYPE_STRING, description='Soma do total das compras'),
+                        'quantidade_compras': openapi.Schema(type=openapi.TYPE_INTEGER, description='Número de transações'),
+                        'itens_comprados': openapi.Schema(type=openapi.TYPE_INTEGER, description='Soma das quantidades compradas'),
+                        'ultima_compra': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME, description='Data da última compra'),
+                    }
+                )
+            ),
+            403: openapi.Response('Acesso negado.'),
+        }
+    )
+    def get(self, request):
+        cliente = request.user.cliente
+        # cliente sem compras ainda nao tem linha no resumo
+        resumo = ResumoCliente.objects.filter(cliente_id=cliente.id).first() or ResumoCliente(cliente_id=cliente.id)
+        return Response(ResumoClienteSerializer(resumo).data, status=status.HTTP_200_OK)
+
+
+PARAMETROS_PERIODO = [
+    openapi.Parameter(
+        'inicio', openapi.IN_QUERY, description="Primeiro dia do período (AAAA-MM-DD)",
+        type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE, required=False
+    ),
+    openapi.Parameter(
+        'fim', openapi.IN_QUERY, description="Último dia do período (AAAA-MM-DD)",
+        type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE, required=False
+    ),
+]
+
+
+#receita por dia (somente administradores)
+class VendasPorDiaView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_summary="Receita e unidades vendidas por dia",
+        manual_parameters=PARAMETROS_PERIODO,
+        responses={
+            200: openapi.Response('Vendas por dia, a partir do consolidado diário.'),
+            400: openapi.Response('Período inválido.'),
+            403: openapi.Response('Acesso negado.'),
+        }
+    )
+    def get(self, request):
+        try:
+            inicio, fim = ler_periodo(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        dias = vendas_por_dia(inicio, fim)
+        return Response({"dias": VendasDiaSerializer(dias, many=True).data}, status=status.HTTP_200_OK)
+
+
+#vendas por produto e ranking dos mais vendidos (somente administradores)
+class VendasPorProdutoView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_summary="Unidades vendidas e receita por produto",
+        manual_parameters=PARAMETROS_PERIODO + [
+            openapi.Parameter(
+                'ordenar_por', openapi.IN_QUERY, description="Ordenar por 'quantidade' (padrão) ou 'receita', decrescente",
+                type=openapi.TYPE_STRING, enum=ORDENACAO_VENDAS, required=False
+            ),
+            openapi.Parameter(
+                'top', openapi.IN_QUERY, description=f"Retorna só os N primeiros produtos (máximo {MAX_TOP})",
+                type=openapi.TYPE_INTEGER, required=False
+            ),
+        ],
+        responses={
+            200: openapi.Response('Vendas por produto, a partir do consolidado diário.'),
+            400: openapi.Response('Parâmetros inválidos.'),
+            403: openapi.Response('Acesso negado.'),
+        }
+    )
+    def get(self, request):
+        try:
+            inicio, fim = ler_periodo(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        ordenar_por = request.query_params.get('ordenar_por', 'quantidade')
+        if ordenar_por not in ORDENACAO_VENDAS:
+            return Response({"error": "Ordenação inválida. Use 'quantidade' ou 'receita'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        top = request.query_params.get('top')
+        if top is not None:
+            try:
+                top = int(top)
+            except ValueError:
+                top = 0
+            if not 0 < top <= MAX_TOP:
+                return Response({"error": f"O top deve ser um número entre 1 e {MAX_TOP}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        produtos = vendas_por_produto(inicio, fim, ordenar_por, top)
+        return Response({"produtos": VendasProdutoSerializer(produtos, many=True).data}, status=status.HTTP_200_OK)
+
+
 #mudar senha 
 class ChangePasswordView(APIView):
     permission_classes = [IsAuthenticated]
@@ -405,7 +834,7 @@ class ChangePasswordView(APIView):
             return Response({"error": "A nova senha e a confirmação não correspondem."}, status=status.HTTP_400_BAD_REQUEST)
 
         user.set_password(nova_senha)
-        user.save()
+        user.save(update_fields=['password'])
 
         return Response({"message": "Senha alterada com sucesso!"}, status=status.HTTP_200_OK)
 
@@ -455,7 +884,7 @@ class DeleteUserView(APIView):
         user = request.user  
 
         try:
-            cliente = Cliente.objects.get(user=user)
+            cliente = user.cliente
             cliente.delete()
 
             email_verification = EmailVerification.objects.get(user=user)
@@ -0,0 +1,167 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from .authentication import ClienteJWTAuthentication
+from .busca import fts_disponivel
+from .catalogo import acontar_produtos, achave_resposta, aobter_resposta, aguardar_resposta
+from .etags import aetag_produtos, aetag_transacoes, etag_corresponde
+from .filtros import filtrar_produtos, filtrar_transacoes, ORDENACAO_PRODUTOS, ORDENACAO_TRANSACOES
+from .paginacao import usa_cursor, apaginar_por_cursor, link_proxima_pagina
+from .roteador import ler_da_replica
+from .serializers import ProdutoSerializer, TransacaoSerializer, aserializar_valores
+
+
+# Versoes async das listagens de produtos e transacoes, servidas so pelo
+# ponto de entrada ASGI (ver api_app.middleware). Fazem as mesmas consultas,
+# usam o mesmo cache e devolvem o mesmo JSON das views DRF, mas com o ORM
+# assincrono, entao o worker nao prende uma thread por conexao enquanto
+# espera o banco ou um cliente lento.
+
+autenticacao = ClienteJWTAuthentication()
+
+
+def resposta(dados=None, status_code=status.HTTP_200_OK, headers=None):
+    conteudo = b'' if dados is None else JSONRenderer().render(dados)
+    response = HttpResponse(conteudo, status=status_code, content_type='application/json')
+    for nome, valor in (headers or {}).items():
+        response[nome] = valor
+    return response
+
+
+def nao_modificado(etag):
+    response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    response['ETag'] = etag
+    return response
+
+
+def erro_api(exc):
+    # mesmo formato do exception handler do DRF
+    dados = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+    headers = {}
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        exc.status_code = status.HTTP_401_UNAUTHORIZED
+        headers['WWW-Authenticate'] = autenticacao.authenticate_header(None)
+    return resposta(dados, exc.status_code, headers)
+
+
+class ListagemAsyncView(View):
+    autenticacao_obrigatoria = False
+    http_method_names = ['get', 'head', 'options']
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            autenticado = await autenticacao.aauthenticate(request)
+            if autenticado is None and self.autenticacao_obrigatoria:
+                raise exceptions.NotAuthenticated()
+            user = autenticado[0] if autenticado else None
+            # Request do DRF so para reaproveitar query_params nos helpers
+            pedido = Request(request)
+            with ler_da_replica(user.pk if user else None):
+                return await self.listar(pedido, user)
+        except exceptions.APIException as exc:
+            return erro_api(exc)
+
+
+class ListarProdutosAsyncView(ListagemAsyncView):
+    async def listar(self, request, user):
+        chave_cache = await achave_resposta(request)
+        em_cache = await aobter_resposta(chave_cache)
+        if em_cache is not None:
+            if etag_corresponde(request, em_cache['etag']):
+                return nao_modificado(em_cache['etag'])
+            return resposta(em_cache['dados'], headers={'X-Cache': 'HIT', 'ETag': em_cache['etag']})
+
+        etag = await aetag_produtos(request)
+        if etag_corresponde(request, etag):
+            return nao_modificado(etag)
+
+        # a disponibilidade do FTS5 fica em cache depois da primeira verificacao
+        await sync_to_async(fts_disponivel)()
+        queryset = filtrar_produtos(request.query_params)
+        ordenar_por = request.query_params.get('ordenar_por', None)
+
+        page_size = int(request.query_params.get('itens_por_pagina', 10))
+
+        if usa_cursor(request):
+            campo = ordenar_por if ordenar_por in ORDENACAO_PRODUTOS else None
+            try:
+                produtos_pagina, proximo = await apaginar_por_cursor(
+                    queryset, campo, request.query_params.get('cursor'), page_size,
+                    serializar=lambda fatia: aserializar_valores(fatia, ProdutoSerializer),
+                )
+            except ValueError as e:
+                return resposta({"error": str(e)}, status.HTTP_400_BAD_REQUEST)
+
+            dados = {
+                "itens_por_pagina": page_size,
+                "next": link_proxima_pagina(request, proximo),
+                "produtos": produtos_pagina
+            }
+            await aguardar_resposta(chave_cache, {'etag': etag, 'dados': dados})
+            return resposta(dados, headers={'X-Cache': 'MISS', 'ETag': etag})
+
+        page = int(request.query_params.get('pagina', 1))
+        contar = request.query_params.get('contar', 'true').lower() != 'false'
+        filtros = {'nome': request.query_params.get('nome'), 'preco_max': request.query_params.get('preco_max')}
+        total_items, total_aproximado = await acontar_produtos(queryset, filtros, exato=contar)
+
+        start = (page - 1) * page_size
+        end = start + page_size
+
+        dados = {
+            "total_items": total_items,
+            "total_aproximado": total_aproximado,
+            "pagina": page,
+            "itens_por_pagina": page_size,
+            "produtos": await aserializar_valores(queryset[start:end], ProdutoSerializer)
+        }
+        await aguardar_resposta(chave_cache, {'etag': etag, 'dados': dados})
+        return resposta(dados, headers={'X-Cache': 'MISS', 'ETag': etag})
+
+
+class ListarTransacoesAsyncView(ListagemAsyncView):
+    autenticacao_obrigatoria = True
+
+    async def listar(self, request, user):
+        cliente = user.cliente
+
+        etag = await aetag_transacoes(request, cliente)
+        if etag_corresponde(request, etag):
+            return nao_modificado(etag)
+
+        queryset = filtrar_transacoes(cliente, request.query_params)
+        ordenar_por = request.query_params.get('ordenar_por', None)
+
+        page_size = int(request.query_params.get('itens_por_pagina', 10))
+
+        if usa_cursor(request):
+            campo = ordenar_por if ordenar_por in ORDENACAO_TRANSACOES else None
+            try:
+                transacoes_pagina, proximo = await apaginar_por_cursor(
+                    queryset, campo, request.query_params.get('cursor'), page_size,
+                    serializar=lambda fatia: aserializar_valores(fatia, TransacaoSerializer),
+                )
+            except ValueError as e:
+                return resposta({"error": str(e)}, status.HTTP_400_BAD_REQUEST)
+
+            return resposta({
+                "itens_por_pagina": page_size,
+                "next": link_proxima_pagina(request, proximo),
+                "transacoes": transacoes_pagina
+            }, headers={'ETag': etag})
+
+        page = int(request.query_params.get('pagina', 1))
+        total_items = await queryset.acount()
+
+        start = (page - 1) * page_size
+        end = start + page_size
+
+        return resposta({
+            "total_items": total_items,
+            "pagina": page,
+            "itens_por_pagina": page_size,
+            "transacoes": await aserializar_valores(queryset[start:end], TransacaoSerializer)
+        }, headers={'ETag': etag})
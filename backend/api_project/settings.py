@@ -30,7 +30,7 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api_app.authentication.ClienteJWTAuthentication',
     ),
 }
 
@@ -46,9 +46,11 @@ SIMPLE_JWT = {
     'TOKEN_USER_CLASS': 'django.contrib.auth.models.User',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_BLACKLIST_ENABLED': True,  
+    'TOKEN_REFRESH_SERIALIZER': 'api_app.serializers.TokenRefreshSerializer',
 }
 
 MIDDLEWARE = [
+    'api_app.middleware.RotasAssincronasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,14 +82,90 @@ WSGI_APPLICATION = 'api_project.wsgi.application'
 
 
 
+# perfil de desempenho do SQLite, aplicado em cada nova conexao:
+# - WAL: leitores nao bloqueiam o escritor (nem o contrario)
+# - busy_timeout: escritas concorrentes esperam o lock em vez de falhar com
+#   "database is locked"
+# - synchronous=NORMAL: com WAL, um fsync por checkpoint em vez de um por commit
+# - mmap_size, cache_size e temp_store: leituras e tabelas temporarias em memoria
+SQLITE_PRAGMAS = ';'.join([
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA temp_store=MEMORY',
+])
+
+SQLITE_PERFIL_DESEMPENHO = {
+    'init_command': SQLITE_PRAGMAS,
+    # transacoes ja comecam com o lock de escrita: uma transacao que le e
+    # depois escreve nao falha ao tentar promover o lock
+    'transaction_mode': 'IMMEDIATE',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_PERFIL_DESEMPENHO,
+        # reaproveita a conexao (e os PRAGMAs) entre requisicoes
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    # replica de leitura das listagens (api_app.roteador). Aponta para o
+    # mesmo arquivo ate ser trocada pela copia replicada e REPLICA_LEITURA
+    # ser ligado; nos testes ela e um segundo banco em memoria.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_PERFIL_DESEMPENHO,
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+
+DATABASE_ROUTERS = ['api_app.roteador.RoteadorReplica']
+
+# envia as leituras das listagens para a replica
+REPLICA_LEITURA = False
+# segundos em que as leituras de um usuario ficam no primario depois de ele escrever
+REPLICA_JANELA_PRIMARIO = 5
+
+
+
+
+# cache usado pela listagem de produtos (contagens e respostas); em producao
+# com varios processos use um backend compartilhado (FileBasedCache, Redis...)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api-ecommerce',
     }
 }
 
+# caches do catalogo (respostas e contagens da listagem de produtos). None liga
+# so com um backend compartilhado entre os processos; True forca o uso com o
+# locmem, correto apenas com um unico processo (runserver, testes)
+CATALOGO_EM_CACHE = None
+
+# filtro de Bloom na frente da blacklist de refresh tokens (api_app.tokens). None
+# liga so com um cache compartilhado, por onde as revogacoes chegam aos outros
+# processos; True forca o uso com o locmem (processo unico)
+LISTA_NEGRA_BLOOM = None
+
+# usuario e cliente autenticados guardados no cache (api_app.authentication).
+# None liga so com um cache compartilhado, por onde as invalidacoes chegam aos
+# outros processos; True forca o uso com o locmem (processo unico)
+USUARIO_EM_CACHE = None
+
 
+# agrupamento de compras concorrentes em uma unica transacao (api_app.agrupamento);
+# desligado por padrao. A janela e o tempo maximo que a primeira compra do
+# lote espera pelas demais.
+COMPRAS_AGRUPADAS = False
+COMPRAS_JANELA_MS = 2
+COMPRAS_MAX_LOTE = 32
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -135,6 +213,7 @@ EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = 'djangoapirestful@gmail.com' 
 EMAIL_HOST_PASSWORD = 'jlzl lecn uzdp rihz'
+DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 SWAGGER_SETTINGS = {
     'USE_SESSION_AUTH': False,  
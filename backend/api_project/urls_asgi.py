@@ -0,0 +1,11 @@
+from django.urls import path
+from api_app.views_async import ListarProdutosAsyncView, ListarTransacoesAsyncView
+from .urls import urlpatterns as urlpatterns_wsgi
+
+
+# URLs usadas sob ASGI (api_app.middleware.RotasAssincronasMiddleware): as
+# listagens vem antes e resolvem para as views async; o resto e igual ao WSGI
+urlpatterns = [
+    path('api/produtos/', ListarProdutosAsyncView.as_view(), name='listar_produtos'),
+    path('api/transacoes/', ListarTransacoesAsyncView.as_view(), name='listar_transacoes'),
+] + urlpatterns_wsgi
@@ -1,209 +1,337 @@
+import asyncio
+import base64
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
 
 BASE_URL = "http://localhost:8000/api/"
 
+#conexoes mantidas abertas com o servidor (e requisicoes simultaneas no cliente async)
+MAX_CONEXOES = 10
+TIMEOUT = 30
+#renova o access token quando faltar menos que isso (segundos) para expirar
+MARGEM_RENOVACAO = 30
+
+
+class ErroApi(Exception):
+    def __init__(self, status_code, dados):
+        self.status_code = status_code
+        self.dados = dados
+        super().__init__(f"{status_code} - {dados}")
+
+
+def _expiracao(token):
+    #le o campo exp do JWT sem validar a assinatura (quem valida e o servidor)
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload))['exp']
+    except (IndexError, KeyError, ValueError):
+        return None
+
 
+def _sem_vazios(params):
+    #remove parametros vazios
+    return {k: v for k, v in params.items() if v not in (None, '')}
+
+
+#cliente sincrono. Todas as requisicoes passam por uma requests.Session, que
+#reaproveita as conexoes TCP, e o access token e renovado automaticamente
+#pelo /api/login/refresh/. Pode ser usado por varias threads ao mesmo tempo.
 class EcommerceClient:
-    def __init__(self):
+    def __init__(self, base_url=BASE_URL, max_conexoes=MAX_CONEXOES, timeout=TIMEOUT):
+        self.base_url = base_url
+        self.max_conexoes = max_conexoes
+        self.timeout = timeout
         self.token = None
         self.refresh = None
+        self._trava_token = threading.Lock()
+        self.session = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=max_conexoes)
+        self.session.mount("http://", adaptador)
+        self.session.mount("https://", adaptador)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
     def register(self, username, email, password):
-        url = BASE_URL + "register/"
         data = {
             "username": username,
             "email": email,
             "password": password
         }
-        response = requests.post(url, json=data)
-        if response.status_code == 201:
-            print("Usuário cadastrado com sucesso!")
-        else:
-            print(f"Erro no cadastro: {response.json()}")
-    
+        return self._requisitar("POST", "register/", json=data, autenticado=False)
+
     def verify_email(self, email, code):
-        url = BASE_URL + "verify-email/"
         data = {
             "email": email,
             "code": code
         }
-        response = requests.post(url, json=data)
-        if response.status_code == 200:
-            print("E-mail verificado com sucesso!")
-        else:
-            print(f"Erro na verificação: {response.json()}")
+        return self._requisitar("POST", "verify-email/", json=data, autenticado=False)
 
     def login(self, username, password):
-        url = BASE_URL + "login/"
         data = {
             "username": username,
             "password": password
         }
-        response = requests.post(url, json=data)
-        if response.status_code == 200:
-            self.token = response.json()['access']
-            self.refresh = response.json()['refresh']
-            print("Login realizado com sucesso! Tokens obtidos.")
-        else:
-            print(f"Erro no login: {response.json()}")
+        tokens = self._requisitar("POST", "login/", json=data, autenticado=False)
+        with self._trava_token:
+            self.token = tokens['access']
+            self.refresh = tokens['refresh']
+        return tokens
+
+    def renovar_token(self):
+        with self._trava_token:
+            self._renovar()
+        return self.token
 
     def add_saldo(self, saldo):
-        url = BASE_URL + "add-saldo/"
-        headers = self._get_auth_headers()
-        data = {"saldo": saldo}
-        response = requests.post(url, json=data, headers=headers)
-        if response.status_code == 200:
-            print(f"Saldo atualizado: {response.json()['message']}")
-        else:
-            print(f"Erro ao adicionar saldo: {response.json()}")
+        return self._requisitar("POST", "add-saldo/", json={"saldo": saldo})
 
     def criar_produto(self, nome, preco, estoque):
-        url = BASE_URL + "criar-produto/"
-        headers = self._get_auth_headers()
         data = {
             "nome": nome,
             "preco": preco,
             "estoque": estoque
         }
-        response = requests.post(url, json=data, headers=headers)
-        if response.status_code == 201:
-            print(f"Produto criado: {response.json()}")
-        else:
-            print(f"Erro ao criar produto: {response.json()}")
-
-    def listar_produtos(self):
-        url = BASE_URL + "produtos/"
-        
-        pagina = input("Informe o número da página (default 1): ") or "1"
-        itens_por_pagina = input("Informe o número de itens por página (default 10): ") or "10"
-        nome = input("Informe o nome do produto para busca (opcional): ")
-        preco_max = input("Informe o preço máximo (opcional): ")
-        ordenar_por = input("Ordenar por (opções: 'estoque', 'preco', opcional): ")
-        
-        params = {
+        return self._requisitar("POST", "criar-produto/", json=data)
+
+    def listar_produtos(self, pagina=1, itens_por_pagina=10, nome=None, preco_max=None, ordenar_por=None, **params):
+        params = _sem_vazios({
             "pagina": pagina,
             "itens_por_pagina": itens_por_pagina,
             "nome": nome,
             "preco_max": preco_max,
-            "ordenar_por": ordenar_por
-        }
+            "ordenar_por": ordenar_por,
+            **params
+        })
+        return self._requisitar("GET", "produtos/", params=params, autenticado=False)
 
-        #Remove parametros vazios
-        params = {k: v for k, v in params.items() if v}
-
-        response = requests.get(url, params=params)
-        print(response.json())
-        
-        if response.status_code == 200:
-            data = response.json()
-            print(f"Total de produtos: {data['total_items']}")
-            print(f"Página: {data['pagina']}, Itens por página: {data['itens_por_pagina']}")
-            
-            for produto in data['produtos']:
-                print(f"ID: {produto['id']}, Nome: {produto['nome']}, Preço: {produto['preco']}, Estoque: {produto['estoque']}")
-        else:
-            print(f"Erro ao listar produtos: {response.status_code} - {response.json()}")
+    def listar_todos_produtos(self, itens_por_pagina=100, max_concorrencia=None, **filtros):
+        return self._todas_as_paginas(self.listar_produtos, "produtos", itens_por_pagina, max_concorrencia, filtros)
 
     def comprar_produto(self, username, produto_id, quantidade):
-        url = BASE_URL + "compra/"
-        headers = self._get_auth_headers()
         data = {
             "username": username,
             "produto_id": produto_id,
             "quantidade": quantidade
         }
-        response = requests.post(url, json=data, headers=headers)
-        if response.status_code == 201:
-            print("Compra realizada com sucesso!")
-        else:
-            print(f"Erro ao realizar compra: {response.json()}")
+        return self._requisitar("POST", "compra/", json=data)
+
+    def checkout(self, itens):
+        #itens: lista de {"produto_id": ..., "quantidade": ...}
+        return self._requisitar("POST", "checkout/", json={"itens": itens})
 
     def delete_user(self):
-        url = BASE_URL + "delete-user/"
-        headers = self._get_auth_headers()
-        response = requests.delete(url, headers=headers)
-        
-        if response.status_code == 200:
-            print("Usuário deletado com sucesso.")
-        else:
-            print(f"Erro ao deletar o usuário: {response.json()}")
+        return self._requisitar("DELETE", "delete-user/")
 
     def logout(self):
-        url = BASE_URL + "logout/"
-        headers = self._get_auth_headers()
-        refresh_token = self.refresh
-        data = {"refresh": refresh_token}
-        
-        response = requests.post(url, json=data, headers=headers)
-        
-        if response.status_code == 200:
-            print("Logout realizado com sucesso.")
-        else:
-            print(f"Erro ao fazer logout: {response.json()}")
-
-    def alterar_senha(self):
-        url = BASE_URL + "alterar-senha/"
-        headers = self._get_auth_headers()
-
-        senha_atual = input("Digite sua senha atual: ")
-        nova_senha = input("Digite sua nova senha: ")
-        confirmar_senha = input("Confirme sua nova senha: ")
+        resposta = self._requisitar("POST", "logout/", json={"refresh": self.refresh})
+        with self._trava_token:
+            self.token = None
+            self.refresh = None
+        return resposta
 
+    def alterar_senha(self, senha_atual, nova_senha, confirmar_senha=None):
         data = {
             "senha_atual": senha_atual,
             "nova_senha": nova_senha,
-            "confirmar_senha": confirmar_senha
+            "confirmar_senha": nova_senha if confirmar_senha is None else confirmar_senha
         }
+        return self._requisitar("POST", "alterar-senha/", json=data)
 
-        response = requests.post(url, json=data, headers=headers)
-
-        if response.status_code == 200:
-            print("Senha alterada com sucesso!")
-        else:
-            print(f"Erro ao alterar a senha: {response.json()}")
-
-    
-    def listar_transacoes(self):
-        url = BASE_URL + "transacoes/"
-    
-        pagina = input("Informe o número da página (default 1): ") or "1"
-        itens_por_pagina = input("Informe o número de itens por página (default 10): ") or "10"
-        produto = input("Informe o nome do produto para filtrar (opcional): ")
-        quantidade_min = input("Informe a quantidade mínima (opcional): ")
-        ordenar_por = input("Ordenar por (opções: 'data', 'total', opcional): ")
-        
-        params = {
+    def listar_transacoes(self, pagina=1, itens_por_pagina=10, produto=None, quantidade_min=None, ordenar_por=None, **params):
+        params = _sem_vazios({
             "pagina": pagina,
             "itens_por_pagina": itens_por_pagina,
             "produto": produto,
             "quantidade_min": quantidade_min,
-            "ordenar_por": ordenar_por
+            "ordenar_por": ordenar_por,
+            **params
+        })
+        return self._requisitar("GET", "transacoes/", params=params)
+
+    def listar_todas_transacoes(self, itens_por_pagina=100, max_concorrencia=None, **filtros):
+        return self._todas_as_paginas(self.listar_transacoes, "transacoes", itens_por_pagina, max_concorrencia, filtros)
+
+    def _todas_as_paginas(self, listar, chave, itens_por_pagina, max_concorrencia, filtros):
+        #a primeira pagina traz o total_items; as demais sao buscadas em paralelo
+        primeira = listar(pagina=1, itens_por_pagina=itens_por_pagina, **filtros)
+        paginas = math.ceil(primeira['total_items'] / itens_por_pagina)
+        itens = list(primeira[chave])
+        if paginas <= 1:
+            return itens
+        with ThreadPoolExecutor(max_concorrencia or self.max_conexoes) as executor:
+            restantes = executor.map(
+                lambda pagina: listar(pagina=pagina, itens_por_pagina=itens_por_pagina, **filtros),
+                range(2, paginas + 1)
+            )
+            for dados in restantes:
+                itens.extend(dados[chave])
+        return itens
+
+    def _requisitar(self, metodo, caminho, autenticado=True, **kwargs):
+        url = self.base_url + caminho
+        response = None
+        for tentativa in range(2):
+            if autenticado:
+                token = self._token_valido()
+                kwargs['headers'] = self._get_auth_headers(token)
+            response = self.session.request(metodo, url, timeout=self.timeout, **kwargs)
+            #token expirado ou revogado no meio do caminho: renova e tenta de novo uma vez
+            if response.status_code == 401 and autenticado and tentativa == 0 and self.refresh:
+                with self._trava_token:
+                    #outra thread pode ja ter renovado
+                    if self.token == token:
+                        self._renovar()
+                continue
+            break
+        return self._conteudo(response)
+
+    def _token_valido(self):
+        with self._trava_token:
+            if not self.token:
+                raise ErroApi(401, {"error": "Usuário não autenticado. Faça login primeiro."})
+            expira_em = _expiracao(self.token)
+            if self.refresh and expira_em is not None and expira_em - time.time() < MARGEM_RENOVACAO:
+                self._renovar()
+            return self.token
+
+    def _renovar(self):
+        #chamado com _trava_token; o servidor rotaciona o refresh token
+        response = self.session.post(self.base_url + "login/refresh/", json={"refresh": self.refresh}, timeout=self.timeout)
+        tokens = self._conteudo(response)
+        self.token = tokens['access']
+        self.refresh = tokens.get('refresh', self.refresh)
+
+    def _conteudo(self, response):
+        try:
+            dados = response.json() if response.content else None
+        except ValueError:
+            dados = response.text
+        if response.status_code >= 400:
+            raise ErroApi(response.status_code, dados)
+        return dados
+
+    def _get_auth_headers(self, token=None):
+        token = token or self.token
+        if not token:
+            raise ErroApi(401, {"error": "Usuário não autenticado. Faça login primeiro."})
+        return {
+            "Authorization": f"Bearer {token}"
         }
 
-        #remove parametros vazios
-        params = {k: v for k, v in params.items() if v}
 
-        headers = self._get_auth_headers()
-        response = requests.get(url, params=params, headers=headers)
-        print(response.json())
+#cliente asyncio. Usa o EcommerceClient (mesma Session, mesmo pool e mesma
+#renovacao de token) em um pool de threads proprio, com no maximo
+#max_concorrencia requisicoes em andamento.
+class AsyncEcommerceClient:
+    def __init__(self, base_url=BASE_URL, max_concorrencia=MAX_CONEXOES, timeout=TIMEOUT):
+        self.cliente = EcommerceClient(base_url, max_conexoes=max_concorrencia, timeout=timeout)
+        self.max_concorrencia = max_concorrencia
+        self._executor = ThreadPoolExecutor(max_concorrencia)
+        self._limite = asyncio.Semaphore(max_concorrencia)
 
-        if response.status_code == 200:
-            data = response.json()
-            print(f"Total de transações: {data['total_items']}")
-            print(f"Página: {data['pagina']}, Itens por página: {data['itens_por_pagina']}")
-            
-            for transacao in data['transacoes']:
-                print(f"ID: {transacao['id']}, Produto: {transacao['produto']}, Quantidade: {transacao['quantidade']}, Total: {transacao['total']}, Data: {transacao['data']}")
-        else:
-            print(f"Erro ao listar transações: {response.status_code} - {response.json()}")
+    @property
+    def token(self):
+        return self.cliente.token
 
+    @property
+    def refresh(self):
+        return self.cliente.refresh
 
-    def _get_auth_headers(self):
-        if not self.token:
-            raise Exception("Usuário não autenticado. Faça login primeiro.")
-        return {
-            "Authorization": f"Bearer {self.token}"
-        }
+    async def close(self):
+        self._executor.shutdown(wait=True)
+        self.cliente.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _executar(self, funcao, *args, **kwargs):
+        async with self._limite:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, lambda: funcao(*args, **kwargs))
+
+    async def register(self, username, email, password):
+        return await self._executar(self.cliente.register, username, email, password)
+
+    async def verify_email(self, email, code):
+        return await self._executar(self.cliente.verify_email, email, code)
+
+    async def login(self, username, password):
+        return await self._executar(self.cliente.login, username, password)
+
+    async def renovar_token(self):
+        return await self._executar(self.cliente.renovar_token)
+
+    async def add_saldo(self, saldo):
+        return await self._executar(self.cliente.add_saldo, saldo)
+
+    async def criar_produto(self, nome, preco, estoque):
+        return await self._executar(self.cliente.criar_produto, nome, preco, estoque)
+
+    async def listar_produtos(self, **params):
+        return await self._executar(self.cliente.listar_produtos, **params)
+
+    async def listar_todos_produtos(self, itens_por_pagina=100, **filtros):
+        return await self._todas_as_paginas(self.listar_produtos, "produtos", itens_por_pagina, filtros)
+
+    async def comprar_produto(self, username, produto_id, quantidade):
+        return await self._executar(self.cliente.comprar_produto, username, produto_id, quantidade)
+
+    async def checkout(self, itens):
+        return await self._executar(self.cliente.checkout, itens)
+
+    async def delete_user(self):
+        return await self._executar(self.cliente.delete_user)
+
+    async def logout(self):
+        return await self._executar(self.cliente.logout)
+
+    async def alterar_senha(self, senha_atual, nova_senha, confirmar_senha=None):
+        return await self._executar(self.cliente.alterar_senha, senha_atual, nova_senha, confirmar_senha)
+
+    async def listar_transacoes(self, **params):
+        return await self._executar(self.cliente.listar_transacoes, **params)
+
+    async def listar_todas_transacoes(self, itens_por_pagina=100, **filtros):
+        return await self._todas_as_paginas(self.listar_transacoes, "transacoes", itens_por_pagina, filtros)
+
+    async def _todas_as_paginas(self, listar, chave, itens_por_pagina, filtros):
+        primeira = await listar(pagina=1, itens_por_pagina=itens_por_pagina, **filtros)
+        paginas = math.ceil(primeira['total_items'] / itens_por_pagina)
+        restantes = await asyncio.gather(*(
+            listar(pagina=pagina, itens_por_pagina=itens_por_pagina, **filtros)
+            for pagina in range(2, paginas + 1)
+        ))
+        itens = list(primeira[chave])
+        for dados in restantes:
+            itens.extend(dados[chave])
+        return itens
+
+
+async def exemplo_async(username, password):
+    async with AsyncEcommerceClient() as client:
+        await client.login(username=username, password=password)
+        produtos, transacoes = await asyncio.gather(
+            client.listar_todos_produtos(preco_max=100),
+            client.listar_todas_transacoes(),
+        )
+        print(f"{len(produtos)} produtos, {len(transacoes)} transações")
 
 
 if __name__ == "__main__":
@@ -212,44 +340,56 @@ if __name__ == "__main__":
     email="SEU_EMAIL"
     password="SUA_SENHA"
 
+    #os metodos devolvem o JSON da resposta e levantam ErroApi em caso de erro
+
     # 1: Fazer cadastro
     #print("### Cadastro de usuário ###")
-    #client.register(username=username, email=email, password=password)
+    #print(client.register(username=username, email=email, password=password))
 
     # 2: Verificar o e-mail com o código fornecido
     #codigo_recebido = str(input("Informe o código de verificação recebido por e-mail: "))
-    #client.verify_email(email=email, code=codigo_recebido)
-    
-    # 3: Efetuar login (deve ser feito toda vez que rodar o código)
+    #print(client.verify_email(email=email, code=codigo_recebido))
+
+    # 3: Efetuar login (deve ser feito toda vez que rodar o código; depois o token é renovado sozinho)
     #print("\n### Login de usuário ###")
     #client.login(username=username, password=password)
 
     # 4: Adicionar saldo
     #print("\n### Adicionar saldo ###")
-    #client.add_saldo(1000.00)
+    #print(client.add_saldo(1000.00))
 
     # 5: criar um novo produto
     #print("\n### Criar produto ###")
-    #client.criar_produto(nome="Produto A", preco=50.00, estoque=10)
+    #print(client.criar_produto(nome="Produto A", preco=50.00, estoque=10))
 
     # 6: listar produtos
     #print("\n### Listar Produtos ###")
-    #client.listar_produtos()
+    #data = client.listar_produtos(pagina=1, itens_por_pagina=10, preco_max=100, ordenar_por="preco")
+    #print(f"Total de produtos: {data['total_items']}")
+    #for produto in data['produtos']:
+    #    print(f"ID: {produto['id']}, Nome: {produto['nome']}, Preço: {produto['preco']}, Estoque: {produto['estoque']}")
+
+    # 6.1: todas as páginas, buscadas em paralelo
+    #produtos = client.listar_todos_produtos(itens_por_pagina=100)
 
     #7: realizar compra
     #print("\n### Realizar compra ###")
-    #client.comprar_produto(username=username, produto_id=1, quantidade=1)
-    
+    #print(client.comprar_produto(username=username, produto_id=1, quantidade=1))
+
     #8: Listar transacoes
     #print("\n### Listar Transações ###")
-    #client.listar_transacoes()
+    #data = client.listar_transacoes(pagina=1, ordenar_por="data")
+    #for transacao in data['transacoes']:
+    #    print(f"ID: {transacao['id']}, Produto: {transacao['produto']}, Quantidade: {transacao['quantidade']}, Total: {transacao['total']}, Data: {transacao['data']}")
+
+    #Cliente asyncio
+    #asyncio.run(exemplo_async(username, password))
 
     #Alterar Senha
-    #client.alterar_senha()
+    #client.alterar_senha(senha_atual=password, nova_senha="NOVA_SENHA")
 
     #Logout
     #client.logout()
 
     #Deletar usuário
     ###client.delete_user()
-